@@ -0,0 +1,3 @@
+from api.endpoints.execution.controller import router as http_router
+
+__all__ = ["http_router"]
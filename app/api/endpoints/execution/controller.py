@@ -0,0 +1,27 @@
+import hmac
+from typing import Dict, Optional
+
+from core.config import settings
+from fastapi import APIRouter, Header, HTTPException, status
+from services.execution.service import code_execution
+
+router = APIRouter(prefix="/execution", tags=["execution"])
+
+
+@router.get("/stats")
+async def get_execution_stats(
+    x_monitoring_token: Optional[str] = Header(None),
+) -> Dict:
+    """
+    Get the counters of the code execution service, for monitoring. They show
+    internal addresses and load, so only monitoring with MONITORING_TOKEN gets them.
+
+    :param x_monitoring_token: The X-Monitoring-Token header
+    :raises HTTPException: If the token is missing, wrong or not configured
+    :return: The counters of each part of the service
+    """
+    if not settings.MONITORING_TOKEN or not hmac.compare_digest(
+        (x_monitoring_token or "").encode(), settings.MONITORING_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    return code_execution.get_stats()
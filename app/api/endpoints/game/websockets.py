@@ -3,17 +3,19 @@ import time
 import traceback
 from typing import List, Tuple
 
-from api.endpoints.users.websockets import get_current_user_ws
+from api.endpoints.users.websockets import get_current_user_ws, receive_messages
 from core.config import settings
 from core.errors.game import *
 from db.models.user import User
 from db.session import get_db
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 from schemas.game import GameEvent
+from services.execution.cancellation import CancellationToken
 from services.execution.service import code_execution
 from services.game.ability import ability_manager
 from services.game.manager import game_manager
 from services.game.state import GameStatus
+from services.problem.performance import performance_stats
 from services.problem.service import ProblemManager
 from sqlalchemy.orm import Session
 
@@ -200,6 +202,13 @@ async def game_websocket(
         except Exception:
             pass
 
+    # Executions of this connection stop when it closes, or when the game ends
+    cancel = CancellationToken(game_state.cancellation)
+    messages = asyncio.Queue()
+    reader = asyncio.create_task(
+        receive_messages(websocket, messages, lambda: cancel.cancel("the player left"))
+    )
+
     try:
         game_view = game_manager.create_game_view(game_state, current_user.id)
         await websocket.send_json(
@@ -227,7 +236,9 @@ async def game_websocket(
 
         while True:
             try:
-                data = await asyncio.wait_for(websocket.receive_json(), timeout=1.0)
+                data = await asyncio.wait_for(messages.get(), timeout=1.0)
+                if isinstance(data, Exception):
+                    raise data
 
                 if game_state.status == GameStatus.FINISHED:
                     break
@@ -264,6 +275,44 @@ async def game_websocket(
                 elif data["type"] == "forfeit":
                     await game_manager.forfeit_game(game_id, current_user.id)
                     await game_manager.handle_game_end(game_state, db)
+                elif data["type"] == "run":
+                    # Runs only execute the samples and custom inputs, so they skip
+                    # the submission cooldown and never touch HP
+                    custom_test_cases = data["data"].get("test_cases", [])
+                    if len(custom_test_cases) > settings.RUN_MAX_CUSTOM_TESTS:
+                        await player.send_event(
+                            GameEvent(
+                                type="error",
+                                data={
+                                    "message": f"You can run at most {settings.RUN_MAX_CUSTOM_TESTS} custom test cases"
+                                },
+                            )
+                        )
+                        continue
+
+                    code = data["data"]["code"]
+                    lang = data["data"]["lang"]
+                    problem = game_state.problems[player.current_problem_index]
+
+                    validation_data = ProblemManager.get_problem_for_validation(problem)
+                    result = await code_execution.run_code(
+                        code,
+                        validation_data["method_name"],
+                        validation_data["sample_test_cases"],
+                        validation_data["sample_test_results"],
+                        custom_test_cases,
+                        getattr(validation_data["compare_func"], lang),
+                        lang,
+                        user_id=current_user.id,
+                        deadline=game_state.end_time(),
+                        on_queue=lambda event: player.send_event(
+                            GameEvent(type="queue_position", data=event)
+                        ),
+                        cancel=cancel,
+                    )
+                    await player.send_event(
+                        GameEvent(type="run_result", data=result.to_dict())
+                    )
                 elif data["type"] == "submit":
                     current_time = time.time()
                     submission_cooldown = (
@@ -304,10 +353,53 @@ async def game_websocket(
                         problem.difficulty,
                         getattr(validation_data["compare_func"], lang),
                         lang,
+                        problem.id,
+                        on_progress=lambda event: player.send_event(
+                            GameEvent(type="test_progress", data=event)
+                        ),
+                        on_runtime_analysis=lambda complexity, index=problem_index: (
+                            player.send_event(
+                                GameEvent(
+                                    type="runtime_analysis",
+                                    data={
+                                        "problem_index": index,
+                                        "complexity": complexity,
+                                    },
+                                )
+                            )
+                        ),
+                        input_generator=validation_data.get("input_generator"),
+                        on_measurement=lambda measurement, index=problem_index: (
+                            player.send_event(
+                                GameEvent(
+                                    type="complexity_measurement",
+                                    data={"problem_index": index, **measurement},
+                                )
+                            )
+                        ),
+                        user_id=current_user.id,
+                        priority=game_state.match_type,
+                        deadline=game_state.end_time(),
+                        on_queue=lambda event: player.send_event(
+                            GameEvent(type="queue_position", data=event)
+                        ),
+                        cancel=cancel,
                     )
                     result = result.to_dict()
+                    result["percentiles"] = performance_stats.record(
+                        db, current_user.id, problem.id, lang, result
+                    )
+                    ProblemManager.save_submission(
+                        db,
+                        current_user.id,
+                        problem,
+                        game_state.match_type,
+                        lang,
+                        result,
+                    )
 
-                    if result["success"]:
+                    # A run killed by the time limit still scores the tests it passed
+                    if result["success"] or result["summary"]["passed_tests"] > 0:
                         submission_result = await game_manager.process_submission(
                             game_id,
                             current_user.id,
@@ -377,3 +469,6 @@ async def game_websocket(
         pass
     except Exception as _:
         print(f"Error in game websocket: {traceback.format_exc()}")
+    finally:
+        reader.cancel()
+        cancel.cancel("the player left")
@@ -2,16 +2,18 @@ import asyncio
 import time
 import traceback
 
-from api.endpoints.users.websockets import get_current_user_ws
+from api.endpoints.users.websockets import get_current_user_ws, receive_messages
 from core.config import settings
 from db.models.user import User
 from db.session import get_db
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 from schemas.game import GameEvent
+from services.execution.cancellation import CancellationToken
 from services.execution.service import code_execution
 from services.game.state import GameState, GameStatus, PlayerState
 from services.practice.constants import BOT_NAME
 from services.practice.operator import PracticeGameOperator
+from services.problem.performance import performance_stats
 from services.problem.service import ProblemManager
 from sqlalchemy.orm import Session
 
@@ -68,6 +70,13 @@ async def practice_websocket(
         start_time=time.time(),
     )
 
+    # Executions of this connection stop when it closes
+    cancel = CancellationToken()
+    messages = asyncio.Queue()
+    reader = asyncio.create_task(
+        receive_messages(websocket, messages, lambda: cancel.cancel("the player left"))
+    )
+
     try:
         operator.register_game(game_state)
         game_view = operator.get_game_view(game_state, current_user.id)
@@ -86,7 +95,9 @@ async def practice_websocket(
 
         while True:
             try:
-                data = await asyncio.wait_for(websocket.receive_json(), timeout=1.0)
+                data = await asyncio.wait_for(messages.get(), timeout=1.0)
+                if isinstance(data, Exception):
+                    raise data
 
                 if game_state.status == GameStatus.FINISHED:
                     break
@@ -191,6 +202,44 @@ async def practice_websocket(
                         )
                         await websocket.send_json({"type": "problem", "data": problem})
 
+                elif data["type"] == "run":
+                    # Runs only execute the samples and custom inputs, so they skip
+                    # the submission cooldown and never touch HP
+                    custom_test_cases = data["data"].get("test_cases", [])
+                    if len(custom_test_cases) > settings.RUN_MAX_CUSTOM_TESTS:
+                        await player.send_event(
+                            GameEvent(
+                                type="error",
+                                data={
+                                    "message": f"You can run at most {settings.RUN_MAX_CUSTOM_TESTS} custom test cases"
+                                },
+                            )
+                        )
+                        continue
+
+                    code = data["data"]["code"]
+                    lang = data["data"]["lang"]
+                    problem = game_state.problems[player.current_problem_index]
+
+                    validation_data = ProblemManager.get_problem_for_validation(problem)
+                    result = await code_execution.run_code(
+                        code,
+                        validation_data["method_name"],
+                        validation_data["sample_test_cases"],
+                        validation_data["sample_test_results"],
+                        custom_test_cases,
+                        getattr(validation_data["compare_func"], lang),
+                        lang,
+                        user_id=current_user.id,
+                        deadline=None,  # practice games don't end on time
+                        on_queue=lambda event: player.send_event(
+                            GameEvent(type="queue_position", data=event)
+                        ),
+                        cancel=cancel,
+                    )
+                    await player.send_event(
+                        GameEvent(type="run_result", data=result.to_dict())
+                    )
                 elif data["type"] == "submit":
                     current_time = time.time()
                     submission_cooldown = (
@@ -231,10 +280,48 @@ async def practice_websocket(
                         problem.difficulty,
                         getattr(validation_data["compare_func"], lang),
                         lang,
+                        problem.id,
+                        on_progress=lambda event: player.send_event(
+                            GameEvent(type="test_progress", data=event)
+                        ),
+                        on_runtime_analysis=lambda complexity, index=problem_index: (
+                            player.send_event(
+                                GameEvent(
+                                    type="runtime_analysis",
+                                    data={
+                                        "problem_index": index,
+                                        "complexity": complexity,
+                                    },
+                                )
+                            )
+                        ),
+                        input_generator=validation_data.get("input_generator"),
+                        on_measurement=lambda measurement, index=problem_index: (
+                            player.send_event(
+                                GameEvent(
+                                    type="complexity_measurement",
+                                    data={"problem_index": index, **measurement},
+                                )
+                            )
+                        ),
+                        user_id=current_user.id,
+                        priority=game_state.match_type,
+                        deadline=None,  # practice games don't end on time
+                        on_queue=lambda event: player.send_event(
+                            GameEvent(type="queue_position", data=event)
+                        ),
+                        cancel=cancel,
                     )
                     result = result.to_dict()
+                    result["percentiles"] = performance_stats.record(
+                        db, current_user.id, problem.id, lang, result
+                    )
+                    ProblemManager.save_submission(
+                        db, current_user.id, problem, "practice", lang, result
+                    )
 
-                    if result["success"]:
+                    # A run killed by the time limit still scores the tests it passed
+                    if result["success"] or result["summary"]["passed_tests"] > 0:
                         submission_result = await operator.process_submission(
                             game_id,
                             current_user.id,
@@ -325,5 +412,7 @@ async def practice_websocket(
     except Exception:
         print(f"Error in practice websocket: {traceback.format_exc()}")
     finally:
+        reader.cancel()
+        cancel.cancel("the player left")
         await operator.cleanup_game(game_id)
         game_state.status = GameStatus.FINISHED
@@ -1,3 +1,6 @@
+import asyncio
+from typing import Callable
+
 from core.config import settings
 from core.errors.auth import (
     WSExpiredTokenError,
@@ -6,7 +9,7 @@ from core.errors.auth import (
 )
 from db.models.user import User
 from db.session import get_db
-from fastapi import APIRouter, Depends, WebSocket
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 import jwt
 from sqlalchemy.orm import Session
 
@@ -71,3 +74,26 @@ async def get_current_user_ws(
         raise WSInvalidTokenError()
 
     return user
+
+
+async def receive_messages(
+    websocket: WebSocket, messages: asyncio.Queue, on_disconnect: Callable[[], None]
+):
+    """
+    Receive the JSON messages of a WebSocket connection into a queue, so a handler
+    busy with a message (e.g. waiting for a submission's result) still notices when
+    the connection closes. Errors are queued too, the last one is the disconnection.
+
+    :param websocket: The WebSocket connection
+    :param messages: The queue
+    :param on_disconnect: Called as soon as the connection closes
+    """
+    while True:
+        try:
+            messages.put_nowait(await websocket.receive_json())
+        except (WebSocketDisconnect, RuntimeError) as e:
+            on_disconnect()
+            messages.put_nowait(e)
+            return
+        except Exception as e:
+            messages.put_nowait(e)
@@ -1,4 +1,5 @@
 # from api.endpoints import game, room, users
+import api.endpoints.execution as execution
 import api.endpoints.game as game
 import api.endpoints.practice as practice
 import api.endpoints.room as room
@@ -8,6 +9,7 @@ from fastapi import FastAPI
 
 
 def include_routers(app: FastAPI):
+    app.include_router(execution.http_router, prefix=settings.API_STR)
     app.include_router(game.http_router, prefix=settings.API_STR)
     app.include_router(game.ws_router, prefix=settings.API_STR)
     app.include_router(practice.ws_router, prefix=settings.API_STR)
@@ -56,7 +56,42 @@ class Settings(BaseSettings):
 
     # Code Execution
     MAX_CONCURRENT: str  # Maximum number of problems that can be executed concurrently for each difficulty
+    RUN_MAX_CONCURRENT: int  # Maximum number of "run" requests executed concurrently
+    RUN_MAX_CUSTOM_TESTS: int  # Maximum number of custom inputs per "run" request
+    ADAPTIVE_CONCURRENCY_ENABLED: bool  # Adjust MAX_CONCURRENT down to the host's load
+    ADAPTIVE_MIN_CONCURRENT: str  # Lowest concurrency for each difficulty
+    ADAPTIVE_LATENCY_TARGET: str  # p95 seconds per job to back off above
+    ADAPTIVE_CPU_PRESSURE: float  # CPU pressure (% stalled, avg10) to back off at
+    ADAPTIVE_MEMORY_PRESSURE: float  # Memory pressure (% stalled, avg10) to back off at
+    ADAPTIVE_INTERVAL: int  # Seconds between concurrency adjustments
+    SCHEDULER_CLASS_WEIGHTS: str  # Ranked, unranked, custom, practice, run shares
+    SCHEDULER_USER_MAX_CONCURRENT: int  # Jobs a single user can have running at once
+    SCHEDULER_DEADLINE_MARGIN: int  # Seconds before a match ends when its jobs go first
+    SHARDING_DIFFICULTIES: str  # Difficulties whose hidden tests run in parallel shards
+    SHARDING_MAX_SHARDS: int  # Most sandboxes one submission's hidden tests split into
+    SHARDING_MIN_TESTS: int  # Fewest hidden tests in a shard
+    RUNTIME_ANALYSIS_BACKENDS: str  # Analysis backends tried in order: static, openai
     OPENAI_API_KEY: str  # API key for OpenAI (Used for Runtime Analysis)
+    RUNTIME_ANALYSIS_MAX_CONCURRENT: int  # Runtime analysis requests in flight at once
+    RUNTIME_ANALYSIS_TIMEOUT: (
+        int  # Seconds before a runtime analysis request is dropped
+    )
+    RUNTIME_ANALYSIS_CACHE_SIZE: int  # Analyses kept by normalized code, 0 to disable
+    PREFLIGHT_LANGUAGES: str  # Languages checked to compile before queuing, empty = off
+    PREFLIGHT_TIMEOUT: int  # Seconds a Java/C++ pre-flight compile check may take
+    PREFLIGHT_MEMORY_LIMIT: int  # Memory limit (mb) of the Java/C++ checker containers
+    COMPILE_CACHE_DIR: str  # Directory for cached C++/Java build outputs
+    COMPILE_CACHE_MAX_MB: int  # Size limit (mb) of the compile cache, 0 to disable
+    FIXTURE_DIR: str  # Directory for test data mounted into containers, ideally tmpfs
+    FIXTURE_MAX_MB: int  # Size limit (mb) of the test data directory
+    HARNESS_CACHE_SIZE: int  # Problems per language with a cached harness, 0 to disable
+    RESULT_CACHE_SIZE: int  # Submission results kept for resubmits, 0 to disable
+    RESULT_CACHE_TTL: int  # Seconds a cached submission result stays valid
+    COMPLEXITY_MEASUREMENT_SIZES: str  # Input sizes to time, empty to disable
+    COMPLEXITY_MEASUREMENT_REPEATS: int  # Runs per input size, the fastest one counts
+    COMPLEXITY_MEASUREMENT_MAX_CONCURRENT: int  # Measurements run at once
+    COMPLEXITY_MEASUREMENT_MAX_PENDING: int  # Measurements waiting, more are dropped
+    COMPLEXITY_MEASUREMENT_MAX_WAIT: int  # Seconds a measurement waits for an idle server
 
     # Docker Settings
     DOCKER_IMAGE_PYTHON: str  # Docker image for running Python code
@@ -71,10 +106,39 @@ class Settings(BaseSettings):
     DOCKER_JAVA_TIME_LIMIT: str  # Time limit (ms) for running Java code
     DOCKER_CPP_TIME_LIMIT: str  # Time limit (ms) for running C++ code
 
+    DOCKER_PYTHON_TEST_TIME_LIMIT: str  # CPU time limit (ms) per Python test
+    DOCKER_JAVA_TEST_TIME_LIMIT: str  # CPU time limit (ms) per Java test
+    DOCKER_CPP_TEST_TIME_LIMIT: str  # CPU time limit (ms) per C++ test
+
     DOCKER_CPU_LIMIT: float  # CPU limit (0-1.0) for each container
 
+    DOCKER_POOL_ENABLED: bool  # Reuse pre-started containers between submissions
+    DOCKER_POOL_SIZE: int  # Max pooled containers per language and memory tier
+    DOCKER_POOL_MIN_IDLE: int  # Idle containers kept warm per language and memory tier
+    DOCKER_POOL_MAX_USES: int  # Submissions a container runs before it is recycled
+    DOCKER_POOL_RECYCLE_POLICY: str  # Destroy containers after "always" or "on_failure"
+    DOCKER_POOL_PIDS_LIMIT: int  # Max processes and threads in a pooled container
+    DOCKER_JAVA_WORKER_ENABLED: bool  # Run Java in a long-lived JVM per container
+    DOCKER_JAVA_WORKER_MAX_JOBS: int  # Submissions a JVM worker runs before it restarts
+    DOCKER_PYTHON_ZYGOTE_ENABLED: bool  # Fork Python runs from a warm process
+    DOCKER_RESOURCE_ACCOUNTING: bool  # Measure the CPU time and memory of runs
+    SANDBOX_BACKENDS: str  # Sandbox per language ("python=process"), docker otherwise
+    PROCESS_SANDBOX_DIR: str  # Job directories of process sandboxes, ideally tmpfs
+    MONITORING_TOKEN: str  # Token of GET /execution/stats, empty = disabled
+
+    # Execution Workers
+    EXECUTION_WORKERS: str  # Worker addresses (host:port, unix:///path), empty = local
+    WORKER_TOKEN: str  # Shared secret of the API servers and the workers
+    WORKER_LISTEN: str  # Address an execution worker listens on
+    WORKER_CAPACITY: int  # Jobs an execution worker runs at once
+    WORKER_HEARTBEAT_INTERVAL: int  # Seconds between worker heartbeats
+    WORKER_HEARTBEAT_TIMEOUT: int  # Seconds without a heartbeat before a worker is lost
+    WORKER_MAX_RETRIES: int  # Times a job is retried after losing its worker
+    WORKER_DISPATCH_TIMEOUT: int  # Seconds a job waits for a free worker slot
+
     # Game Settings
     SUBMISSION_COOLDOWN: int  # Cooldown time (s) between submissions
+    PERFORMANCE_FLUSH_INTERVAL: int  # Seconds between saves of the percentile stats
     STARTING_HP: int  # Starting HP for each player
     MATCH_PROBLEM_COUNT: int  # Number of problems in each match
     MATCH_TIMEOUT_MINUTES: int  # Time limit (min) for each match
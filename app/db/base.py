@@ -1,4 +1,4 @@
 from db.base_class import Base  # noqa
-from db.models.game import Match  # noqa
+from db.models.game import Match, Submission  # noqa
 from db.models.problem import Problem, Boilerplate, CompareFunc  # noqa
 from db.models.user import RefreshToken, User  # noqa
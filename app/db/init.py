@@ -62,6 +62,7 @@ def init_db(test=False):
                 hidden_test_cases=problem["hidden_test_cases"],
                 hidden_test_results=problem["hidden_test_results"],
                 method_name=problem["method_name"],
+                input_generator=problem.get("input_generator"),
             )
 
             new_boilerplate = Boilerplate(
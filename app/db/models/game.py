@@ -1,6 +1,7 @@
 from db.base_class import Base
-from sqlalchemy import JSON, Column, Float, ForeignKey, Integer, String
+from sqlalchemy import JSON, Boolean, Column, Float, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 
 
 class Match(Base):
@@ -48,3 +49,37 @@ class Match(Base):
     player1 = relationship("User", foreign_keys=[player1_id])
     player2 = relationship("User", foreign_keys=[player2_id])
     winner = relationship("User", foreign_keys=[winner_id])
+
+
+class Submission(Base):
+    """
+    Database model representing the result of a submission in a game.
+
+    :param id: The unique identifier of the submission, auto-incremented.
+    :param user_id: The unique identifier of the user who submitted the code.
+    :param problem_id: The unique identifier of the problem the code was submitted to.
+    :param match_type: The type of the match, or "practice".
+    :param lang: The programming language of the code.
+    :param success: Whether the code ran without errors.
+    :param passed_tests: The number of hidden tests the code passed.
+    :param total_tests: The number of hidden tests of the problem.
+    :param cpu_time: The CPU time (ms) of the run, measured by the sandbox.
+    :param peak_memory: The peak memory (kb) of the run, measured by the sandbox.
+    :param oom_killed: Whether the run was killed for exceeding its memory limit.
+    :param created_at: The epoch time when the code was submitted.
+    """
+
+    __tablename__ = "submissions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    problem_id = Column(Integer, ForeignKey("problems.id"), nullable=False, index=True)
+    match_type = Column(String, nullable=False)
+    lang = Column(String, nullable=False)
+    success = Column(Boolean, nullable=False)
+    passed_tests = Column(Integer, nullable=False)
+    total_tests = Column(Integer, nullable=False)
+    cpu_time = Column(Float, nullable=True)
+    peak_memory = Column(Integer, nullable=True)
+    oom_killed = Column(Boolean, nullable=True)
+    created_at = Column(Float, server_default=func.extract("epoch", func.now()))
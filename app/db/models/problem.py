@@ -16,6 +16,10 @@ class Problem(Base):
     :param sample_test_results: The sample test results of the problem.
     :param hidden_test_cases: The hidden test cases of the problem.
     :param hidden_test_results: The hidden test results of the problem.
+    :param input_generator: Describes the arguments of the method, to generate inputs
+        of any size for complexity measurements. Optional.
+    :param performance: Histograms of the runtime and peak memory of the accepted
+        solutions per language, see PerformanceStats. Optional.
     :param created_at: Epoch time when the problem was created.
     """
 
@@ -32,6 +36,8 @@ class Problem(Base):
     hidden_test_cases = Column(JSON, nullable=False)
     hidden_test_results = Column(JSON, nullable=False)
     method_name = Column(String, nullable=False)
+    input_generator = Column(JSON, nullable=True)
+    performance = Column(JSON, nullable=True)
     created_at = Column(Float, server_default=func.extract("epoch", func.now()))
 
     boilerplate = relationship(
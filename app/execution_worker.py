@@ -0,0 +1,66 @@
+"""
+A standalone execution worker, which runs the sandboxes of the API servers listing
+it in EXECUTION_WORKERS:
+
+    python execution_worker.py [--listen 127.0.0.1:9000] [--capacity 8]
+
+It refuses to listen beyond this host without a WORKER_TOKEN of its own.
+"""
+
+import argparse
+import asyncio
+import signal
+
+from core.config import settings
+from services.execution.docker import DockerRunner
+from services.execution.executor import LocalExecutor, make_runners
+from services.execution.remote import ExecutionWorker, parse_address
+
+import docker
+
+PLACEHOLDER_TOKEN = "change_this_secret"  # the token of .env.example
+LOCAL_HOSTS = ["127.0.0.1", "::1", "localhost"]
+
+
+def check_token(listen: str, token: str):
+    """
+    Refuse to accept jobs from other hosts with no token, or the example one.
+
+    :param listen: The address the worker listens on, see parse_address.
+    :param token: The shared secret of the API servers and the workers.
+    """
+    address = parse_address(listen)
+    if "path" in address or address["host"] in LOCAL_HOSTS:
+        return
+    if token in ("", PLACEHOLDER_TOKEN):
+        raise SystemExit(f"Set WORKER_TOKEN to a secret to listen on {listen}")
+
+
+async def serve(listen: str, capacity: int):
+    check_token(listen, settings.WORKER_TOKEN)
+    executor = LocalExecutor(make_runners(DockerRunner(docker.from_env())), capacity)
+    worker = ExecutionWorker(
+        executor, capacity, settings.WORKER_TOKEN, settings.WORKER_HEARTBEAT_INTERVAL
+    )
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+
+    await executor.start()
+    await worker.start(listen)
+    print(f"Execution worker listening on {listen} ({capacity} slots)")
+    try:
+        await stopped.wait()
+    finally:
+        await worker.close()
+        await executor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run sandboxes for API servers.")
+    parser.add_argument("--listen", default=settings.WORKER_LISTEN)
+    parser.add_argument("--capacity", type=int, default=settings.WORKER_CAPACITY)
+    args = parser.parse_args()
+    asyncio.run(serve(args.listen, args.capacity))
@@ -1,11 +1,31 @@
+from contextlib import asynccontextmanager
+
 from api.router import include_routers
 from core.config import settings
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from services.execution.service import code_execution
+from services.problem.performance import performance_stats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up the code execution sandboxes (or connect to the execution workers) before
+    serving and tear them down on shutdown. The percentile stats of the problems are
+    saved periodically, and once more on shutdown.
+    """
+    await code_execution.start()
+    performance_stats.start()
+    yield
+    await performance_stats.stop()
+    await code_execution.stop()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
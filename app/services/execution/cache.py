@@ -0,0 +1,161 @@
+from collections import OrderedDict
+import os
+import shutil
+import threading
+import time
+from typing import Any, Hashable, List, Optional
+import uuid
+
+
+class DiskCache:
+    """
+    A content-addressed cache of directories on local disk, evicted least recently used
+    first once the total size goes over the limit.
+
+    :param root: The directory holding the cache entries.
+    :param max_bytes: The maximum total size of all entries.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] = OrderedDict()  # key -> size in bytes
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+        # Pick up entries from a previous run, oldest first
+        existing = []
+        for key in os.listdir(root):
+            path = os.path.join(root, key)
+            if key.startswith(".") or not os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)  # unfinished writes
+                continue
+            existing.append((os.path.getmtime(path), key, _dir_size(path)))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get the directory of an entry and mark it as recently used.
+
+        :param key: The key of the entry.
+        :return: The path of the entry's directory, or None on a miss.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = os.path.join(self.root, key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, files: List[str]) -> Optional[str]:
+        """
+        Copy files into a new entry. The entry is written to a temporary directory first
+        and renamed into place, so readers never see a partial entry.
+
+        :param key: The key of the entry.
+        :param files: The paths of the files to store.
+        :return: The path of the entry's directory, or None if it doesn't fit.
+        """
+        size = sum(os.path.getsize(f) for f in files)
+        if size > self.max_bytes:
+            return None
+
+        path = os.path.join(self.root, key)
+        tmp_path = os.path.join(self.root, f".{key}.{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        try:
+            for f in files:
+                shutil.copy2(f, tmp_path)
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another thread stored the same key first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return self.get(key)
+
+        with self._lock:
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+        return path
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        while True:
+            with self._lock:
+                if self._size <= self.max_bytes or not self._entries:
+                    return
+                key, size = self._entries.popitem(last=False)
+                self._size -= size
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+
+class LRUCache:
+    """
+    A thread-safe in-memory cache that drops the least recently used entries once it
+    holds more than max_entries.
+
+    :param max_entries: The maximum number of entries, 0 disables the cache.
+    :param ttl: Seconds an entry stays valid after it was stored, None for no expiry.
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._expiry: dict = {}  # key -> monotonic time it expires at
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get an entry and mark it as recently used.
+
+        :param key: The key of the entry.
+        :return: The value, or None on a miss.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            if self.ttl is not None and self._expiry[key] <= time.monotonic():
+                del self._entries[key]
+                del self._expiry[key]
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Add or replace an entry, evicting the least recently used ones if needed.
+
+        :param key: The key of the entry.
+        :param value: The value to store.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if self.ttl is not None:
+                self._expiry[key] = time.monotonic() + self.ttl
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._expiry.pop(evicted, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _dir_size(path: str) -> int:
+    """Get the total size of the files directly inside a directory."""
+    return sum(
+        os.path.getsize(os.path.join(path, f))
+        for f in os.listdir(path)
+        if os.path.isfile(os.path.join(path, f))
+    )
@@ -0,0 +1,97 @@
+import asyncio
+from contextlib import contextmanager
+import threading
+from typing import Callable, List, Optional
+
+
+class CancellationToken:
+    """
+    Tells the executions that carry it to stop, e.g. when their game ends or their
+    player leaves. It can be cancelled from any thread, and the callbacks run on the
+    thread that cancels it: sandbox runners use them to kill what they started.
+
+    :param parent: A token whose cancellation cancels this one too, e.g. the game of
+        a player's connection.
+    """
+
+    def __init__(self, parent: Optional["CancellationToken"] = None):
+        self.reason: Optional[str] = None
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._detach: Optional[Callable[[], None]] = None
+        if parent:
+            self._detach = parent.add_callback(lambda: self.cancel(parent.reason))
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled"):
+        """
+        Cancel the token and call its callbacks, only the first call does anything.
+
+        :param reason: Why, shown to the player whose execution was cancelled.
+        """
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+
+        if self._detach:
+            self._detach()  # the parent doesn't need to keep this token alive
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error cancelling execution: {e}")
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call a function when the token is cancelled, right away if it already is.
+
+        :param callback: The function.
+        :return: A function that removes the callback.
+        """
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    async def wait(self):
+        """Wait until the token is cancelled."""
+        loop = asyncio.get_running_loop()
+        cancelled = loop.create_future()
+
+        def wake():
+            if not cancelled.done():
+                cancelled.set_result(None)
+
+        remove = self.add_callback(lambda: loop.call_soon_threadsafe(wake))
+        try:
+            await cancelled
+        finally:
+            remove()
+
+    def _remove(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+@contextmanager
+def on_cancel(token: Optional[CancellationToken], callback: Callable[[], None]):
+    """
+    Call a function if the token is cancelled while the block runs.
+
+    :param token: The token, None for a run that can't be cancelled.
+    :param callback: The function, e.g. one that kills the sandbox of the run.
+    """
+    remove = token.add_callback(callback) if token else None
+    try:
+        yield
+    finally:
+        if remove:
+            remove()
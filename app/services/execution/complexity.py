@@ -0,0 +1,560 @@
+import ast
+import re
+from typing import Dict, List, NamedTuple, Optional, Set
+
+
+class Complexity(NamedTuple):
+    """
+    A Big-O term, n^degree * log(n)^log, or 2^n if exponential. Terms compare by
+    growth, so the max of two terms is the dominant one.
+    """
+
+    exponential: bool = False
+    degree: int = 0
+    log: int = 0
+
+    def __mul__(self, other: "Complexity") -> "Complexity":
+        return Complexity(
+            self.exponential or other.exponential,
+            self.degree + other.degree,
+            self.log + other.log,
+        )
+
+    def __str__(self) -> str:
+        if self.exponential:
+            return "O(2^n)"
+        terms = []
+        if self.degree == 1:
+            terms.append("n")
+        elif self.degree > 1:
+            terms.append(f"n^{self.degree}")
+        if self.log == 1:
+            terms.append("log n")
+        elif self.log > 1:
+            terms.append(f"log^{self.log} n")
+        return f"O({' '.join(terms) or '1'})"
+
+
+CONSTANT = Complexity()
+LOG = Complexity(log=1)
+LINEAR = Complexity(degree=1)
+N_LOG_N = Complexity(degree=1, log=1)
+EXPONENTIAL = Complexity(exponential=True)
+
+# Names hinting that a recursive function doesn't revisit the same state
+MEMO_HINTS = ("memo", "cache", "visit", "seen", "dp")
+
+
+def estimate_complexity(code: str, lang: str) -> Optional[str]:
+    """
+    Estimate the time complexity of code from its loop nesting, recursion and the
+    library calls it makes. This is a heuristic: it assumes every loop that isn't over a
+    constant range runs n times and can't see through data-dependent bounds.
+
+    :param code: The code to analyze.
+    :param lang: The language of the code.
+    :return: The complexity in Big O notation, or None if the code couldn't be read.
+    """
+    if lang == "python":
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            return None
+        complexity = _PythonEstimator(tree).estimate()
+    elif lang in ("java", "cpp"):
+        complexity = _BraceEstimator(_tokenize(code)).estimate()
+    else:
+        return None
+    return str(complexity) if complexity is not None else None
+
+
+def _recursive(body: Complexity, calls: int, halving: bool, memoized: bool):
+    """
+    Get the complexity of a recursive function.
+
+    :param body: The cost of one call, without the recursive calls.
+    :param calls: The number of recursive calls per call, 2 meaning "more than one".
+    :param halving: Whether the recursive calls work on half of the input.
+    :param memoized: Whether the function looks memoized.
+    """
+    if calls == 0:
+        return body
+    if calls == 1:
+        return body * (LOG if halving else LINEAR)
+    if halving:
+        # Divide and conquer, T(n) = 2T(n/2) + f(n)
+        if body.degree < 1:
+            return LINEAR
+        return body * LOG if body.degree == 1 else body
+    if memoized:
+        return body * LINEAR
+    return EXPONENTIAL
+
+
+# Python
+
+# Calls whose cost doesn't depend on their arguments
+PYTHON_CALLS = {
+    "sorted": N_LOG_N,
+    "sort": N_LOG_N,
+    "heappush": LOG,
+    "heappop": LOG,
+    "heappushpop": LOG,
+    "heapreplace": LOG,
+    "bisect": LOG,
+    "bisect_left": LOG,
+    "bisect_right": LOG,
+    "heapify": LINEAR,
+    "nlargest": LINEAR,
+    "nsmallest": LINEAR,
+    "insort": LINEAR,
+    "reversed": LINEAR,
+    "join": LINEAR,
+    "count": LINEAR,
+    "index": LINEAR,
+    "remove": LINEAR,
+    "insert": LINEAR,
+    "extend": LINEAR,
+    "copy": LINEAR,
+    "deepcopy": LINEAR,
+    "Counter": LINEAR,
+    "split": LINEAR,
+    "replace": LINEAR,
+}
+# Calls that walk their only argument, but are constant for scalars like max(a, b)
+PYTHON_ITERABLE_CALLS = {
+    "min",
+    "max",
+    "sum",
+    "any",
+    "all",
+    "list",
+    "set",
+    "dict",
+    "tuple",
+    "deque",
+}
+HALVING_OPS = (ast.FloorDiv, ast.Div, ast.RShift)
+SHRINKING_OPS = (ast.FloorDiv, ast.Div, ast.RShift, ast.Mult, ast.LShift)
+
+
+def _call_name(call: ast.Call) -> Optional[str]:
+    """Get the name of the called function or method."""
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+
+class _PythonEstimator:
+    def __init__(self, tree: ast.AST):
+        self.functions = {
+            node.name: node
+            for node in ast.walk(tree)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        }
+        self._costs: Dict[str, Complexity] = {}
+        self._visiting: Set[str] = set()
+
+    def estimate(self) -> Complexity:
+        return max(
+            (self.function_cost(name) for name in self.functions), default=CONSTANT
+        )
+
+    def function_cost(self, name: str) -> Complexity:
+        if name in self._costs:
+            return self._costs[name]
+        if name in self._visiting:
+            return CONSTANT  # recursion is accounted for once the function is done
+
+        self._visiting.add(name)
+        node = self.functions[name]
+        body = self.block_cost(node.body)
+
+        calls = [
+            (call, in_loop)
+            for call, in_loop in self._calls(node.body, False)
+            if _call_name(call) == name
+        ]
+        branching = len(calls) > 1 or any(in_loop for _, in_loop in calls)
+        halving = any(self._is_halving(arg) for call, _ in calls for arg in call.args)
+        cost = _recursive(
+            body, 2 if branching else len(calls), halving, self._is_memoized(node)
+        )
+
+        self._visiting.discard(name)
+        self._costs[name] = cost
+        return cost
+
+    def block_cost(self, statements: List[ast.stmt]) -> Complexity:
+        return max((self.stmt_cost(s) for s in statements), default=CONSTANT)
+
+    def stmt_cost(self, node: ast.stmt) -> Complexity:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return CONSTANT  # costs something when called
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            body = self.block_cost(node.body + node.orelse)
+            return max(self.expr_cost(node.iter), self._iter_factor(node.iter) * body)
+        if isinstance(node, ast.While):
+            factor = LOG if self._shrinks(node) else LINEAR
+            body = max(self.block_cost(node.body), self.expr_cost(node.test))
+            return max(self.block_cost(node.orelse), factor * body)
+
+        cost = CONSTANT
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                if value and isinstance(value[0], ast.stmt):
+                    cost = max(cost, self.block_cost(value))
+                elif value and isinstance(value[0], ast.excepthandler):
+                    cost = max(cost, *(self.block_cost(h.body) for h in value))
+                else:
+                    for item in value:
+                        if isinstance(item, ast.expr):
+                            cost = max(cost, self.expr_cost(item))
+            elif isinstance(value, ast.expr):
+                cost = max(cost, self.expr_cost(value))
+        return cost
+
+    def expr_cost(self, node: Optional[ast.expr]) -> Complexity:
+        if node is None or isinstance(node, ast.Lambda):
+            return CONSTANT
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp)):
+            return self._comprehension_cost([node.elt], node.generators)
+        if isinstance(node, ast.DictComp):
+            return self._comprehension_cost([node.key, node.value], node.generators)
+
+        cost = CONSTANT
+        if isinstance(node, ast.Call):
+            cost = self._call_cost(node)
+        elif isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+            cost = LINEAR  # slicing copies
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                cost = max(cost, self.expr_cost(child))
+        return cost
+
+    def _comprehension_cost(
+        self, elements: List[ast.expr], generators: List[ast.comprehension]
+    ) -> Complexity:
+        cost = max(self.expr_cost(e) for e in elements)
+        for gen in reversed(generators):
+            inner = max([cost] + [self.expr_cost(c) for c in gen.ifs])
+            cost = max(self.expr_cost(gen.iter), self._iter_factor(gen.iter) * inner)
+        return cost
+
+    def _call_cost(self, call: ast.Call) -> Complexity:
+        name = _call_name(call)
+        if name in self.functions:
+            return self.function_cost(name)
+        if name in PYTHON_CALLS:
+            return PYTHON_CALLS[name]
+        if name in PYTHON_ITERABLE_CALLS and len(call.args) == 1:
+            return LINEAR
+        if name == "pop" and call.args:
+            return LINEAR  # pop(0) shifts the list
+        return CONSTANT
+
+    def _iter_factor(self, node: ast.expr) -> Complexity:
+        """Get how many times a loop over the expression runs."""
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set, ast.Constant)):
+            return CONSTANT
+        if (
+            isinstance(node, ast.Call)
+            and _call_name(node) == "range"
+            and all(isinstance(a, ast.Constant) for a in node.args)
+        ):
+            return CONSTANT
+        return LINEAR
+
+    def _shrinks(self, node: ast.While) -> bool:
+        """Check if a while loop divides or multiplies its state, like a binary search."""
+        for child in ast.walk(node):
+            if isinstance(child, ast.AugAssign) and isinstance(child.op, SHRINKING_OPS):
+                return True
+            if (
+                isinstance(child, ast.Assign)
+                and isinstance(child.value, ast.BinOp)
+                and isinstance(child.value.op, HALVING_OPS)
+            ):
+                return True
+        return False
+
+    def _calls(self, statements: List[ast.stmt], in_loop: bool):
+        """Yield the calls of a function body and whether they're inside a loop."""
+        for node in statements:
+            for child in ast.iter_child_nodes(node):
+                yield from self._node_calls(
+                    child, in_loop or isinstance(node, (ast.For, ast.While))
+                )
+
+    def _node_calls(self, node: ast.AST, in_loop: bool):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            return
+        if isinstance(node, ast.Call):
+            yield node, in_loop
+        loop = isinstance(
+            node, (ast.For, ast.While, ast.comprehension, ast.ListComp, ast.SetComp)
+        )
+        for child in ast.iter_child_nodes(node):
+            yield from self._node_calls(child, in_loop or loop)
+
+    def _is_halving(self, node: ast.expr) -> bool:
+        """Check if a recursive call argument is half of the input."""
+        for child in ast.walk(node):
+            if isinstance(child, ast.BinOp) and isinstance(child.op, HALVING_OPS):
+                return True
+            if isinstance(child, ast.Slice):
+                return True
+            if isinstance(child, ast.Name) and child.id == "mid":
+                return True
+        return False
+
+    def _is_memoized(self, node: ast.FunctionDef) -> bool:
+        for decorator in node.decorator_list:
+            target = decorator.func if isinstance(decorator, ast.Call) else decorator
+            name = getattr(target, "id", getattr(target, "attr", ""))
+            if name in ("cache", "lru_cache"):
+                return True
+        for child in ast.walk(node):
+            name = getattr(child, "id", getattr(child, "attr", None))
+            if isinstance(name, str) and any(h in name.lower() for h in MEMO_HINTS):
+                return True
+        return False
+
+
+# Java and C++
+
+TOKEN_PATTERN = re.compile(
+    r"[A-Za-z_]\w*|\d[\w.]*|>>=|<<=|\+\+|--|->|::|[+\-*/%&|^<>=!]=|&&|\|\||>>|<<|\S"
+)
+COMMENT_OR_LITERAL_PATTERN = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|^\s*#[^\n]*',
+    re.DOTALL | re.MULTILINE,
+)
+NOT_FUNCTIONS = {"if", "for", "while", "switch", "catch", "return", "new", "sizeof"}
+BRACE_CALLS = {
+    "sort": N_LOG_N,
+    "stable_sort": N_LOG_N,
+    "lower_bound": LOG,
+    "upper_bound": LOG,
+    "binary_search": LOG,
+    "binarySearch": LOG,
+    "reverse": LINEAR,
+    "accumulate": LINEAR,
+    "fill": LINEAR,
+    "max_element": LINEAR,
+    "min_element": LINEAR,
+    "indexOf": LINEAR,
+    "substr": LINEAR,
+    "substring": LINEAR,
+    "toCharArray": LINEAR,
+    "memset": LINEAR,
+}
+SHRINKING_TOKENS = {"*=", "/=", ">>=", "<<="}
+
+
+def _tokenize(code: str) -> List[str]:
+    """Split Java or C++ code into tokens, without comments, literals or directives."""
+    return TOKEN_PATTERN.findall(COMMENT_OR_LITERAL_PATTERN.sub(" 0 ", code))
+
+
+class _BraceEstimator:
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.functions = self._find_functions()
+        self._costs: Dict[str, Complexity] = {}
+        self._visiting: Set[str] = set()
+
+    def estimate(self) -> Optional[Complexity]:
+        if not self.functions:
+            return None
+        return max(self.function_cost(name) for name in self.functions)
+
+    def function_cost(self, name: str) -> Complexity:
+        if name in self._costs:
+            return self._costs[name]
+        if name in self._visiting:
+            return CONSTANT  # recursion is accounted for once the function is done
+
+        self._visiting.add(name)
+        start, end = self.functions[name]
+        body = self.range_cost(start, end)
+
+        calls = [
+            (i, in_loop)
+            for i, in_loop in self._calls(start, end)
+            if self.tokens[i] == name
+        ]
+        branching = len(calls) > 1 or any(in_loop for _, in_loop in calls)
+        halving = any(self._is_halving(i) for i, _ in calls)
+        memoized = any(
+            t.lower().startswith(MEMO_HINTS) or "memo" in t.lower()
+            for t in self.tokens[start:end]
+            if t[0].isalpha()
+        )
+        cost = _recursive(body, 2 if branching else len(calls), halving, memoized)
+
+        self._visiting.discard(name)
+        self._costs[name] = cost
+        return cost
+
+    def range_cost(self, i: int, end: int) -> Complexity:
+        """Get the cost of the statements between two token positions."""
+        cost = CONSTANT
+        end = min(end, len(self.tokens))  # code cut off before its closing brackets
+        while i < end:
+            token = self.tokens[i]
+            if token in ("for", "while") and self._at(i + 1) == "(":
+                close = self._match(i + 1)
+                body_end = self._statement_end(close + 1)
+                factor = self._loop_factor(i + 2, close, body_end)
+                inner = max(
+                    self.range_cost(i + 2, close), self.range_cost(close + 1, body_end)
+                )
+                cost = max(cost, factor * inner)
+                i = body_end
+                continue
+            if token == "do":
+                body_end = self._statement_end(i + 1)
+                cost = max(cost, LINEAR * self.range_cost(i + 1, body_end))
+                i = body_end
+                continue
+            if self._at(i + 1) == "(" and token[0].isalpha():
+                cost = max(cost, self._call_cost(token))
+            i += 1
+        return cost
+
+    def _call_cost(self, name: str) -> Complexity:
+        if name in self.functions:
+            return self.function_cost(name)
+        return BRACE_CALLS.get(name, CONSTANT)
+
+    def _loop_factor(self, start: int, close: int, body_end: int) -> Complexity:
+        """Get how many times a loop runs from its header and body."""
+        header = self.tokens[start:close]
+        if ":" in header:  # range-based for loop
+            return LINEAR
+
+        parts = self._split_header(start, close)
+        # A for loop changes its state in the update, a while loop in its body
+        update = parts[2] if len(parts) == 3 else self.tokens[close:body_end]
+        if SHRINKING_TOKENS & set(update) or self._has_halving(update):
+            return LOG
+        if len(parts) == 3 and not parts[1]:
+            return LINEAR  # for (;;)
+
+        # Loops bounded by a literal, like for (int i = 0; i < 26; i++)
+        if len(parts) != 3:
+            return LINEAR
+        variables = {t for t in parts[2] if t[0].isalpha()}
+        condition = parts[1]
+        names = {t for t in condition if t[0].isalpha()}
+        if variables and names <= variables and any(t[0].isdigit() for t in condition):
+            return CONSTANT
+        return LINEAR
+
+    def _split_header(self, start: int, close: int) -> List[List[str]]:
+        parts, current, depth = [], [], 0
+        for token in self.tokens[start:close]:
+            depth += token in "([{"
+            depth -= token in ")]}"
+            if token == ";" and depth == 0:
+                parts.append(current)
+                current = []
+            else:
+                current.append(token)
+        return parts + [current]
+
+    def _has_halving(self, tokens: List[str]) -> bool:
+        pairs = zip(tokens, tokens[1:])
+        return any(a in ("/", ">>") and b in ("2", "1") for a, b in pairs)
+
+    def _is_halving(self, call: int) -> bool:
+        """Check if the arguments of a recursive call are half of the input."""
+        close = self._match(call + 1)
+        args = self.tokens[call + 2 : close]
+        return "mid" in args or self._has_halving(args)
+
+    def _calls(self, start: int, end: int):
+        """Yield the calls in a token range and whether they're inside a loop."""
+        loops = []  # end positions of the loops we're in
+        i = start
+        while i < end:
+            loops = [e for e in loops if e > i]
+            token = self.tokens[i]
+            if token in ("for", "while") and self._at(i + 1) == "(":
+                loops.append(self._statement_end(self._match(i + 1) + 1))
+            elif token == "do":
+                loops.append(self._statement_end(i + 1))
+            elif self._at(i + 1) == "(" and token[0].isalpha():
+                yield i, bool(loops)
+            i += 1
+
+    def _find_functions(self) -> Dict[str, tuple]:
+        """Find the function definitions, as name -> (body start, body end)."""
+        functions = {}
+        i = 0
+        while i < len(self.tokens):
+            token = self.tokens[i]
+            if (
+                self._at(i + 1) == "("
+                and token[0].isalpha()
+                and token not in NOT_FUNCTIONS
+                and self._at(i - 1) not in (".", "->", "new")
+            ):
+                close = self._match(i + 1)
+                j = close + 1
+                # Skip qualifiers like const, noexcept or throws X, Y
+                while self._at(j) is not None and (
+                    self.tokens[j][0].isalpha() or self.tokens[j] in (",", "::")
+                ):
+                    j += 1
+                if self._at(j) == "{":
+                    end = self._match(j)
+                    functions[token] = (j + 1, end)
+                    i = end
+                    continue
+            i += 1
+        return functions
+
+    def _statement_end(self, i: int) -> int:
+        """Get the position after the statement starting at i."""
+        token = self._at(i)
+        if token is None:
+            return len(self.tokens)
+        if token == "{":
+            return min(self._match(i) + 1, len(self.tokens))
+        if token in ("for", "while", "if", "switch") and self._at(i + 1) == "(":
+            end = self._statement_end(self._match(i + 1) + 1)
+            if token == "if" and self._at(end) == "else":
+                end = self._statement_end(end + 1)
+            return end
+        if token == "do":
+            end = self._statement_end(i + 1)  # the body, then while (...);
+            return self._statement_end(end) if self._at(end) == "while" else end
+        depth = 0
+        while i < len(self.tokens):
+            depth += self.tokens[i] in "([{"
+            depth -= self.tokens[i] in ")]}"
+            if self.tokens[i] == ";" and depth <= 0:
+                return i + 1
+            i += 1
+        return i
+
+    def _match(self, i: int) -> int:
+        """Get the position of the bracket closing the one at i."""
+        opening = self.tokens[i]
+        closing = {"(": ")", "[": "]", "{": "}"}[opening]
+        depth = 0
+        for j in range(i, len(self.tokens)):
+            if self.tokens[j] == opening:
+                depth += 1
+            elif self.tokens[j] == closing:
+                depth -= 1
+                if depth == 0:
+                    return j
+        return len(self.tokens)
+
+    def _at(self, i: int) -> Optional[str]:
+        return self.tokens[i] if 0 <= i < len(self.tokens) else None
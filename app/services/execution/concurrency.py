@@ -0,0 +1,197 @@
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+from services.execution.scheduler import ExecutionScheduler
+
+# Pressure stall information of the host and of our cgroup, the worst one counts
+PRESSURE_FILES = {
+    "cpu": ["/proc/pressure/cpu", "/sys/fs/cgroup/cpu.pressure"],
+    "memory": ["/proc/pressure/memory", "/sys/fs/cgroup/memory.pressure"],
+}
+LOADAVG_FILE = "/proc/loadavg"
+MEMINFO_FILE = "/proc/meminfo"
+LOW_MEMORY_RATIO = 0.1  # available memory below this counts as memory pressure
+
+INCREASE_STEP = 1  # slots added per interval while a pool is saturated
+DECREASE_FACTOR = 0.75  # limit kept when the host is congested
+LATENCY_PERCENTILE = 95
+LATENCY_WINDOW = 60  # seconds of finished jobs the latency percentile covers
+
+
+def read_pressure(resource: str) -> Optional[float]:
+    """
+    Read how congested the host is on a resource, as the share of the last 10 seconds
+    (0 to 100) that some task was stalled waiting for it. Without pressure stall
+    information, CPU pressure is estimated from the load average and memory pressure
+    from the available memory.
+
+    :param resource: "cpu" or "memory".
+    :return: The pressure, or None if it can't be read.
+    """
+    values = [_read_psi(path) for path in PRESSURE_FILES[resource]]
+    values = [v for v in values if v is not None]
+    if values:
+        return max(values)
+    return (
+        _estimate_cpu_pressure() if resource == "cpu" else _estimate_memory_pressure()
+    )
+
+
+def _read_psi(path: str) -> Optional[float]:
+    """Read the avg10 of the "some" line of a pressure file."""
+    try:
+        with open(path) as f:
+            for line in f:
+                kind, *fields = line.split()
+                if kind == "some":
+                    return float(dict(field.split("=") for field in fields)["avg10"])
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _estimate_cpu_pressure() -> Optional[float]:
+    try:
+        with open(LOADAVG_FILE) as f:
+            load = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    # Runnable tasks beyond one per core are waiting for a core
+    overload = load / (os.cpu_count() or 1) - 1
+    return min(100.0, max(0.0, overload * 100))
+
+
+def _estimate_memory_pressure() -> Optional[float]:
+    try:
+        with open(MEMINFO_FILE) as f:
+            info = {line.split(":")[0]: int(line.split()[1]) for line in f}
+        available = info["MemAvailable"] / info["MemTotal"]
+    except (OSError, ValueError, IndexError, KeyError, ZeroDivisionError):
+        return None
+    return min(100.0, max(0.0, (1 - available / LOW_MEMORY_RATIO) * 100))
+
+
+class ConcurrencyController:
+    """
+    Adjusts the number of slots of the scheduler's pools at runtime (AIMD): while the
+    host is congested (CPU or memory pressure above the limits, or jobs slower than
+    their latency target, leaving out jobs that hit their time limit) the limit
+    shrinks by DECREASE_FACTOR, and while a pool is
+    saturated without congestion it grows by INCREASE_STEP, within its floor and
+    ceiling.
+
+    :param scheduler: The scheduler whose pools are adjusted.
+    :param bounds: The (floor, ceiling) of the slots of every adjusted pool.
+    :param latency_targets: The p95 job time (seconds) above which a pool is congested.
+    :param cpu_limit: The CPU pressure above which the host is congested.
+    :param memory_limit: The memory pressure above which the host is congested.
+    :param interval: Seconds between adjustments.
+    """
+
+    def __init__(
+        self,
+        scheduler: ExecutionScheduler,
+        bounds: Dict[str, Tuple[int, int]],
+        latency_targets: Dict[str, float],
+        cpu_limit: float,
+        memory_limit: float,
+        interval: float,
+    ):
+        self.scheduler = scheduler
+        self.bounds = bounds
+        self.latency_targets = latency_targets
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.interval = interval
+        self.increases = 0
+        self.decreases = 0
+        self._readings: Dict = {"cpu_pressure": None, "memory_pressure": None}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Adjust the limits in the background until stopped."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def adjust(self):
+        """Read the host's load and adjust the limit of every pool once."""
+        cpu = read_pressure("cpu")
+        memory = read_pressure("memory")
+        self._readings = {"cpu_pressure": cpu, "memory_pressure": memory}
+
+        for pool, (floor, ceiling) in self.bounds.items():
+            limit = self.scheduler.capacities[pool]
+            reason = self._congestion(pool, cpu, memory)
+
+            if reason:
+                new_limit = max(floor, int(limit * DECREASE_FACTOR))
+            elif self._saturated(pool):
+                new_limit = min(ceiling, limit + INCREASE_STEP)
+                reason = "saturated"
+            else:
+                continue
+
+            if new_limit != limit:
+                self.scheduler.set_capacity(pool, new_limit)
+                if new_limit > limit:
+                    self.increases += 1
+                else:
+                    self.decreases += 1
+                    # The next decision waits for jobs that ran under the new limit
+                    self.scheduler.clear_latencies(pool)
+                print(f"Concurrency of {pool}: {limit} -> {new_limit} ({reason})")
+
+    def stats(self) -> Dict:
+        """Get the current limits, the last readings and the decision counters."""
+        return {
+            "limits": {pool: self.scheduler.capacities[pool] for pool in self.bounds},
+            **self._readings,
+            "p95_latency": {
+                pool: self.scheduler.latency_percentile(
+                    pool, LATENCY_PERCENTILE, LATENCY_WINDOW
+                )
+                for pool in self.bounds
+            },
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+    def _congestion(
+        self, pool: str, cpu: Optional[float], memory: Optional[float]
+    ) -> Optional[str]:
+        """Get why a pool is congested, or None if it isn't."""
+        if cpu is not None and cpu > self.cpu_limit:
+            return f"cpu pressure {cpu:.1f}"
+        if memory is not None and memory > self.memory_limit:
+            return f"memory pressure {memory:.1f}"
+        latency = self.scheduler.latency_percentile(
+            pool, LATENCY_PERCENTILE, LATENCY_WINDOW
+        )
+        if latency is not None and latency > self.latency_targets[pool]:
+            return f"p95 latency {latency:.2f}s"
+        return None
+
+    def _saturated(self, pool: str) -> bool:
+        """Check if a pool uses all its slots, so more slots would be used."""
+        return (
+            any(t.pool == pool for t in self.scheduler.waiting)
+            or self.scheduler.running[pool] >= self.scheduler.capacities[pool]
+        )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.adjust()
+            except Exception as e:
+                print(f"Error adjusting concurrency: {e}")
@@ -1,14 +1,63 @@
-import json
+from contextlib import contextmanager
+import glob
+import hashlib
+import io
 import os
+import select
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
 import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+import uuid
 
 from core.config import settings
-from services.execution.types import ExecutionResult
+from services.execution.cache import DiskCache
+from services.execution.cancellation import CancellationToken, on_cancel
+from services.execution.fixtures import FIXTURE_FILE, FixtureStore
+from services.execution.pool import ContainerPool, PooledContainer, make_job_dir
+from services.execution.progress import ProgressReader, progress_path
+from services.execution.sandbox import (
+    SandboxRunner,
+    load_limits,
+    read_results,
+    results_name,
+)
+from services.execution.types import ContainerOutput, ExecutionResult
+from services.execution.usage import (
+    CGROUP_USAGE_COMMAND,
+    cgroup_usage,
+    make_usage,
+    parse_cgroup,
+)
+from services.execution.worker import WorkerProcess
 
 import docker.errors
+from docker.utils import socket as socket_utils
 
+# Precompiled C++ harness header and library, built into the C++ image
+CPP_HARNESS_DIR = "/opt/beatcode"
+# Seconds a worker gets past the time limit to report a timeout itself
+WORKER_GRACE = 1.0
+PREFLIGHT_LABEL = "beatcode.preflight"
+USAGE_FILE = ".beatcode-usage"  # where fresh containers leave their cgroup readings
+# Kills every process of a pooled container but its init and the command itself
+SWEEP_COMMAND = "kill -9 -1 2>/dev/null; exit 0"
+SWEEP_TIMEOUT = 5  # seconds to sweep a pooled container
+USAGE_TIMEOUT = 5  # seconds to read the cgroup of a pooled container
+# Seconds between progress reads of fresh containers, each one is an exec
+FRESH_PROGRESS_INTERVAL = 0.5
+TAIL_TIMEOUT = 5  # seconds to read the end of a file in a container
 
-class DockerRunner:
+
+def _decode(chunks: List[bytes]) -> str:
+    """Join raw output chunks into a string."""
+    return b"".join(chunks).decode("utf-8", errors="replace")
+
+
+class DockerRunner(SandboxRunner):
     """
     A class to run code in a Docker container.
     """
@@ -21,184 +70,1030 @@ class DockerRunner:
             "cpp": settings.DOCKER_IMAGE_CPP,
         }
         self.docker_cpu_limit = settings.DOCKER_CPU_LIMIT
-        self._docker_settings = {}
-        for lang in self.docker_image.keys():
-            mem_limits = [
-                int(x)
-                for x in getattr(settings, f"DOCKER_{lang.upper()}_MEMORY_LIMIT").split(
-                    ","
-                )
-            ]
-            time_limits = [
-                int(x)
-                for x in getattr(settings, f"DOCKER_{lang.upper()}_TIME_LIMIT").split(
-                    ","
-                )
-            ]
-            self._docker_settings[lang] = {
-                "easy": (mem_limits[0], time_limits[0]),
-                "medium": (mem_limits[1], time_limits[1]),
-                "hard": (mem_limits[2], time_limits[2]),
-            }
-        self.last_logs = ""
-        self.last_stderr = ""
-        self.last_status_code = 0
-
-    def get_run_commands(self, lang: str, file_path: str) -> list:
+        self._docker_settings = {
+            lang: load_limits(lang) for lang in self.docker_image.keys()
+        }
+        # Created before the pool, so the directory exists when containers mount it
+        self.fixtures = FixtureStore(
+            settings.FIXTURE_DIR, settings.FIXTURE_MAX_MB * 2**20
+        )
+        self.pool = (
+            ContainerPool(client, self.docker_image)
+            if settings.DOCKER_POOL_ENABLED
+            else None
+        )
+        # The JVM worker lives as long as its pooled container, so it needs the pool
+        self.java_worker_enabled = settings.DOCKER_JAVA_WORKER_ENABLED and bool(
+            self.pool
+        )
+        self.java_worker_max_jobs = settings.DOCKER_JAVA_WORKER_MAX_JOBS
+        self.python_zygote_enabled = settings.DOCKER_PYTHON_ZYGOTE_ENABLED and bool(
+            self.pool
+        )
+        self.resource_accounting = settings.DOCKER_RESOURCE_ACCOUNTING
+        self.compile_cache = (
+            DiskCache(settings.COMPILE_CACHE_DIR, settings.COMPILE_CACHE_MAX_MB * 2**20)
+            if settings.COMPILE_CACHE_MAX_MB > 0
+            else None
+        )
+        self._image_ids = {}  # language -> image ID, so a rebuilt image misses the cache
+        self._compile_locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        self._compile_locks_lock = threading.Lock()
+        # Long-lived containers that only compile, for the pre-flight checks
+        self.preflight_memory_limit = settings.PREFLIGHT_MEMORY_LIMIT
+        self._checkers: Dict[str, PooledContainer] = {}
+        self._checkers_lock = threading.Lock()
+        self._checker_worker_lock = threading.Lock()  # one Java check at a time
+
+    def get_compile_commands(self, lang: str, file_name: str) -> Optional[str]:
+        """
+        Get the shell command that compiles the code, if the language needs one.
+
+        :param lang: The language of the code.
+        :param file_name: The name of the file to compile.
+        :return: The compile command, or None for interpreted languages.
+        """
+        base_name = file_name.split(".")[0]
+
+        if lang == "java":
+            return f"javac -cp /lib/*:. {file_name}"
+        elif lang == "cpp":
+            return (
+                f"g++ -std=c++17 -I{CPP_HARNESS_DIR} -o {base_name} {file_name} "
+                f"-L{CPP_HARNESS_DIR} -lbeatcode -ljsoncpp"
+            )
+        return None
+
+    def get_syntax_command(self, lang: str, file_name: str) -> Optional[str]:
+        """
+        Get the shell command that checks the code compiles without building it, for
+        languages whose checker has no worker.
+
+        :param lang: The language of the code.
+        :param file_name: The name of the file to check.
+        """
+        if lang == "cpp":
+            return f"g++ -std=c++17 -fsyntax-only -I{CPP_HARNESS_DIR} {file_name}"
+        return None
+
+    def get_run_commands(
+        self,
+        lang: str,
+        file_name: str,
+        fixture_path: str,
+        test_time_limit: int,
+        compile: bool = True,
+    ) -> list:
         """
         Get the command to run the code in a Docker container.
 
         :param lang: The language of the code.
-        :param file_path: The path to the file to run.
+        :param file_name: The name of the file to run.
+        :param fixture_path: The path of the test data inside the container.
+        :param test_time_limit: The CPU time limit (ms) of each test.
+        :param compile: Whether to compile the code first, False if it's already compiled.
         :return: The command to run the code in a Docker container.
         """
-        file_name = os.path.basename(file_path)
         base_name = file_name.split(".")[0]
 
         if lang == "python":
-            return ["python", file_name]
+            return ["python", file_name, fixture_path, str(test_time_limit)]
 
         # Needs to compile first before running unlike Python
         elif lang == "java":
-            return [
-                "sh",
-                "-c",
-                f"javac -cp /lib/*:/code {file_name} && java -cp /lib/*:/code {base_name}",
-            ]
+            command = (
+                f"java -cp /lib/*:. {base_name} {fixture_path} . {test_time_limit}"
+            )
+        elif lang == "cpp":
+            command = f"./{base_name} {fixture_path} {test_time_limit}"
+        else:
+            raise ValueError(f"Unsupported language: {lang}")
+
+        if compile:
+            command = f"{self.get_compile_commands(lang, file_name)} && {command}"
+        return ["sh", "-c", command]
+
+    def get_measured_command(self, command: list) -> list:
+        """
+        Wrap a command so it leaves the cgroup readings of its container in USAGE_FILE
+        when it's done, for containers that are gone before they could be read.
+
+        :param command: The command to wrap.
+        """
+        return [
+            "sh",
+            "-c",
+            f'"$@"; status=$?; ({CGROUP_USAGE_COMMAND}) 2>/dev/null '
+            f">/code/{USAGE_FILE}; exit $status",
+            "sh",
+            *command,
+        ]
+
+    def get_worker_command(self, lang: str) -> list:
+        """
+        Get the command that starts the long-lived worker of a language, see
+        docker/java/worker/BeatcodeWorker.java and docker/python/zygote/zygote.py.
+
+        :param lang: The language of the worker.
+        """
+        if lang == "python":
+            return ["python", "/opt/beatcode/zygote.py"]
+        return [
+            "java",
+            "-Xshare:auto",
+            "-XX:SharedArchiveFile=/opt/beatcode/worker.jsa",
+            "-cp",
+            "/lib/*:/opt/beatcode/beatcode-worker.jar",
+            "BeatcodeWorker",
+            "--max-jobs",
+            str(self.java_worker_max_jobs),
+        ]
+
+    def get_artifacts(self, lang: str, dir_path: str, file_name: str) -> List[str]:
+        """
+        Get the compiled files produced by the compile command.
 
+        :param lang: The language of the code.
+        :param dir_path: The host directory the code was compiled in.
+        :param file_name: The name of the compiled file.
+        """
+        if lang == "java":
+            return glob.glob(os.path.join(dir_path, "*.class"))
         elif lang == "cpp":
-            return [
-                "sh",
-                "-c",
-                f"g++ -std=c++17 -o {base_name} {file_name} -ljsoncpp && ./{base_name}",
-            ]
+            binary = os.path.join(dir_path, file_name.split(".")[0])
+            return [binary] if os.path.exists(binary) else []
+        return []
 
-        raise ValueError(f"Unsupported language: {lang}")
+    def get_compile_key(self, lang: str, file_name: str, code: str) -> Optional[str]:
+        """
+        Get the compile cache key of the code, a hash of everything that affects the
+        compiled output: the compiler image, the compile command and the source.
+
+        :param lang: The language of the code.
+        :param file_name: The name of the file to compile.
+        :param code: The content of the file to compile.
+        :return: The key, or None if the code isn't compiled or the cache is disabled.
+        """
+        compile_command = self.get_compile_commands(lang, file_name)
+        if not self.compile_cache or not compile_command:
+            return None
+
+        if lang not in self._image_ids:
+            try:
+                self._image_ids[lang] = self.client.images.get(
+                    self.docker_image[lang]
+                ).id
+            except Exception:
+                return None
+
+        digest = hashlib.sha256()
+        for part in (self._image_ids[lang], compile_command, code):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def start(self):
+        """
+        Remove checker containers left over from a previous run and pre-warm the
+        container pool, called once when the server starts.
+        """
+        for container in self.client.containers.list(
+            all=True, filters={"label": PREFLIGHT_LABEL}
+        ):
+            try:
+                container.remove(force=True)
+            except Exception:
+                pass
+        if self.pool:
+            self.pool.warm(self.get_pool_keys())
+
+    def stop(self):
+        """Tear down the container pool and checkers, called once when the server stops."""
+        if self.pool:
+            self.pool.shutdown()
+        for lang, checker in list(self._checkers.items()):
+            self._stop_checker(lang, checker)
+
+    def get_pool_keys(self) -> List[Tuple[str, int]]:
+        """Get every distinct (language, memory limit) tier from the configured limits."""
+        keys = []
+        for lang, limits in self._docker_settings.items():
+            for memory_limit, _, _ in limits.values():
+                if (lang, memory_limit) not in keys:
+                    keys.append((lang, memory_limit))
+        return keys
 
     def run_container(
-        self, lang: str, file_path: str, difficulty: str, line_offset: int
+        self,
+        lang: str,
+        file_name: str,
+        code: str,
+        difficulty: str,
+        line_offset: int,
+        fixture: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        cancel: Optional[CancellationToken] = None,
     ) -> ExecutionResult:
         """
         Run the code in a Docker container.
+        This blocks until the run is over, so call it from a worker thread.
 
         :param lang: The language of the code.
-        :param file_path: The path to the file to run.
+        :param file_name: The name of the file to run.
+        :param code: The content of the file to run.
         :param difficulty: The difficulty of the problem.
         :param line_offset: The line offset for error logs.
+        :param fixture: The test data the code loads at runtime.
+        :param on_progress: Called from the running thread whenever a test finishes.
+        :param cancel: Kills the container of the run when cancelled.
         :return: The result of the execution.
         """
         # Get the memory and time limits for the difficulty level.
-        memory_limit, time_limit = self._docker_settings[lang][difficulty.lower()]
-        dir_path = os.path.dirname(file_path)
-        if not dir_path:
-            dir_path = "."
-
-        try:
-            # Run the container with the specified constraints
-            container = self.client.containers.run(
-                self.docker_image[lang],
-                self.get_run_commands(lang, file_path),
-                volumes={
-                    dir_path: {
-                        "bind": "/code",  # bind the directory to /code in the container
-                        "mode": "rw",  # read write
-                    }
-                },
-                working_dir="/code",
-                mem_limit=f"{memory_limit}m",
-                nano_cpus=int(self.docker_cpu_limit * 1e9),
-                network_disabled=True,
-                privileged=False,
-                # read_only=True,
-                detach=True,  # run the container in the background
-            )
+        memory_limit, time_limit, test_time_limit = self._docker_settings[lang][
+            difficulty.lower()
+        ]
 
-            try:
-                # Wait for the container to finish and get the logs
-                result = container.wait(timeout=time_limit / 1000)
-                self.last_logs = container.logs().decode("utf-8")
-                self.last_stderr = container.logs(stdout=False, stderr=True).decode(
-                    "utf-8"
+        try:
+            if not self.pool:
+                return self._run_fresh(
+                    lang,
+                    file_name,
+                    code,
+                    fixture,
+                    memory_limit,
+                    time_limit,
+                    test_time_limit,
+                    line_offset,
+                    on_progress,
+                    cancel,
                 )
-                self.last_status_code = result["StatusCode"]
-
-                # Check if the container stopped unexpectedly
-                if result["StatusCode"] != 0:
-                    if (
-                        result["StatusCode"] == 137
-                    ):  # SIGKILL - likely fired when memory limit is exceeded
-                        return ExecutionResult(
-                            success=False,
-                            message="Runtime Error Detected: Memory Limit Exceeded",
-                        )
-                    return ExecutionResult(
-                        success=False,
-                        message="Runtime Error Detected\n" + self.last_logs.strip(),
-                        line_offset=line_offset,
-                    )
 
-                if self.last_stderr.strip():
-                    return ExecutionResult(
-                        success=False,
-                        message="Runtime Error Detected\n" + self.last_stderr.strip(),
-                        line_offset=line_offset,
-                    )
+            # Pooled containers share the fixture directory, fresh ones get a copy
+            fixture_path = self.fixtures.put(fixture)
+            if lang == "java" and self.java_worker_enabled:
+                return self._run_worker(
+                    lang,
+                    file_name,
+                    code,
+                    fixture_path,
+                    memory_limit,
+                    time_limit,
+                    test_time_limit,
+                    line_offset,
+                    on_progress,
+                    cancel,
+                )
+            if lang == "python" and self.python_zygote_enabled:
+                return self._run_zygote(
+                    lang,
+                    file_name,
+                    code,
+                    fixture_path,
+                    memory_limit,
+                    time_limit,
+                    test_time_limit,
+                    line_offset,
+                    on_progress,
+                    cancel,
+                )
+            return self._run_pooled(
+                lang,
+                file_name,
+                code,
+                fixture_path,
+                memory_limit,
+                time_limit,
+                test_time_limit,
+                line_offset,
+                on_progress,
+                cancel,
+            )
+        except Exception as _:
+            print(traceback.format_exc())
+            return ExecutionResult(
+                success=False,
+                message="Execution Error",
+            )
 
-                base_name = os.path.basename(file_path).split(".")[0]
-                results_file = os.path.join(dir_path, f"{base_name}-results.txt")
-
-                if os.path.exists(results_file):
-                    with open(results_file, "r") as f:
-                        execution_data = json.load(f)
-                    os.remove(results_file)
-                    return ExecutionResult(
-                        success=True,
-                        test_results=execution_data["hidden_results"]["test_results"],
-                        sample_results=execution_data["sample_results"]["test_results"],
-                        line_offset=line_offset,
+    def check_syntax(
+        self, lang: str, file_name: str, code: str, timeout: float
+    ) -> Optional[ContainerOutput]:
+        """
+        Check that the code compiles, without running it, in the long-lived checker
+        container of its language. Checkers are kept apart from the sandboxes: Java
+        compiles in the checker's JVM worker, C++ only runs the compiler's front end.
+        This blocks until the check is over, so call it from a worker thread.
+
+        :param lang: The language of the code, java or cpp.
+        :param file_name: The name of the file, the test runner's so errors match.
+        :param code: The content of the file.
+        :param timeout: Seconds the check may take.
+        :return: The compiler output, or None if the check couldn't tell, e.g. it
+            timed out or the checker was busy.
+        """
+        deadline = time.monotonic() + timeout
+        checker = None
+        try:
+            checker = self._checker(lang)
+            job_id = uuid.uuid4().hex
+            dir_path = os.path.join(checker.workspace, job_id)
+            os.makedirs(dir_path)
+            try:
+                with open(os.path.join(dir_path, file_name), "w") as f:
+                    f.write(code)
+                if lang == "java":
+                    output = self._check_java(
+                        checker, f"/code/{job_id}", file_name, deadline
                     )
                 else:
-                    return ExecutionResult(
-                        success=False,
-                        message="Test Runner Error: Results file not found\n"
-                        + self.last_logs.strip(),
+                    output = self._exec(
+                        checker.container,
+                        ["sh", "-c", self.get_syntax_command(lang, file_name)],
+                        f"/code/{job_id}",
+                        deadline - time.monotonic(),
                     )
-            except Exception as e:
-                # Check for timeout, else raise the exception
-                self.last_logs = container.logs().decode("utf-8")
-                self.last_stderr = container.logs(stdout=False, stderr=True).decode(
-                    "utf-8"
+            finally:
+                shutil.rmtree(dir_path, ignore_errors=True)
+        except Exception:
+            print(traceback.format_exc())
+            if checker:
+                self._stop_checker(lang, checker)
+            return None
+
+        if output is None:
+            return None
+        if output.status_code is None:
+            # The compiler may still be running, the next check gets a new checker
+            self._stop_checker(lang, checker)
+        # Anything but a clean exit or compile errors, e.g. a crash, can't tell
+        return output if output.status_code in (0, 1) else None
+
+    def _check_java(
+        self, checker: PooledContainer, workdir: str, file_name: str, deadline: float
+    ) -> Optional[ContainerOutput]:
+        """
+        Compile a file with the worker of the Java checker, starting it if needed.
+
+        :return: The output of the compiler, None if the worker was busy until the
+            deadline or exited.
+        """
+        if not self._checker_worker_lock.acquire(
+            timeout=max(0, deadline - time.monotonic())
+        ):
+            return None
+        try:
+            if not checker.worker or not checker.worker.alive:
+                checker.worker = WorkerProcess(
+                    self.client, checker.container, self.get_worker_command("java")
                 )
-                if "timed out" in str(e):
-                    return ExecutionResult(
-                        success=False,
-                        message="Runtime Error Detected: Time Limit Exceeded",
+            response = self._worker_request(
+                checker,
+                {"action": "compile", "dir": workdir, "file": file_name},
+                deadline - time.monotonic(),
+            )
+        finally:
+            self._checker_worker_lock.release()
+        if response is not None and response.get("recycle"):
+            return None
+        return self._worker_output(response)
+
+    def _checker(self, lang: str) -> PooledContainer:
+        """Get the checker container of a language, starting it if there is none."""
+        with self._checkers_lock:
+            if lang in self._checkers:
+                return self._checkers[lang]
+
+            workspace = tempfile.mkdtemp(prefix="beatcode-preflight-")
+            try:
+                container = self.client.containers.run(
+                    self.docker_image[lang],
+                    ["tail", "-f", "/dev/null"],  # keep the container alive
+                    volumes={workspace: {"bind": "/code", "mode": "rw"}},
+                    working_dir="/code",
+                    mem_limit=f"{self.preflight_memory_limit}m",
+                    nano_cpus=int(self.docker_cpu_limit * 1e9),
+                    network_disabled=True,
+                    privileged=False,
+                    labels={PREFLIGHT_LABEL: lang},
+                    detach=True,
+                )
+            except Exception:
+                shutil.rmtree(workspace, ignore_errors=True)
+                raise
+
+            checker = PooledContainer(
+                container, (lang, self.preflight_memory_limit), workspace
+            )
+            self._checkers[lang] = checker
+            return checker
+
+    def _stop_checker(self, lang: str, checker: PooledContainer):
+        """Remove a checker's container and workspace, forget it if current."""
+        with self._checkers_lock:
+            if self._checkers.get(lang) is checker:
+                del self._checkers[lang]
+        if checker.worker:
+            checker.worker.close()
+        try:
+            checker.container.remove(force=True)
+        except Exception:
+            pass
+        shutil.rmtree(checker.workspace, ignore_errors=True)
+
+    def _run_pooled(
+        self,
+        lang: str,
+        file_name: str,
+        code: str,
+        fixture_path: str,
+        memory_limit: int,
+        time_limit: int,
+        test_time_limit: int,
+        line_offset: int,
+        on_progress: Optional[Callable[[Dict], None]],
+        cancel: Optional[CancellationToken],
+    ) -> ExecutionResult:
+        """
+        Run the code via exec inside a pre-started container from the pool.
+        Each job gets its own directory in the container's workspace.
+        """
+        pooled = self.pool.acquire(lang, memory_limit)
+        job_id = uuid.uuid4().hex
+        dir_path = os.path.join(pooled.workspace, job_id)
+        healthy = False
+
+        try:
+            make_job_dir(dir_path)
+            if pooled.cgroup is None:  # the baseline of the container's first job
+                pooled.cgroup = self._read_cgroup(pooled.container)
+            with open(os.path.join(dir_path, file_name), "w") as f:
+                f.write(code)
+
+            workdir = f"/code/{job_id}"
+            deadline = time.monotonic() + time_limit / 1000
+            compile_key = self.get_compile_key(lang, file_name, code)
+            compile_command = self.get_compile_commands(lang, file_name)
+
+            # Compile as its own exec on a cache miss, so the artifacts are stored
+            # before any submitted code had a chance to touch them
+            with self._compiling(compile_key):
+                if compile_command and not self._restore_artifacts(
+                    compile_key, dir_path
+                ):
+                    output = self._exec(
+                        pooled.container,
+                        ["sh", "-c", compile_command],
+                        workdir,
+                        deadline - time.monotonic(),
+                        cancel,
                     )
-                else:
-                    raise e
+                    if output.status_code != 0:
+                        output.usage = self._pooled_usage(pooled)
+                        healthy = output.status_code is not None
+                        return self._build_result(output, None, line_offset)
+                    if compile_key:
+                        self.compile_cache.put(
+                            compile_key, self.get_artifacts(lang, dir_path, file_name)
+                        )
 
-            finally:
-                # Remove the container after it stops
-                try:
-                    container.remove(force=True)
-                except:
-                    pass
+            progress = ProgressReader(progress_path(dir_path, file_name), on_progress)
+            with progress.watch():
+                output = self._exec(
+                    pooled.container,
+                    self.get_run_commands(
+                        lang, file_name, fixture_path, test_time_limit, compile=False
+                    ),
+                    workdir,
+                    deadline - time.monotonic(),
+                    cancel,
+                )
+            output.usage = self._pooled_usage(pooled)
+            healthy = output.status_code == 0
+            return self._build_result(
+                output, read_results(dir_path, file_name), line_offset, progress
+            )
+        finally:
+            shutil.rmtree(dir_path, ignore_errors=True)
+            # A killed container can't be reused, whatever its last exec returned
+            healthy = healthy and not (cancel and cancel.cancelled)
+            self.pool.release(pooled, healthy and self._sweep(pooled))
 
-        except Exception as _:
-            print(traceback.format_exc())
-            return ExecutionResult(
-                success=False,
-                message="Execution Error",
+    def _run_worker(
+        self,
+        lang: str,
+        file_name: str,
+        code: str,
+        fixture_path: str,
+        memory_limit: int,
+        time_limit: int,
+        test_time_limit: int,
+        line_offset: int,
+        on_progress: Optional[Callable[[Dict], None]],
+        cancel: Optional[CancellationToken],
+    ) -> ExecutionResult:
+        """
+        Compile and run the code through the long-lived worker of a pooled container,
+        starting the worker first if the container doesn't have a live one.
+        """
+        pooled = self.pool.acquire(lang, memory_limit)
+        job_id = uuid.uuid4().hex
+        dir_path = os.path.join(pooled.workspace, job_id)
+        healthy = False
+
+        try:
+            make_job_dir(dir_path)
+            if pooled.cgroup is None:  # the baseline of the container's first job
+                pooled.cgroup = self._read_cgroup(pooled.container)
+            with open(os.path.join(dir_path, file_name), "w") as f:
+                f.write(code)
+
+            workdir = f"/code/{job_id}"
+            deadline = time.monotonic() + time_limit / 1000
+            compile_key = self.get_compile_key(lang, file_name, code)
+
+            if not pooled.worker or not pooled.worker.alive:
+                pooled.worker = WorkerProcess(
+                    self.client, pooled.container, self.get_worker_command(lang)
+                )
+
+            # Jobs of the same code (e.g. the shards of a submission) compile it once
+            with self._compiling(compile_key):
+                if not self._restore_artifacts(compile_key, dir_path):
+                    response = self._worker_request(
+                        pooled,
+                        {"action": "compile", "dir": workdir, "file": file_name},
+                        deadline - time.monotonic(),
+                        cancel,
+                    )
+                    output = self._worker_output(response)
+                    if output.status_code != 0:
+                        output.usage = self._pooled_usage(pooled)
+                        healthy = response is not None
+                        return self._build_result(output, None, line_offset)
+                    if compile_key:
+                        self.compile_cache.put(
+                            compile_key, self.get_artifacts(lang, dir_path, file_name)
+                        )
+
+            # The worker enforces the time limit itself, the grace period only covers
+            # a worker that stopped answering
+            remaining = deadline - time.monotonic()
+            progress = ProgressReader(progress_path(dir_path, file_name), on_progress)
+            with progress.watch():
+                response = self._worker_request(
+                    pooled,
+                    {
+                        "action": "run",
+                        "dir": workdir,
+                        "class": file_name.split(".")[0],
+                        "args": [fixture_path, workdir, str(test_time_limit)],
+                        "timeout": max(1, int(remaining * 1000)),
+                    },
+                    remaining + WORKER_GRACE,
+                    cancel,
+                )
+            output = self._worker_output(response)
+            output.usage = self._pooled_usage(pooled)
+            healthy = response is not None
+            return self._build_result(
+                output,
+                read_results(dir_path, file_name),
+                line_offset,
+                progress,
+            )
+        finally:
+            shutil.rmtree(dir_path, ignore_errors=True)
+            # A killed container can't be reused, whatever its last exec returned
+            healthy = healthy and not (cancel and cancel.cancelled)
+            self.pool.release(pooled, healthy and self._sweep(pooled))
+
+    def _run_zygote(
+        self,
+        lang: str,
+        file_name: str,
+        code: str,
+        fixture_path: str,
+        memory_limit: int,
+        time_limit: int,
+        test_time_limit: int,
+        line_offset: int,
+        on_progress: Optional[Callable[[Dict], None]],
+        cancel: Optional[CancellationToken],
+    ) -> ExecutionResult:
+        """
+        Run the code in a child forked by the zygote of a pooled container, starting
+        the zygote first if the container doesn't have a live one. The code goes with
+        the request, only the results and progress files are written to the job's
+        directory.
+        """
+        pooled = self.pool.acquire(lang, memory_limit)
+        job_id = uuid.uuid4().hex
+        dir_path = os.path.join(pooled.workspace, job_id)
+        healthy = False
+
+        try:
+            make_job_dir(dir_path)
+            workdir = f"/code/{job_id}"
+            timeout = time_limit / 1000
+
+            if not pooled.worker or not pooled.worker.alive:
+                pooled.worker = WorkerProcess(
+                    self.client, pooled.container, self.get_worker_command(lang)
+                )
+
+            progress = ProgressReader(progress_path(dir_path, file_name), on_progress)
+            with progress.watch():
+                response = self._worker_request(
+                    pooled,
+                    {
+                        "action": "run",
+                        "dir": workdir,
+                        "file": file_name,
+                        "code": code,
+                        "args": [fixture_path, str(test_time_limit)],
+                        "timeout": time_limit,
+                    },
+                    timeout + WORKER_GRACE,
+                    cancel,
+                )
+            output = self._worker_output(response)
+            # A child killed for its memory leaves the zygote, and the container, fine
+            healthy = response is not None
+            return self._build_result(
+                output,
+                read_results(dir_path, file_name),
+                line_offset,
+                progress,
+            )
+        finally:
+            shutil.rmtree(dir_path, ignore_errors=True)
+            # A killed container can't be reused, whatever its last exec returned
+            healthy = healthy and not (cancel and cancel.cancelled)
+            self.pool.release(pooled, healthy and self._sweep(pooled))
+
+    def _sweep(self, pooled: PooledContainer) -> bool:
+        """
+        Kill whatever a job left running in a pooled container, so nothing it started
+        can touch the files of the next job, which may be another user's. A live
+        worker cleans up after its jobs itself and asks to be recycled when it can't.
+
+        :param pooled: The container.
+        :return: Whether the container was swept, if not it must not be reused.
+        """
+        if pooled.worker and pooled.worker.alive:
+            return True
+        try:
+            output = self._exec(
+                pooled.container, ["sh", "-c", SWEEP_COMMAND], "/", SWEEP_TIMEOUT
+            )
+        except docker.errors.APIError:
+            return False  # e.g. the container was killed
+        return output.status_code == 0
+
+    def _worker_request(
+        self,
+        pooled,
+        message: dict,
+        timeout: float,
+        cancel: Optional[CancellationToken] = None,
+    ) -> Optional[dict]:
+        """
+        Send a request to the worker of a pooled container, dropping the worker if it
+        asked to be recycled or stopped answering.
+
+        :param pooled: The pooled container running the worker.
+        :param message: The request.
+        :param timeout: Seconds to wait for the response.
+        :param cancel: Kills the container when cancelled, which ends the request.
+        :return: The response, or None if the worker didn't answer in time.
+        """
+        with on_cancel(cancel, lambda: self._kill(pooled.container)):
+            response = pooled.worker.request(message, max(0, timeout))
+        if response is None or response.get("recycle"):
+            pooled.worker.close()
+            pooled.worker = None
+        return response
+
+    def _worker_output(self, response: Optional[dict]) -> ContainerOutput:
+        """
+        Convert a worker response into the output of an exec, with the usage of the
+        run if the worker measured it.
+
+        :param response: The response, None if the worker didn't answer in time.
+        """
+        if response is None:
+            return ContainerOutput(None)
+        output = ContainerOutput(
+            response["status"],
+            response["stdout"] + response["stderr"],
+            response["stderr"],
+        )
+        usage = response.get("usage")
+        if usage and self.resource_accounting:
+            output.usage = make_usage(
+                usage["cpu_time"], usage["peak_memory"], usage["oom_killed"]
+            )
+        return output
+
+    def _read_cgroup(self, container) -> Optional[Dict[str, int]]:
+        """
+        Read the cgroup of a running container, see usage.parse_cgroup.
+
+        :param container: The container.
+        :return: The reading, None if resource accounting is off or it failed.
+        """
+        if not self.resource_accounting:
+            return None
+        try:
+            output = self._exec(
+                container, ["sh", "-c", CGROUP_USAGE_COMMAND], "/", USAGE_TIMEOUT
+            )
+        except docker.errors.APIError:
+            return None  # e.g. the container was killed
+        return parse_cgroup(output.logs)
+
+    def _pooled_usage(self, pooled: PooledContainer) -> Optional[Dict]:
+        """
+        Get the usage of the job that just ran in a pooled container, from how much
+        its cgroup changed since the reading before the job. The container runs one
+        job at a time and nothing else between them, so the change is the job's.
+
+        :param pooled: The container.
+        """
+        before = pooled.cgroup
+        pooled.cgroup = self._read_cgroup(pooled.container)
+        return cgroup_usage(pooled.cgroup, before) if before else None
+
+    def _exec(
+        self,
+        container,
+        command: list,
+        workdir: str,
+        timeout: float,
+        cancel: Optional[CancellationToken] = None,
+    ) -> ContainerOutput:
+        """
+        Exec a command in a running container and collect its output.
+
+        :param container: The container to exec in.
+        :param command: The command to run.
+        :param workdir: The working directory inside the container.
+        :param timeout: Seconds before the command is considered timed out.
+        :param cancel: Kills the container when cancelled, which ends the command.
+        :return: The output of the command, with no status code if it timed out.
+        """
+        exec_id = self.client.api.exec_create(container.id, command, workdir=workdir)[
+            "Id"
+        ]
+        sock = self.client.api.exec_start(exec_id, socket=True)
+        with on_cancel(cancel, lambda: self._kill(container)):
+            finished, stdout, stderr = self._read_stream(sock, timeout)
+        if not finished:
+            return ContainerOutput(None, _decode(stdout + stderr), _decode(stderr))
+
+        status_code = self.client.api.exec_inspect(exec_id)["ExitCode"]
+        return ContainerOutput(status_code, _decode(stdout + stderr), _decode(stderr))
+
+    def _read_stream(
+        self, sock, timeout: float
+    ) -> Tuple[bool, List[bytes], List[bytes]]:
+        """
+        Read a multiplexed exec or attach stream until it ends, then close it.
+
+        :param sock: The stream.
+        :param timeout: Seconds before giving up on the stream.
+        :return: Whether the stream ended in time, and the stdout and stderr chunks.
+        """
+        deadline = time.monotonic() + timeout
+        stdout, stderr = [], []
+
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                    return False, stdout, stderr
+
+                stream, size = socket_utils.next_frame_header(sock)
+                if size < 0:  # EOF, the command has exited
+                    return True, stdout, stderr
+                data = socket_utils.read_exactly(sock, size) if size else b""
+                (stderr if stream == socket_utils.STDERR else stdout).append(data)
+        finally:
+            sock.close()
+
+    def _run_fresh(
+        self,
+        lang: str,
+        file_name: str,
+        code: str,
+        fixture: str,
+        memory_limit: int,
+        time_limit: int,
+        test_time_limit: int,
+        line_offset: int,
+        on_progress: Optional[Callable[[Dict], None]],
+        cancel: Optional[CancellationToken],
+    ) -> ExecutionResult:
+        """
+        Run the code in a new container that is removed afterwards. Nothing of the
+        job touches the host's disk: the code and test data are uploaded into the
+        container as an archive, the output comes back over a single attach stream
+        and the results and progress files are read out of the container.
+        """
+        compile_key = self.get_compile_key(lang, file_name, code)
+        files = {file_name: code, FIXTURE_FILE: fixture}
+        # Compiled files are only read from the cache here, compiling and running in
+        # one container would let the submitted code tamper with them before storing
+        artifacts = self.compile_cache.get(compile_key) if compile_key else None
+        try:
+            archive = self._archive(files, artifacts)
+        except OSError:  # evicted while reading
+            artifacts = None
+            archive = self._archive(files)
+
+        command = self.get_run_commands(
+            lang, file_name, FIXTURE_FILE, test_time_limit, compile=artifacts is None
+        )
+        if self.resource_accounting:
+            command = self.get_measured_command(command)
+
+        # Create the container with the specified constraints
+        container = self.client.containers.create(
+            self.docker_image[lang],
+            command,
+            working_dir="/code",
+            mem_limit=f"{memory_limit}m",
+            nano_cpus=int(self.docker_cpu_limit * 1e9),
+            network_disabled=True,
+            privileged=False,
+        )
+
+        try:
+            container.put_archive("/code", archive)
+            # Attached before the start, so no output is missed
+            sock = self.client.api.attach_socket(
+                container.id, params={"stdout": 1, "stderr": 1, "stream": 1, "logs": 1}
             )
+            container.start()
 
-    def get_last_logs(self) -> str:
-        """Returns combined stdout/stderr logs from last container run"""
-        return self.last_logs
+            progress_file = progress_path("/code", file_name)
+            progress = ProgressReader(
+                progress_file,
+                on_progress,
+                read=lambda offset: self._read_from(container, progress_file, offset),
+                interval=FRESH_PROGRESS_INTERVAL,
+            )
+            # Registered once it runs, a container cancelled before that is killed
+            # right away
+            with on_cancel(cancel, lambda: self._kill(container)), progress.watch():
+                # The stream ends when the container stops, a timeout leaves no status
+                finished, stdout, stderr = self._read_stream(sock, time_limit / 1000)
+            status_code = container.wait()["StatusCode"] if finished else None
 
-    def get_last_errors(self) -> str:
-        """Returns stderr logs from last container run"""
-        return self.last_stderr
+            output = ContainerOutput(
+                status_code, _decode(stdout + stderr), _decode(stderr)
+            )
+            results = None
+            if finished:
+                results = self._read_file(
+                    container, os.path.join("/code", results_name(file_name))
+                )
+                if self.resource_accounting:
+                    readings = self._read_file(container, f"/code/{USAGE_FILE}")
+                    output.usage = cgroup_usage(
+                        parse_cgroup(readings.decode()) if readings else None
+                    )
+            return self._build_result(
+                output,
+                results.decode("utf-8", errors="replace") if results else None,
+                line_offset,
+                progress,
+            )
+        finally:
+            # Remove the container after it stops
+            try:
+                container.remove(force=True)
+            except:
+                pass
+
+    def _archive(self, files: Dict[str, str], artifacts: Optional[str] = None) -> bytes:
+        """
+        Pack the files of a job into a tar archive, for put_archive.
 
-    def get_last_status(self) -> int:
-        """Returns exit status code from last container run"""
-        return self.last_status_code
+        :param files: The name and content of every file.
+        :param artifacts: A directory of cached compiled files to add as well.
+        """
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            for name, content in files.items():
+                data = content.encode("utf-8")
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+            if artifacts:
+                for name in os.listdir(artifacts):
+                    tar.add(os.path.join(artifacts, name), arcname=name)
+        return buffer.getvalue()
+
+    def _kill(self, container):
+        """Kill the container of a cancelled run, which ends the run's stream."""
+        try:
+            container.kill()
+        except docker.errors.APIError:
+            pass  # already stopped
+
+    def _read_file(self, container, path: str) -> Optional[bytes]:
+        """
+        Read a file out of a container.
+
+        :param container: The container, running or stopped.
+        :param path: The path of the file inside the container.
+        :return: The content of the file, None if it doesn't exist.
+        """
+        try:
+            chunks, _ = container.get_archive(path)
+            archive = b"".join(chunks)
+        except docker.errors.NotFound:
+            return None
+
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            member = tar.next()
+            f = tar.extractfile(member) if member else None
+            return f.read() if f else None
+
+    def _read_from(self, container, path: str, offset: int) -> Optional[bytes]:
+        """
+        Read a growing file out of a container from an offset on. Only the new bytes
+        are sent with `tail` while the container runs, the whole file is copied out
+        once it stopped.
+
+        :param container: The container, running or stopped.
+        :param path: The path of the file inside the container.
+        :param offset: The number of bytes already read.
+        :return: The bytes after the offset, None if the file doesn't exist.
+        """
+        try:
+            exec_id = self.client.api.exec_create(
+                container.id,
+                ["tail", "-c", f"+{offset + 1}", os.path.basename(path)],
+                workdir=os.path.dirname(path),
+            )["Id"]
+            sock = self.client.api.exec_start(exec_id, socket=True)
+        except docker.errors.APIError:
+            # e.g. the container stopped
+            content = self._read_file(container, path)
+            return content[offset:] if content is not None else None
+
+        finished, stdout, _ = self._read_stream(sock, TAIL_TIMEOUT)
+        if not finished or self.client.api.exec_inspect(exec_id)["ExitCode"] != 0:
+            return None
+        return b"".join(stdout)
+
+    @contextmanager
+    def _compiling(self, compile_key: Optional[str]):
+        """
+        Hold the compilation of some code while the block runs, so jobs of the same
+        code compile it one at a time and all but the first find it in the cache.
+
+        :param compile_key: The compile cache key of the code, None to not wait.
+        """
+        if not compile_key:
+            yield
+            return
+
+        with self._compile_locks_lock:
+            lock, holders = self._compile_locks.get(compile_key, (threading.Lock(), 0))
+            self._compile_locks[compile_key] = (lock, holders + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._compile_locks_lock:
+                lock, holders = self._compile_locks[compile_key]
+                if holders == 1:
+                    del self._compile_locks[compile_key]
+                else:
+                    self._compile_locks[compile_key] = (lock, holders - 1)
+
+    def _restore_artifacts(self, compile_key: Optional[str], dir_path: str) -> bool:
+        """
+        Copy cached compiled files into the job directory.
+
+        :param compile_key: The compile cache key of the code.
+        :param dir_path: The host directory of the job.
+        :return: True on a cache hit.
+        """
+        if not compile_key:
+            return False
+
+        path = self.compile_cache.get(compile_key)
+        if not path:
+            return False
+
+        try:
+            for f in os.listdir(path):
+                shutil.copy2(os.path.join(path, f), dir_path)
+        except OSError:  # evicted while copying
+            return False
+        return True
@@ -0,0 +1,154 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from core.config import settings
+from services.execution.cancellation import CancellationToken
+from services.execution.docker import DockerRunner
+from services.execution.process import ProcessRunner
+from services.execution.sandbox import SandboxRunner
+from services.execution.test_generator import (
+    CppTestGenerator,
+    JavaTestGenerator,
+    PythonTestGenerator,
+)
+from services.execution.types import ExecutionResult
+
+RUNNER_NAME = "BeatcodeRunner"  # file and class name of the generated test runner
+
+
+def make_runners(docker_runner: DockerRunner) -> Dict[str, SandboxRunner]:
+    """
+    Get the sandbox runner of every language, Docker unless SANDBOX_BACKENDS picks
+    another one, e.g. "python=process".
+
+    :param docker_runner: The Docker runner of this host.
+    """
+    runners = {lang: docker_runner for lang in docker_runner.docker_image}
+    for entry in settings.SANDBOX_BACKENDS.split(","):
+        if not entry.strip():
+            continue
+        lang, _, backend = (part.strip() for part in entry.partition("="))
+        if backend == "process" and lang in ProcessRunner.languages:
+            runners[lang] = ProcessRunner(
+                docker_runner.fixtures, settings.PROCESS_SANDBOX_DIR
+            )
+        elif backend != "docker" or lang not in runners:
+            raise ValueError(f"Unsupported sandbox backend: {entry.strip()}")
+    return runners
+
+
+class JobExecutor:
+    """
+    A place where jobs run. A job is a dict with the code to run and its tests:
+    lang, code, method_name, test_data, sample_data, difficulty, compare_func and
+    problem_id (None to skip the harness cache).
+    """
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def run(
+        self, job: Dict, on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> ExecutionResult:
+        """
+        Run a job and wait for its result. Cancelling the call stops the job.
+
+        :param job: The job to run.
+        :param on_progress: Called on the event loop with every progress event.
+        :return: The result of the job.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {}
+
+
+class LocalExecutor(JobExecutor):
+    """
+    Runs jobs in sandboxes on this host.
+
+    :param runners: The sandbox runner of every language, see make_runners.
+    :param max_workers: The maximum number of jobs running at once.
+    """
+
+    def __init__(self, runners: Dict[str, SandboxRunner], max_workers: int):
+        self.runners = runners
+        self.test_generators = {
+            "python": PythonTestGenerator(),
+            "java": JavaTestGenerator(),
+            "cpp": CppTestGenerator(),
+        }
+        # The Docker SDK is synchronous, so runs happen on worker threads to keep the
+        # event loop free
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="execution"
+        )
+
+    async def start(self):
+        for runner in set(self.runners.values()):
+            await asyncio.to_thread(runner.start)
+
+    async def stop(self):
+        for runner in set(self.runners.values()):
+            await asyncio.to_thread(runner.stop)
+
+    async def run(
+        self, job: Dict, on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> ExecutionResult:
+        loop = asyncio.get_running_loop()
+        cancel = CancellationToken()
+        try:
+            return await loop.run_in_executor(
+                self._executor,
+                self.run_job,
+                job,
+                # Progress comes from the job's thread, hand it over to the loop
+                (
+                    (lambda event: loop.call_soon_threadsafe(on_progress, event))
+                    if on_progress
+                    else None
+                ),
+                cancel,
+            )
+        except asyncio.CancelledError:
+            # The thread can't be interrupted, but the sandbox it waits on can be
+            cancel.cancel()
+            raise
+
+    def run_job(
+        self,
+        job: Dict,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> ExecutionResult:
+        """
+        Generate the test runner file and run it, this blocks so it runs on a worker thread.
+        """
+        if cancel and cancel.cancelled:  # before the thread got to it
+            return ExecutionResult(success=False, message="Execution Cancelled")
+        gen = self.test_generators[job["lang"]]
+
+        # Every job runs in its own directory, so the runner file always has the same
+        # name and identical code generates identical (compile cache friendly) files
+        harness = gen.get_harness(
+            job["problem_id"],
+            RUNNER_NAME,
+            job["method_name"],
+            job["test_data"],
+            job["sample_data"],
+            job["compare_func"],
+        )
+        return self.runners[job["lang"]].run_container(
+            job["lang"],
+            RUNNER_NAME + gen.get_file_extension(),
+            harness.render(job["code"]),
+            job["difficulty"],
+            gen.get_line_offset(),
+            harness.fixture,
+            on_progress,
+            cancel,
+        )
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import tempfile
+
+from services.execution.cache import DiskCache
+
+FIXTURE_MOUNT = "/fixtures"  # where the fixture directory is mounted in containers
+FIXTURE_FILE = "tests.json"
+
+
+class FixtureStore:
+    """
+    Test data of problems, written once to disk and mounted read-only into every
+    sandbox container so the generated runners only have to load it.
+
+    Fixtures are addressed by the hash of their content, so a problem's fixture is
+    shared by all its submissions and changed test data gets a new fixture.
+
+    :param root: The directory holding the fixtures, ideally on a tmpfs.
+    :param max_bytes: The maximum total size of all fixtures.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.cache = DiskCache(root, max_bytes)
+
+    def put(self, content: str) -> str:
+        """
+        Store a fixture if it isn't stored yet.
+
+        :param content: The fixture content, as generated by the test generator.
+        :return: The path of the fixture inside the containers.
+        """
+        key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+        if self.cache.get(key) is None:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, FIXTURE_FILE)
+                with open(path, "w") as f:
+                    f.write(content)
+                if self.cache.put(key, [path]) is None:
+                    raise ValueError("Test data is larger than the fixture cache")
+
+        return f"{FIXTURE_MOUNT}/{key}/{FIXTURE_FILE}"
@@ -0,0 +1,182 @@
+import math
+import random
+import string
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.execution.complexity import (
+    CONSTANT,
+    LINEAR,
+    LOG,
+    N_LOG_N,
+    Complexity,
+)
+
+SEED = 0  # the inputs are the same every time, so their fixture stays cached
+NOISE_MS = 0.5  # time differences below this are measurement noise
+NOISE_RATIO = 0.05  # and so are relative differences below this
+MIN_SIZES = 3  # sizes that must finish in time for a fit
+
+# Growth curves a measurement can fit, simplest first, as log f(n)
+CANDIDATES: List[Tuple[Complexity, Callable[[int], float]]] = [
+    (CONSTANT, lambda n: 0.0),
+    (LOG, lambda n: math.log(math.log(n))),
+    (LINEAR, lambda n: math.log(n)),
+    (N_LOG_N, lambda n: math.log(n) + math.log(math.log(n))),
+    (Complexity(degree=2), lambda n: 2 * math.log(n)),
+    (Complexity(degree=3), lambda n: 3 * math.log(n)),
+]
+
+
+def generate_input(generator: List[Dict], n: int, rng: random.Random) -> str:
+    """
+    Generate a test case of size n from a problem's input generator, which describes
+    every argument of the method in order:
+
+        [{"type": "int_array", "min": -1000, "max": 1000}, {"type": "int", "size": true}]
+
+    Types are "int" (n itself if "size" is set), "int_array" (n values, sorted if
+    "sorted" is set), "int_matrix" (about n values in a square) and "string" (n
+    characters from "alphabet").
+
+    :param generator: The input generator of the problem.
+    :param n: The size of the input.
+    :param rng: The source of the random values.
+    :return: The test case, in the same format as the problem's test cases.
+    """
+    return " ".join(
+        f"--arg{i}={_generate_value(spec, n, rng)}"
+        for i, spec in enumerate(generator, start=1)
+    )
+
+
+def _generate_value(spec: Dict, n: int, rng: random.Random) -> str:
+    low, high = spec.get("min", 0), spec.get("max", 1000)
+    kind = spec["type"]
+
+    if kind == "int":
+        return str(n if spec.get("size") else rng.randint(low, high))
+    if kind == "int_array":
+        values = [rng.randint(low, high) for _ in range(n)]
+        if spec.get("sorted"):
+            values.sort()
+        return "[" + ",".join(map(str, values)) + "]"
+    if kind == "int_matrix":
+        side = max(1, math.isqrt(n))
+        rows = (
+            "[" + ",".join(str(rng.randint(low, high)) for _ in range(side)) + "]"
+            for _ in range(side)
+        )
+        return "[" + ",".join(rows) + "]"
+    if kind == "string":
+        alphabet = spec.get("alphabet", string.ascii_lowercase)
+        return '"' + "".join(rng.choice(alphabet) for _ in range(n)) + '"'
+    raise ValueError(f"Unknown input type: {kind}")
+
+
+def measurement_inputs(
+    generator: List[Dict], sizes: List[int], repeats: int
+) -> List[Tuple[int, str]]:
+    """
+    Generate the inputs of a measurement, smallest first so a timeout only loses the
+    largest ones. Every input runs `repeats` times to filter out noise.
+
+    :param generator: The input generator of the problem.
+    :param sizes: The sizes to measure.
+    :param repeats: The runs per size.
+    :return: Pairs of sizes and test cases.
+    """
+    rng = random.Random(SEED)
+    inputs = []
+    for n in sorted(sizes):
+        test_case = generate_input(generator, n, rng)
+        inputs += [(n, test_case)] * repeats
+    return inputs
+
+
+def summarize_measurement(
+    inputs: List[Tuple[int, str]], results: List[Dict]
+) -> Optional[Dict]:
+    """
+    Fit the times of a measurement run to a growth curve.
+
+    :param inputs: The inputs of the run, from measurement_inputs.
+    :param results: The results of the inputs, in the same order; may be cut short.
+    :return: The best fit complexity and a confidence between 0 and 1, or None if too
+        few sizes finished in time.
+    """
+    # CPU time can be counted in scheduler ticks, too coarse for small inputs. Wall
+    # time isn't, and measurements run while the server is idle so they're close.
+    fastest: Dict[int, float] = {}
+    for (n, _), result in zip(inputs, results):
+        if result.get("error") or result.get("wall_time") is None:
+            continue  # covers time limits too, they're reported as errors
+        fastest[n] = min(fastest.get(n, math.inf), result["wall_time"])
+
+    sizes = sorted(fastest)
+    fit = fit_complexity(sizes, [fastest[n] for n in sizes])
+    if fit is None:
+        return None
+    complexity, confidence = fit
+    return {"complexity": complexity, "confidence": confidence}
+
+
+def fit_complexity(sizes: List[int], times: List[float]) -> Optional[Tuple[str, float]]:
+    """
+    Find the growth curve that best explains how the time grows with the size. Every
+    candidate is fitted as a + b * f(n), weighing errors relative to the time; the
+    simplest one that fits within the noise of the best wins.
+
+    :param sizes: The input sizes, all above 1.
+    :param times: The time (ms) of each size.
+    :return: The complexity in Big O notation and a confidence between 0 and 1, or None
+        with too few sizes.
+    """
+    if len(sizes) < MIN_SIZES:
+        return None
+
+    # Timing noise grows with the time, so errors are relative to it
+    weights = [1 / (t + NOISE_MS) ** 2 for t in times]
+    mean = sum(w * t for w, t in zip(weights, times)) / sum(weights)
+    total = sum(w * (t - mean) ** 2 for w, t in zip(weights, times))
+    noise = len(times) * NOISE_RATIO**2
+    errors = [_fit_error(sizes, times, weights, log_f) for _, log_f in CANDIDATES]
+    best = min(errors)
+    chosen = next(i for i, e in enumerate(errors) if e <= best + noise)
+
+    # How well the curve fits, times how clearly it beats the others
+    goodness = 1 - errors[chosen] / (total + noise)
+    if chosen == 0:
+        separation = 1 - (total - best) / (total + noise)
+    else:
+        rival = min(e for i, e in enumerate(errors) if i != chosen)
+        separation = 1 - (errors[chosen] + noise) / (rival + noise)
+    confidence = max(0.0, min(1.0, goodness * separation))
+    return str(CANDIDATES[chosen][0]), round(confidence, 2)
+
+
+def _fit_error(
+    sizes: List[int],
+    times: List[float],
+    weights: List[float],
+    log_f: Callable[[int], float],
+) -> float:
+    """Get the weighted squared error of the least squares fit of a + b * f(n), a, b >= 0."""
+    top = log_f(max(sizes))
+    xs = [math.exp(log_f(n) - top) for n in sizes]  # f(n) / f(max), can't overflow
+    weight = sum(weights)
+    mean_x = sum(w * x for w, x in zip(weights, xs)) / weight
+    mean_t = sum(w * t for w, t in zip(weights, times)) / weight
+
+    spread = sum(w * (x - mean_x) ** 2 for w, x in zip(weights, xs))
+    covariance = sum(
+        w * (x - mean_x) * (t - mean_t) for w, x, t in zip(weights, xs, times)
+    )
+    b = max(0.0, covariance / spread) if spread > 0 else 0.0
+    a = mean_t - b * mean_x
+    if a < 0:
+        # The overhead can't be negative, a curve only fits with one if it's wrong
+        a = 0.0
+        b = sum(w * x * t for w, x, t in zip(weights, xs, times)) / sum(
+            w * x * x for w, x in zip(weights, xs)
+        )
+    return sum(w * (t - a - b * x) ** 2 for w, x, t in zip(weights, xs, times))
@@ -0,0 +1,259 @@
+import os
+import shutil
+import tempfile
+import threading
+import traceback
+from typing import Dict, Iterable, List, Tuple
+import uuid
+
+from core.config import settings
+from services.execution.fixtures import FIXTURE_MOUNT
+
+import docker
+
+POOL_LABEL = "beatcode.pool"
+# Pooled containers run jobs of different users, so they run as nobody on a read-only
+# root, with no capabilities: a job can only leave files in the workspace and /tmp
+SANDBOX_USER = "65534:65534"
+TMPFS = {"/tmp": "size=64m"}
+
+
+def make_job_dir(path: str):
+    """Create the directory of a job in a workspace, writable by the sandbox user."""
+    os.makedirs(path)
+    os.chmod(path, 0o777)
+
+
+class PooledContainer:
+    """
+    A pre-started sandbox container handed out by the ContainerPool.
+
+    :param container: The Docker container object.
+    :param key: The (language, memory limit) tier the container belongs to.
+    :param workspace: The host directory mounted at /code inside the container.
+    :param overflow: Whether the container was created beyond the pool size.
+    """
+
+    def __init__(
+        self,
+        container,
+        key: Tuple[str, int],
+        workspace: str,
+        overflow: bool = False,
+    ):
+        self.container = container
+        self.key = key
+        self.workspace = workspace
+        self.overflow = overflow
+        self.uses = 0
+        self.worker = None  # long-lived WorkerProcess started in the container, if any
+        self.cgroup = None  # the last reading of its cgroup, see usage.parse_cgroup
+
+
+class ContainerPool:
+    """
+    Keeps pre-started, network-disabled sandbox containers per language and memory tier,
+    so a submission only pays for an exec instead of a full create/start/remove cycle.
+    """
+
+    def __init__(self, client: docker.DockerClient, images: Dict[str, str]):
+        self.client = client
+        self.images = images
+        self.cpu_limit = settings.DOCKER_CPU_LIMIT
+        self.size = settings.DOCKER_POOL_SIZE
+        self.min_idle = min(settings.DOCKER_POOL_MIN_IDLE, self.size)
+        self.max_uses = settings.DOCKER_POOL_MAX_USES
+        self.pids_limit = settings.DOCKER_POOL_PIDS_LIMIT
+        self.fixture_dir = settings.FIXTURE_DIR
+        self.recycle_policy = settings.DOCKER_POOL_RECYCLE_POLICY.strip().lower()
+        if self.recycle_policy not in ("always", "on_failure"):
+            raise ValueError(f"Unsupported recycle policy: {self.recycle_policy}")
+
+        # Every container gets its own workspace so jobs can't see each other's files
+        self.root = os.path.join(tempfile.gettempdir(), "beatcode-sandbox")
+        self._idle: Dict[Tuple[str, int], List[PooledContainer]] = {}
+        self._total: Dict[Tuple[str, int], int] = {}
+        self._replenishing = set()
+        self._lock = threading.Lock()
+
+    def warm(self, keys: Iterable[Tuple[str, int]]):
+        """
+        Remove containers left over from a previous run and pre-start `min_idle`
+        containers for every tier.
+
+        :param keys: The (language, memory limit) tiers to warm up.
+        """
+        for container in self.client.containers.list(
+            all=True, filters={"label": POOL_LABEL}
+        ):
+            try:
+                container.remove(force=True)
+            except Exception:
+                pass
+
+        for key in keys:
+            self._replenish(key)
+
+    def acquire(self, lang: str, memory_limit: int) -> PooledContainer:
+        """
+        Take an idle container for the given tier, starting a new one if none is idle.
+        Containers started while the tier is at full size are discarded on release.
+
+        :param lang: The language of the code.
+        :param memory_limit: The memory limit (mb) of the tier.
+        :return: The container to run the submission in.
+        """
+        key = (lang, memory_limit)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            pooled = idle.pop() if idle else None
+            overflow = False
+            if pooled is None:
+                overflow = self._total.get(key, 0) >= self.size
+                if not overflow:
+                    self._total[key] = self._total.get(key, 0) + 1
+
+        if pooled is None:
+            try:
+                pooled = self._create(key, overflow)
+            except Exception:
+                if not overflow:
+                    with self._lock:
+                        self._total[key] -= 1
+                raise
+
+        self._replenish_async(key)
+        return pooled
+
+    def release(self, pooled: PooledContainer, healthy: bool):
+        """
+        Return a container to the pool, or destroy it according to the recycle policy.
+
+        :param pooled: The container to return.
+        :param healthy: False if the run was killed or failed in a way that may have
+            left the container in a bad state, or what it left running wasn't killed.
+        """
+        pooled.uses += 1
+        recycle = (
+            pooled.overflow
+            or self.recycle_policy == "always"
+            or (self.recycle_policy == "on_failure" and not healthy)
+            or pooled.uses >= self.max_uses
+        )
+
+        if recycle:
+            self._destroy(pooled)
+            self._replenish_async(pooled.key)
+        else:
+            with self._lock:
+                self._idle.setdefault(pooled.key, []).append(pooled)
+
+    def shutdown(self):
+        """Destroy every idle container, used when the server stops."""
+        with self._lock:
+            idle = [c for containers in self._idle.values() for c in containers]
+            self._idle.clear()
+        for pooled in idle:
+            self._destroy(pooled)
+
+    def _create(self, key: Tuple[str, int], overflow: bool = False) -> PooledContainer:
+        """
+        Start a sandbox container that idles until a submission is exec'd in it.
+
+        :param key: The (language, memory limit) tier of the container.
+        :param overflow: Whether the container is created beyond the pool size.
+        """
+        lang, memory_limit = key
+        workspace = os.path.join(self.root, uuid.uuid4().hex)
+        os.makedirs(workspace)
+        # Only what the sandbox user creates in it is its own
+        os.chmod(workspace, 0o1777)
+
+        try:
+            container = self.client.containers.run(
+                self.images[lang],
+                ["tail", "-f", "/dev/null"],  # keep the container alive
+                volumes={
+                    workspace: {"bind": "/code", "mode": "rw"},
+                    self.fixture_dir: {"bind": FIXTURE_MOUNT, "mode": "ro"},
+                },
+                working_dir="/code",
+                mem_limit=f"{memory_limit}m",
+                nano_cpus=int(self.cpu_limit * 1e9),
+                network_disabled=True,
+                privileged=False,
+                user=SANDBOX_USER,
+                read_only=True,
+                tmpfs=TMPFS,
+                cap_drop=["ALL"],
+                security_opt=["no-new-privileges"],
+                pids_limit=self.pids_limit,
+                labels={POOL_LABEL: lang},
+                detach=True,
+            )
+        except Exception:
+            shutil.rmtree(workspace, ignore_errors=True)
+            raise
+
+        return PooledContainer(container, key, workspace, overflow)
+
+    def _destroy(self, pooled: PooledContainer):
+        """
+        Remove the container and its workspace.
+
+        :param pooled: The container to destroy.
+        """
+        if pooled.worker:
+            pooled.worker.close()
+        try:
+            pooled.container.remove(force=True)
+        except Exception:
+            pass
+        shutil.rmtree(pooled.workspace, ignore_errors=True)
+
+        if not pooled.overflow:
+            with self._lock:
+                self._total[pooled.key] -= 1
+
+    def _replenish(self, key: Tuple[str, int]):
+        """
+        Start containers until the tier has `min_idle` idle ones (or is full).
+
+        :param key: The (language, memory limit) tier to top up.
+        """
+        try:
+            while True:
+                with self._lock:
+                    idle = len(self._idle.get(key, []))
+                    total = self._total.get(key, 0)
+                    if idle >= self.min_idle or total >= self.size:
+                        return
+                    self._total[key] = total + 1
+
+                try:
+                    pooled = self._create(key)
+                except Exception:
+                    with self._lock:
+                        self._total[key] -= 1
+                    print(traceback.format_exc())
+                    return
+
+                with self._lock:
+                    self._idle.setdefault(key, []).append(pooled)
+        finally:
+            with self._lock:
+                self._replenishing.discard(key)
+
+    def _replenish_async(self, key: Tuple[str, int]):
+        """
+        Top up the tier in a background thread so the caller doesn't wait on it.
+
+        :param key: The (language, memory limit) tier to top up.
+        """
+        with self._lock:
+            if key in self._replenishing:
+                return
+            if len(self._idle.get(key, [])) >= self.min_idle:
+                return
+            self._replenishing.add(key)
+        threading.Thread(target=self._replenish, args=(key,), daemon=True).start()
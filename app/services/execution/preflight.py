@@ -0,0 +1,146 @@
+import ast
+import asyncio
+import traceback
+from typing import Dict, Iterable, Optional, Tuple
+import warnings
+
+from services.execution.docker import DockerRunner
+from services.execution.executor import RUNNER_NAME
+from services.execution.test_generator import (
+    CppTestGenerator,
+    JavaTestGenerator,
+    PythonTestGenerator,
+    TestGenerator,
+)
+from services.execution.types import ContainerOutput, ExecutionResult
+
+WARMUP_TIMEOUT = 60  # seconds the first check of a checker gets, it starts a JVM
+PYTHON_IMAGE_VERSION = (3, 9)  # the Python of the Python image, docker/python
+
+
+class PreflightChecker:
+    """
+    Rejects code that doesn't compile before it waits for a sandbox, with the error
+    the sandbox would have shown. The code is checked with the generated source that
+    comes before it, so the file name and line numbers match a sandbox run.
+
+    Python is compiled in-process, which parses the code without running any of it,
+    with the grammar of the Python version the sandbox runs, so syntax newer than
+    the sandbox's (e.g. `match` on 3.9) is rejected too. Java and C++ compile in the checker containers of
+    the Docker runner, so they are only checked on hosts that run sandboxes. A check
+    that can't tell, e.g. it timed out, lets the code through to the sandbox.
+
+    :param docker_runner: The Docker runner of this host, None if the sandboxes run
+        on execution workers.
+    :param languages: The languages to check.
+    :param timeout: Seconds a Java or C++ check may take.
+    :param python_version: The (major, minor) Python version of the sandbox, not
+        newer than the server's.
+    """
+
+    def __init__(
+        self,
+        docker_runner: Optional[DockerRunner],
+        languages: Iterable[str],
+        timeout: float,
+        python_version: Tuple[int, int] = PYTHON_IMAGE_VERSION,
+    ):
+        self.docker = docker_runner
+        self.timeout = timeout
+        self.python_version = python_version
+        self.generators: Dict[str, TestGenerator] = {
+            "python": PythonTestGenerator(),
+            "java": JavaTestGenerator(),
+            "cpp": CppTestGenerator(),
+        }
+        self.languages = {
+            lang
+            for lang in languages
+            if lang in self.generators and (lang == "python" or docker_runner)
+        }
+        self.checked = 0
+        self.rejected = 0
+        self.undecided = 0  # checks that timed out or failed, left to the sandbox
+        self._background = set()  # keeps the warm-ups alive
+
+    async def start(self):
+        """
+        Start the Java and C++ checkers in the background, so the first checks don't
+        pay for their containers and the JVM.
+        """
+        for lang in self.languages - {"python"}:
+            task = asyncio.create_task(
+                asyncio.to_thread(self._check, lang, "", WARMUP_TIMEOUT)
+            )
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def check(self, lang: str, code: str) -> Optional[ExecutionResult]:
+        """
+        Check that the code compiles.
+
+        :param lang: The programming language of the code.
+        :param code: The submitted code.
+        :return: The result to reject the code with, or None to let it through.
+        """
+        if lang not in self.languages:
+            return None
+
+        if lang == "python":
+            output = self._check(lang, code)
+        else:
+            output = await asyncio.to_thread(self._check, lang, code, self.timeout)
+
+        self.checked += 1
+        if output is None:
+            self.undecided += 1
+            return None
+        if output.status_code == 0:
+            return None
+
+        self.rejected += 1
+        return ExecutionResult(
+            success=False,
+            message="Runtime Error Detected\n" + output.logs.strip(),
+            line_offset=self.generators[lang].get_line_offset(),
+        )
+
+    def stats(self) -> Dict:
+        """Get the counters of the checks, for monitoring."""
+        return {
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "undecided": self.undecided,
+        }
+
+    def _check(
+        self, lang: str, code: str, timeout: Optional[float] = None
+    ) -> Optional[ContainerOutput]:
+        """
+        Compile the code after the prelude of the test runner.
+
+        :param lang: The programming language of the code.
+        :param code: The submitted code.
+        :param timeout: Seconds a Java or C++ check may take.
+        :return: The output of the compiler, None if the check couldn't tell.
+        """
+        generator = self.generators[lang]
+        file_name = RUNNER_NAME + generator.get_file_extension()
+        source = generator.get_prelude() + code
+        if lang != "python":
+            return self.docker.check_syntax(lang, file_name, source, timeout)
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")  # e.g. invalid escape sequences
+                tree = ast.parse(source, file_name, feature_version=self.python_version)
+                compile(tree, file_name, "exec", dont_inherit=True)
+        except SyntaxError as e:
+            # What the interpreter prints when it can't compile the runner
+            return ContainerOutput(
+                1, "".join(traceback.format_exception_only(type(e), e))
+            )
+        except (ValueError, RecursionError, MemoryError):
+            # e.g. expressions nested too deep for this process
+            return None
+        return ContainerOutput(0)
@@ -0,0 +1,186 @@
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import traceback
+from typing import Callable, Dict, List, Optional
+
+from services.execution import sandbox_launcher
+from services.execution.cancellation import CancellationToken, on_cancel
+from services.execution.fixtures import FIXTURE_MOUNT, FixtureStore
+from services.execution.progress import ProgressReader, progress_path
+from services.execution.sandbox import SandboxRunner, load_limits, read_results
+from services.execution.types import ContainerOutput, ExecutionResult
+from services.execution.usage import rusage_usage
+
+WORKDIR = "/code"  # the job directory inside the sandbox, like in the containers
+FILE_SIZE_LIMIT_MB = 64  # largest file a run can write, the results are the largest
+MAX_OPEN_FILES = 64
+# Shared libraries the interpreter may load when the submitted code imports a module
+LIBRARY_DIRS = ["/lib", "/lib64", "/usr/lib", "/usr/lib64", "/usr/local/lib"]
+LIBRARY_FILES = ["/etc/ld.so.cache"]
+
+
+class MeasuredPopen(subprocess.Popen):
+    """A Popen that keeps the rusage of the process when it's reaped, see os.wait4."""
+
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        try:
+            pid, status, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return super()._try_wait(wait_flags)  # already reaped, Popen handles it
+        if pid == self.pid:
+            self.rusage = rusage
+        return pid, status
+
+
+class ProcessRunner(SandboxRunner):
+    """
+    Runs Python test runners in a process sandbox instead of a container, which
+    saves the container's startup on every run. The runner runs in a child
+    process (see sandbox_launcher.py) under its own user, mount, network, IPC and
+    UTS namespaces, with a read-only root holding only the Python installation,
+    rlimits on memory, CPU time, written files and open files, and a seccomp filter
+    that forbids new processes, sockets, signals to other processes and changes to
+    the sandbox.
+
+    Jobs run on the server's Python rather than the Python image, and the host must
+    allow unprivileged user namespaces (Docker's default seccomp profile doesn't).
+
+    :param fixtures: The fixture store, shared with the Docker runner.
+    :param work_dir: The directory the job directories are created in, ideally a
+        tmpfs.
+    """
+
+    languages = ["python"]
+
+    def __init__(self, fixtures: FixtureStore, work_dir: str):
+        self.fixtures = fixtures
+        self.work_dir = work_dir
+        self.limits = {lang: load_limits(lang) for lang in self.languages}
+        os.makedirs(work_dir, exist_ok=True)
+
+    def start(self):
+        """Check that this host can set up the sandbox, so a misconfiguration fails early."""
+        result = self.run_container("python", "check.py", "", "easy", 0, "{}")
+        if "Sandbox setup failed" in (result.message or ""):
+            raise RuntimeError(result.message)
+
+    def run_container(
+        self,
+        lang: str,
+        file_name: str,
+        code: str,
+        difficulty: str,
+        line_offset: int,
+        fixture: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> ExecutionResult:
+        memory_limit, time_limit, test_time_limit = self.limits[lang][
+            difficulty.lower()
+        ]
+        job_dir = tempfile.mkdtemp(dir=self.work_dir)
+        dir_path = os.path.join(job_dir, "code")
+        root = os.path.join(job_dir, "root")
+
+        try:
+            fixture_path = self.fixtures.put(fixture)
+            os.makedirs(dir_path)
+            os.makedirs(root)
+            with open(os.path.join(dir_path, file_name), "w") as f:
+                f.write(code)
+
+            config = {
+                "root": root,
+                "binds": self._binds(dir_path),
+                "workdir": WORKDIR,
+                "file": file_name,
+                "args": [fixture_path, str(test_time_limit)],
+                "memory_mb": memory_limit,
+                # The wall clock limit below is the real one, this stops busy loops
+                "cpu_seconds": -(-time_limit // 1000) + 1,
+                "file_size_mb": FILE_SIZE_LIMIT_MB,
+                "max_files": MAX_OPEN_FILES,
+            }
+            progress = ProgressReader(progress_path(dir_path, file_name), on_progress)
+            with progress.watch():
+                output = self._run(config, time_limit / 1000, cancel)
+            return self._build_result(
+                output, read_results(dir_path, file_name), line_offset, progress
+            )
+        except Exception as _:
+            print(traceback.format_exc())
+            return ExecutionResult(
+                success=False,
+                message="Execution Error",
+            )
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def _binds(self, dir_path: str) -> List[List]:
+        """Get the mounts of the sandbox: [host path, sandbox path, writable]."""
+        prefix = os.path.realpath(sys.base_prefix)
+        binds = [[prefix, sys.base_prefix, False]]
+        for path in LIBRARY_DIRS + LIBRARY_FILES:
+            real = os.path.realpath(path)
+            if os.path.exists(real) and not real.startswith(prefix + os.sep):
+                binds.append([real, path, False])
+        binds.append([self.fixtures.root, FIXTURE_MOUNT, False])
+        binds.append([dir_path, WORKDIR, True])
+        return binds
+
+    def _run(
+        self, config: Dict, timeout: float, cancel: Optional[CancellationToken] = None
+    ) -> ContainerOutput:
+        """
+        Run the launcher and collect its output.
+
+        :param config: The launcher config.
+        :param timeout: Seconds of wall clock time the run gets.
+        :param cancel: Kills the launcher when cancelled.
+        :return: The output, with no status code if the run timed out.
+        """
+        process = MeasuredPopen(
+            [
+                sys.executable,
+                "-I",  # no environment variables, user site or current directory
+                "-S",  # no site-packages, like the Python image
+                sandbox_launcher.__file__,
+                json.dumps(config),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={},
+            close_fds=True,
+        )
+        try:
+            with on_cancel(cancel, process.kill):
+                stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            stdout, stderr = process.communicate()
+            return ContainerOutput(
+                None,
+                (stdout + stderr).decode("utf-8", errors="replace"),
+                usage=rusage_usage(process.rusage) if process.rusage else None,
+            )
+
+        status_code = process.returncode
+        if status_code == -signal.SIGXCPU:  # over the CPU time limit
+            status_code = None
+        elif status_code < 0:  # killed by a signal, reported like the shell does
+            status_code = 128 - status_code
+        return ContainerOutput(
+            status_code,
+            (stdout + stderr).decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace"),
+            # The memory limit makes allocations fail, nothing is OOM killed
+            rusage_usage(process.rusage) if process.rusage else None,
+        )
@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+PROGRESS_SUFFIX = (
+    "-progress.jsonl"  # {file_name}-progress.jsonl, next to the results file
+)
+POLL_INTERVAL = 0.1
+
+
+class ProgressReader:
+    """
+    Reads the progress file a test runner appends to while it runs: a first line with
+    the number of tests, then one line per finished test:
+
+        {"type": "start", "hidden": 10, "sample": 3}
+        {"type": "test", "sample": false, "index": 0, "result": {...}}
+
+    :param path: The host path of the progress file.
+    :param callback: Called with a progress event for every finished test.
+    :param read: Reads the progress file from an offset on instead, None while it
+        can't, for runners whose files aren't on this host.
+    :param interval: Seconds between polls, longer when reading costs more.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        callback: Optional[Callable[[Dict], None]] = None,
+        read: Optional[Callable[[int], Optional[bytes]]] = None,
+        interval: float = POLL_INTERVAL,
+    ):
+        self.path = path
+        self.callback = callback
+        self.read = read
+        self.interval = interval
+        self.totals = {False: 0, True: 0}  # sample -> number of tests
+        self.results: Dict[bool, List[Dict]] = {False: [], True: []}
+        self._offset = 0
+        self._partial = b""
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """Read the lines appended since the last poll."""
+        with self._lock:
+            if self.read:
+                data = self.read(self._offset)
+                if data is None:
+                    return
+            else:
+                try:
+                    with open(self.path, "rb") as f:
+                        f.seek(self._offset)
+                        data = f.read()
+                except OSError:
+                    return
+            self._offset += len(data)
+
+            *lines, self._partial = (self._partial + data).split(b"\n")
+            for line in lines:
+                try:
+                    self._handle(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    continue  # not written by the runner
+
+    @contextmanager
+    def watch(self):
+        """Poll in a background thread while the block runs, if there is a callback."""
+        if not self.callback:
+            yield
+            return
+
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(self.interval):
+                self.poll()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            self.poll()
+
+    def summary(self) -> Dict:
+        """Get the summary of the hidden tests finished so far."""
+        return {
+            "total_tests": self.totals[False],
+            "passed_tests": len([r for r in self.results[False] if r.get("passed")]),
+        }
+
+    def _handle(self, line: Dict):
+        """
+        Record a progress line and report finished tests.
+
+        :param line: The parsed line.
+        """
+        if line["type"] == "start":
+            self.totals = {False: line["hidden"], True: line["sample"]}
+            return
+
+        sample = bool(line["sample"])
+        self.results[sample].append(line["result"])
+        if self.callback:
+            self.callback(
+                {
+                    "sample": sample,
+                    "index": line["index"],
+                    "passed": line["result"].get("passed"),
+                    "completed": len(self.results[sample]),
+                    "total": self.totals[sample],
+                }
+            )
+
+
+def progress_path(dir_path: str, file_name: str) -> str:
+    """Get the host path of the progress file of a runner."""
+    return os.path.join(dir_path, file_name.split(".")[0] + PROGRESS_SUFFIX)
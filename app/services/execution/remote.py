@@ -0,0 +1,479 @@
+import asyncio
+import hmac
+import itertools
+import json
+import socket
+import struct
+from typing import Callable, Dict, List, Optional, Set
+
+from services.execution.executor import JobExecutor
+from services.execution.types import ExecutionResult
+
+# Every message is a JSON object prefixed by its length as a 4 byte big endian integer
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 64 * 2**20  # larger than any job's test data
+RESULT_FIELDS = [
+    "success",
+    "message",
+    "line_offset",
+    "test_results",
+    "sample_results",
+    "summary",
+    "usage",
+]
+RECONNECT_DELAYS = [0.5, 1, 2, 5, 10]  # seconds, the last one repeats
+
+
+class WorkerLost(Exception):
+    """The connection to a worker broke while it ran a job."""
+
+
+class WorkerUnavailable(Exception):
+    """No worker had a free slot in time."""
+
+
+class WorkerError(Exception):
+    """A worker failed to run a job."""
+
+
+def parse_address(address: str) -> Dict:
+    """
+    Parse a worker address, "host:port" (or "tcp://host:port") or "unix:///path".
+
+    :param address: The address.
+    :return: The keyword arguments of asyncio's connection and server functions,
+        with "path" for a Unix socket or "host" and "port" for TCP.
+    """
+    address = address.strip()
+    if address.startswith("unix://"):
+        return {"path": address[len("unix://") :]}
+    host, _, port = address.removeprefix("tcp://").rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid worker address: {address}")
+    return {"host": host, "port": int(port)}
+
+
+async def open_connection(address: str):
+    target = parse_address(address)
+    if "path" in target:
+        return await asyncio.open_unix_connection(**target)
+    reader, writer = await asyncio.open_connection(**target)
+    writer.get_extra_info("socket").setsockopt(
+        socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+    )
+    return reader, writer
+
+
+async def start_server(handler, address: str) -> asyncio.AbstractServer:
+    target = parse_address(address)
+    if "path" in target:
+        return await asyncio.start_unix_server(handler, **target)
+    return await asyncio.start_server(handler, **target)
+
+
+def write_message(writer: asyncio.StreamWriter, message: Dict):
+    """Queue a message on a connection, in one write so concurrent senders can't interleave."""
+    body = json.dumps(message).encode("utf-8")
+    writer.write(HEADER.pack(len(body)) + body)
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Dict]:
+    """
+    Read the next message of a connection.
+
+    :return: The message, or None if the connection was closed.
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+        (size,) = HEADER.unpack(header)
+        if size > MAX_MESSAGE_BYTES:
+            raise ValueError(f"Message of {size} bytes is too large")
+        return json.loads(await reader.readexactly(size))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def encode_result(result: ExecutionResult) -> Dict:
+    return {field: getattr(result, field) for field in RESULT_FIELDS}
+
+
+def decode_result(fields: Dict) -> ExecutionResult:
+    return ExecutionResult(**{field: fields.get(field) for field in RESULT_FIELDS})
+
+
+class ExecutionWorker:
+    """
+    Serves jobs of API servers over the worker protocol, running them on an executor.
+    It runs standalone on judge boxes (see execution_worker.py) or in-process.
+
+    The protocol, after the client authenticates with {"type": "auth", "token"}:
+
+    - worker: {"type": "hello", "worker_id", "capacity"}, then every heartbeat
+      interval {"type": "heartbeat", "capacity", "running"}.
+    - client: {"type": "job", "id", "job"} to run a job (see JobExecutor), and
+      {"type": "cancel", "id"} to stop it when its result is no longer wanted.
+    - worker: {"type": "progress", "id", "event"} for every progress event of a job,
+      then {"type": "result", "id", "result"} or {"type": "error", "id", "message"}.
+
+    :param executor: Where the jobs run.
+    :param capacity: The number of jobs running at once, more wait for a slot.
+    :param token: The shared secret clients must send, empty to accept anyone.
+    :param heartbeat_interval: Seconds between heartbeats.
+    :param worker_id: The name of the worker in the clients' stats.
+    """
+
+    def __init__(
+        self,
+        executor: JobExecutor,
+        capacity: int,
+        token: str,
+        heartbeat_interval: float,
+        worker_id: Optional[str] = None,
+    ):
+        self.executor = executor
+        self.capacity = capacity
+        self.token = token
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = worker_id or socket.gethostname()
+        self.running = 0
+        self._slots = asyncio.Semaphore(capacity)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+
+    async def start(self, address: str):
+        """Start accepting connections on an address, see parse_address."""
+        self._server = await start_server(self._serve, address)
+
+    async def close(self):
+        """Stop accepting connections and drop the open ones."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in list(self._connections):
+            writer.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            auth = await read_message(reader)
+        except (OSError, ValueError):
+            auth = None
+        if not auth or not hmac.compare_digest(
+            str(auth.get("token", "")).encode(), self.token.encode()
+        ):
+            writer.close()
+            return
+
+        self._connections.add(writer)
+        jobs: Dict[int, asyncio.Task] = {}
+        write_message(
+            writer,
+            {"type": "hello", "worker_id": self.worker_id, "capacity": self.capacity},
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(writer))
+        try:
+            while (message := await read_message(reader)) is not None:
+                if message.get("type") == "job":
+                    job_id = message["id"]
+                    task = asyncio.create_task(
+                        self._run(writer, job_id, message["job"])
+                    )
+                    jobs[job_id] = task
+                    task.add_done_callback(lambda _, i=job_id: jobs.pop(i, None))
+                elif message.get("type") == "cancel":
+                    # The executor kills the job's sandbox, no result is sent
+                    task = jobs.get(message.get("id"))
+                    if task:
+                        task.cancel()
+        except (OSError, ValueError) as e:
+            print(f"Dropping execution client: {e}")
+        finally:
+            # Nobody is left to read the results
+            heartbeat.cancel()
+            for task in list(jobs.values()):
+                task.cancel()
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _run(self, writer: asyncio.StreamWriter, job_id: int, job: Dict):
+        async with self._slots:
+            self.running += 1
+            try:
+                result = await self.executor.run(
+                    job,
+                    lambda event: write_message(
+                        writer, {"type": "progress", "id": job_id, "event": event}
+                    ),
+                )
+                reply = {
+                    "type": "result",
+                    "id": job_id,
+                    "result": encode_result(result),
+                }
+            except Exception as e:
+                print(f"Error running job: {e}")
+                reply = {"type": "error", "id": job_id, "message": str(e)}
+            finally:
+                self.running -= 1
+
+        if not writer.is_closing():
+            write_message(writer, reply)
+            try:
+                await writer.drain()
+            except OSError:
+                pass
+
+    async def _heartbeat(self, writer: asyncio.StreamWriter):
+        while not writer.is_closing():
+            write_message(
+                writer,
+                {
+                    "type": "heartbeat",
+                    "capacity": self.capacity,
+                    "running": self.running,
+                },
+            )
+            try:
+                await writer.drain()
+            except OSError:
+                return
+            await asyncio.sleep(self.heartbeat_interval)
+
+
+class WorkerConnection:
+    """
+    The client side of a connection to a worker.
+
+    :param address: The address of the worker.
+    :param writer: The open connection.
+    :param hello: The worker's hello message.
+    """
+
+    def __init__(self, address: str, writer: asyncio.StreamWriter, hello: Dict):
+        self.address = address
+        self.writer = writer
+        self.worker_id = hello.get("worker_id")
+        self.capacity = hello["capacity"]
+        self.running = 0  # as last reported, includes other API servers' jobs
+        self.in_flight: Dict[int, Dict] = {}  # job id -> future and progress callback
+
+    @property
+    def free(self) -> int:
+        # Other API servers' jobs only show in the reported count
+        return self.capacity - max(self.running, len(self.in_flight))
+
+
+class RemoteExecutor(JobExecutor):
+    """
+    Runs jobs on execution workers over the worker protocol (see ExecutionWorker).
+    It stays connected to every worker, reconnecting after a failure, and sends each
+    job to the connected worker with the most free slots. A worker that goes silent
+    for longer than the heartbeat timeout is considered lost, and its jobs are retried
+    on the other workers.
+
+    :param addresses: The addresses of the workers, see parse_address.
+    :param token: The shared secret of the workers.
+    :param heartbeat_timeout: Seconds without a message after which a worker is lost.
+    :param max_retries: Times a job is retried after losing its worker.
+    :param dispatch_timeout: Seconds a job waits for a free slot on any worker.
+    """
+
+    def __init__(
+        self,
+        addresses: List[str],
+        token: str,
+        heartbeat_timeout: float,
+        max_retries: int,
+        dispatch_timeout: float,
+    ):
+        for address in addresses:
+            parse_address(address)  # fail on startup, not on the first job
+        self.addresses = addresses
+        self.token = token
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_retries = max_retries
+        self.dispatch_timeout = dispatch_timeout
+        self.connections: Dict[str, WorkerConnection] = {}
+        self.retries = 0
+        self.lost = 0
+        self._ids = itertools.count()
+        self._changed = asyncio.Condition()  # a worker connected or a slot freed up
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._maintain(address)) for address in self.addresses
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run(
+        self, job: Dict, on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> ExecutionResult:
+        try:
+            return await self._run(job, on_progress)
+        except (WorkerLost, WorkerUnavailable, WorkerError) as e:
+            # Reported like a sandbox that failed on this host
+            print(f"Execution worker failed: {e}")
+            return ExecutionResult(
+                success=False,
+                message="Execution Error",
+            )
+
+    async def _run(
+        self, job: Dict, on_progress: Optional[Callable[[Dict], None]]
+    ) -> ExecutionResult:
+        """Run a job on a worker, on another one each time its worker is lost."""
+        # Jobs only read their input, so running one again after a loss is safe
+        for attempt in range(self.max_retries + 1):
+            connection = await self._acquire()
+            job_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            connection.in_flight[job_id] = {
+                "future": future,
+                "on_progress": on_progress,
+            }
+            try:
+                write_message(
+                    connection.writer, {"type": "job", "id": job_id, "job": job}
+                )
+                await connection.writer.drain()
+                return await future
+            except asyncio.CancelledError:
+                # Tell the worker, so the job stops taking up its slot and sandbox
+                if not connection.writer.is_closing():
+                    write_message(connection.writer, {"type": "cancel", "id": job_id})
+                raise
+            except (WorkerLost, OSError) as e:
+                if attempt == self.max_retries:
+                    raise WorkerLost(
+                        f"Lost the worker {self.max_retries + 1} times: {e}"
+                    ) from e
+                self.retries += 1
+                print(f"Retrying job on another worker: {e}")
+            finally:
+                connection.in_flight.pop(job_id, None)
+                async with self._changed:
+                    self._changed.notify_all()
+
+    def stats(self) -> Dict:
+        return {
+            "workers": {
+                address: (
+                    {
+                        "connected": True,
+                        "worker_id": c.worker_id,
+                        "capacity": c.capacity,
+                        "running": c.running,
+                        "in_flight": len(c.in_flight),
+                    }
+                    if (c := self.connections.get(address))
+                    else {"connected": False}
+                )
+                for address in self.addresses
+            },
+            "retries": self.retries,
+            "lost": self.lost,
+        }
+
+    async def _acquire(self) -> WorkerConnection:
+        """Wait for the connected worker with the most free slots."""
+
+        def pick() -> Optional[WorkerConnection]:
+            free = [c for c in self.connections.values() if c.free > 0]
+            return max(free, key=lambda c: c.free, default=None)
+
+        try:
+            async with self._changed:
+                return await asyncio.wait_for(
+                    self._changed.wait_for(pick), self.dispatch_timeout
+                )
+        except asyncio.TimeoutError:
+            raise WorkerUnavailable(
+                f"No execution worker had a free slot within {self.dispatch_timeout}s"
+            ) from None
+
+    async def _maintain(self, address: str):
+        """Keep a connection to a worker open for as long as the executor runs."""
+        failures = 0
+        while True:
+            connected = False
+            try:
+                reader, writer = await asyncio.wait_for(
+                    open_connection(address), self.heartbeat_timeout
+                )
+                try:
+                    write_message(writer, {"type": "auth", "token": self.token})
+                    hello = await asyncio.wait_for(
+                        read_message(reader), self.heartbeat_timeout
+                    )
+                    if not hello or hello.get("type") != "hello":
+                        raise WorkerLost("the worker refused the connection")
+                    connected = True
+                    await self._serve(
+                        address, reader, WorkerConnection(address, writer, hello)
+                    )
+                finally:
+                    writer.close()
+            except (WorkerLost, OSError, ValueError, asyncio.TimeoutError) as e:
+                if connected:
+                    self.lost += 1
+                    print(f"Lost execution worker {address}: {e}")
+                elif not failures:
+                    print(f"Can't connect to execution worker {address}: {e}")
+
+            failures = 0 if connected else failures + 1
+            await asyncio.sleep(
+                RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)]
+            )
+
+    async def _serve(
+        self, address: str, reader: asyncio.StreamReader, connection: WorkerConnection
+    ):
+        """Handle the messages of a connected worker until it's lost."""
+        async with self._changed:
+            self.connections[address] = connection
+            self._changed.notify_all()
+        print(f"Connected to execution worker {address} ({connection.capacity} slots)")
+
+        error = WorkerLost("the connection closed")
+        try:
+            while True:
+                message = await asyncio.wait_for(
+                    read_message(reader), self.heartbeat_timeout
+                )
+                if message is None:
+                    break
+                await self._handle(connection, message)
+        except asyncio.TimeoutError:
+            error = WorkerLost(f"no heartbeat for {self.heartbeat_timeout}s")
+        finally:
+            del self.connections[address]
+            for pending in connection.in_flight.values():
+                if not pending["future"].done():
+                    pending["future"].set_exception(error)
+        raise error
+
+    async def _handle(self, connection: WorkerConnection, message: Dict):
+        kind = message.get("type")
+        if kind == "heartbeat":
+            connection.running = message["running"]
+            if connection.capacity != message["capacity"]:
+                connection.capacity = message["capacity"]
+                async with self._changed:
+                    self._changed.notify_all()
+            return
+
+        pending = connection.in_flight.get(message.get("id"))
+        if pending is None or pending["future"].done():
+            return  # the job was given up on
+        if kind == "progress":
+            if pending["on_progress"]:
+                pending["on_progress"](message["event"])
+        elif kind == "result":
+            pending["future"].set_result(decode_result(message["result"]))
+        elif kind == "error":
+            pending["future"].set_exception(WorkerError(message["message"]))
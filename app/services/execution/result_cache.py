@@ -0,0 +1,133 @@
+import asyncio
+import copy
+import hashlib
+from typing import Awaitable, Callable, Dict, List
+
+from services.execution.cache import LRUCache
+from services.execution.types import ExecutionResult
+
+# Results that depend on the load of the server rather than on the code
+UNCACHEABLE_MESSAGES = ["Time Limit Exceeded", "Execution Error", "Execution Cancelled"]
+
+
+def normalize_code(code: str) -> str:
+    """
+    Normalize the line endings of the code, the compilers read them all as "\n".
+    Any other whitespace is kept: blank lines and trailing spaces can be part of a
+    string literal, and removing lines would shift the line numbers of errors.
+
+    :param code: The submitted code.
+    """
+    return code.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def test_data_version(*parts: List[str]) -> str:
+    """
+    Get a version of a problem's test data, which changes whenever the tests do.
+
+    :param parts: The test cases, expected results and anything else that affects results.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        for item in part:
+            digest.update(str(item).encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(b"\1")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Results of recent submissions, so resubmitting the same code to the same problem
+    doesn't run it again. Identical submissions that arrive while the first one still
+    runs wait for its result instead of starting their own run.
+
+    :param max_entries: The maximum number of cached results, 0 disables the cache.
+    :param ttl: Seconds a result stays cached.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.results = LRUCache(max_entries, ttl)
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # submissions that waited for an identical one in flight
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def make_key(code: str, problem_id: int, lang: str, version: str) -> str:
+        """
+        Get the cache key of a submission.
+
+        :param code: The submitted code.
+        :param problem_id: The ID of the problem.
+        :param lang: The language of the code.
+        :param version: The version of the problem's test data.
+        """
+        digest = hashlib.sha256()
+        for part in (normalize_code(code), str(problem_id), lang, version):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def get_or_run(
+        self, key: str, run: Callable[[], Awaitable[ExecutionResult]]
+    ) -> ExecutionResult:
+        """
+        Get the cached result of a submission, or run it and cache its result.
+
+        :param key: The cache key of the submission.
+        :param run: Runs the submission.
+        """
+        result = self.results.get(key)
+        if result is not None:
+            self.hits += 1
+            return self._reused(result)
+
+        if key in self._in_flight:
+            self.shared += 1
+            result = await asyncio.shield(self._in_flight[key])
+            if result is None:  # the run was cancelled, but this one still wants it
+                return await self.get_or_run(key, run)
+            return self._reused(result)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await run()
+        except asyncio.CancelledError:
+            # Only the submission that started the run was cancelled, not its waiters
+            future.set_result(None)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # nobody may be waiting, don't warn about it
+            raise
+        finally:
+            del self._in_flight[key]
+
+        if self._cacheable(result):
+            self.results.put(key, result)
+        future.set_result(result)
+        return result
+
+    def stats(self) -> Dict:
+        """Get the counters of the cache, for monitoring."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "size": len(self.results),
+        }
+
+    def _reused(self, result: ExecutionResult) -> ExecutionResult:
+        """Mark a copy of a result as reused, the result itself stays the run's."""
+        result = copy.copy(result)
+        result.cached = True
+        return result
+
+    def _cacheable(self, result: ExecutionResult) -> bool:
+        """Check if a result only depends on the code, not on the server's load."""
+        if result.success:
+            return True
+        return not any(m in (result.message or "") for m in UNCACHEABLE_MESSAGES)
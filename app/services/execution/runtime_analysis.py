@@ -1,8 +1,14 @@
-from typing import Optional
+import asyncio
+import hashlib
+import traceback
+from typing import Awaitable, Callable, List, Optional, Set
 
 from core.config import settings
 from openai import AsyncOpenAI
 from pydantic import BaseModel, Field
+from services.execution.cache import LRUCache
+from services.execution.complexity import estimate_complexity
+from services.execution.result_cache import normalize_code
 
 
 class RuntimeAnalysis(BaseModel):
@@ -12,23 +18,46 @@ class RuntimeAnalysis(BaseModel):
     )
 
 
-class RuntimeAnalysisService:
+class RuntimeAnalysisBackend:
     """
-    Service for getting code analysis from GPT-4o
+    A way of estimating the time complexity of code
     """
 
-    def __init__(self, api_key: str):
-        self.client = (
-            AsyncOpenAI(api_key=api_key) if api_key != "your_api_key_here" else None
-        )
+    remote = False  # remote backends are rate limited and timed out by the service
 
-    async def analyze_code(self, code: str) -> Optional[str]:
+    async def analyze(self, code: str, lang: str) -> Optional[str]:
         """
-        Get runtime analysis for the given code using GPT-4o
+        Estimate the time complexity of the code
 
         :param code: The code to analyze
-        :return: Runtime analysis or None if failed
+        :param lang: The language of the code
+        :return: Runtime analysis or None if it couldn't be estimated
         """
+        raise NotImplementedError
+
+
+class StaticAnalysisBackend(RuntimeAnalysisBackend):
+    """
+    Estimates the time complexity from the structure of the code, offline
+    """
+
+    async def analyze(self, code: str, lang: str) -> Optional[str]:
+        return estimate_complexity(code, lang)
+
+
+class OpenAIAnalysisBackend(RuntimeAnalysisBackend):
+    """
+    Asks GPT-4o for the time complexity of the code
+    """
+
+    remote = True
+
+    def __init__(self, api_key: str):
+        self.client = (
+            AsyncOpenAI(api_key=api_key) if api_key != "your_api_key_here" else None
+        )
+
+    async def analyze(self, code: str, lang: str) -> Optional[str]:
         if not self.client:
             return None
 
@@ -54,4 +83,127 @@ class RuntimeAnalysisService:
             return None
 
 
-runtime_analysis_service = RuntimeAnalysisService(settings.OPENAI_API_KEY)
+class RuntimeAnalysisService:
+    """
+    Service for getting code analysis, from the first backend that gives one
+
+    :param backends: The backends to try, in order
+    """
+
+    def __init__(self, backends: List[RuntimeAnalysisBackend]):
+        self.backends = backends
+        self._results = LRUCache(settings.RUNTIME_ANALYSIS_CACHE_SIZE)
+        self._semaphore = asyncio.Semaphore(settings.RUNTIME_ANALYSIS_MAX_CONCURRENT)
+        self._in_flight = {}  # code hash -> task analyzing it
+        self._background: Set[asyncio.Task] = set()  # keeps scheduled jobs alive
+
+    def schedule(self, code: str, lang: str, on_result: Callable[[str], Awaitable]):
+        """
+        Analyze the code in the background, so whoever asked doesn't wait for it.
+
+        :param code: The code to analyze
+        :param lang: The language of the code
+        :param on_result: Awaited with the analysis, unless it failed
+        """
+
+        async def job():
+            analysis = await self.analyze_code(code, lang)
+            if analysis is not None:
+                try:
+                    await on_result(analysis)
+                except Exception as e:
+                    print(f"Error delivering runtime analysis: {e}")
+
+        task = asyncio.create_task(job())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def analyze_code(self, code: str, lang: str = "python") -> Optional[str]:
+        """
+        Get runtime analysis for the given code, memoized by the normalized code
+
+        :param code: The code to analyze
+        :param lang: The language of the code
+        :return: Runtime analysis or None if failed
+        """
+        key = hashlib.sha256(
+            f"{lang}\0{normalize_code(code)}".encode("utf-8")
+        ).hexdigest()
+        analysis = self._results.get(key)
+        if analysis is not None:
+            return analysis
+
+        # The same code submitted again while it's being analyzed waits for that analysis
+        if key not in self._in_flight:
+            self._in_flight[key] = asyncio.create_task(self._analyze(code, lang))
+            self._in_flight[key].add_done_callback(
+                lambda _: self._in_flight.pop(key, None)
+            )
+        analysis = await asyncio.shield(self._in_flight[key])
+        if analysis is not None:
+            self._results.put(key, analysis)
+        return analysis
+
+    async def _analyze(self, code: str, lang: str) -> Optional[str]:
+        """
+        Try the backends in order until one gives an analysis
+
+        :param code: The code to analyze
+        :param lang: The language of the code
+        :return: Runtime analysis or None if every backend failed
+        """
+        for backend in self.backends:
+            try:
+                if backend.remote:
+                    analysis = await self._analyze_remote(backend, code, lang)
+                else:
+                    analysis = await backend.analyze(code, lang)
+            except Exception:
+                # A broken backend falls through to the next one
+                print(f"Runtime analysis failed: {traceback.format_exc()}")
+                continue
+            if analysis is not None:
+                return analysis
+        return None
+
+    async def _analyze_remote(
+        self, backend: RuntimeAnalysisBackend, code: str, lang: str
+    ) -> Optional[str]:
+        """
+        Ask a remote backend for the runtime analysis of the code, within the
+        concurrency and time limits
+
+        :param backend: The remote backend
+        :param code: The code to analyze
+        :param lang: The language of the code
+        :return: Runtime analysis or None if failed
+        """
+        try:
+            async with self._semaphore:
+                return await asyncio.wait_for(
+                    backend.analyze(code, lang), settings.RUNTIME_ANALYSIS_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            print("Runtime analysis timed out")
+            return None
+
+
+def make_backend(name: str) -> RuntimeAnalysisBackend:
+    """
+    Create a runtime analysis backend by its name in the settings
+
+    :param name: "static" or "openai"
+    """
+    if name == "static":
+        return StaticAnalysisBackend()
+    if name == "openai":
+        return OpenAIAnalysisBackend(settings.OPENAI_API_KEY)
+    raise ValueError(f"Unknown runtime analysis backend: {name}")
+
+
+runtime_analysis_service = RuntimeAnalysisService(
+    [
+        make_backend(name.strip())
+        for name in settings.RUNTIME_ANALYSIS_BACKENDS.split(",")
+    ]
+)
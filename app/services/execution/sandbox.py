@@ -0,0 +1,185 @@
+import json
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+from core.config import settings
+from services.execution.cancellation import CancellationToken
+from services.execution.progress import ProgressReader
+from services.execution.types import ContainerOutput, ExecutionResult
+
+
+def load_limits(lang: str) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Get the limits of a language for every tier, from its DOCKER_* settings.
+
+    :param lang: The language.
+    :return: The memory limit (mb), time limit (ms) and per test CPU time limit (ms)
+        of every difficulty, "run" and "analysis".
+    """
+    mem_limits, time_limits, test_time_limits = [
+        [int(x) for x in getattr(settings, f"DOCKER_{lang.upper()}_{name}").split(",")]
+        for name in ("MEMORY_LIMIT", "TIME_LIMIT", "TEST_TIME_LIMIT")
+    ]
+    return {
+        "easy": (mem_limits[0], time_limits[0], test_time_limits[0]),
+        "medium": (mem_limits[1], time_limits[1], test_time_limits[1]),
+        "hard": (mem_limits[2], time_limits[2], test_time_limits[2]),
+        # runs only need the easy tier
+        "run": (mem_limits[0], time_limits[0], test_time_limits[0]),
+        # complexity measurements get the most room, their inputs are large
+        "analysis": (mem_limits[2], time_limits[2], test_time_limits[2]),
+    }
+
+
+def results_name(file_name: str) -> str:
+    """Get the name of the results file a runner writes next to itself."""
+    return file_name.split(".")[0] + "-results.txt"
+
+
+def read_results(dir_path: str, file_name: str) -> Optional[str]:
+    """
+    Read the results file of a runner that ran in a host directory.
+
+    :param dir_path: The host directory the code ran in.
+    :param file_name: The name of the file that ran.
+    :return: The content of the results file, None if there is none.
+    """
+    try:
+        with open(os.path.join(dir_path, results_name(file_name))) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class SandboxRunner:
+    """
+    A way of running generated test runners in isolation, the same for every
+    language it supports.
+    """
+
+    def start(self):
+        """Prepare the sandboxes, called once when the server starts."""
+        pass
+
+    def stop(self):
+        """Tear down the sandboxes, called once when the server stops."""
+        pass
+
+    def run_container(
+        self,
+        lang: str,
+        file_name: str,
+        code: str,
+        difficulty: str,
+        line_offset: int,
+        fixture: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> ExecutionResult:
+        """
+        Run the code in a sandbox.
+        This blocks until the run is over, so call it from a worker thread.
+
+        :param lang: The language of the code.
+        :param file_name: The name of the file to run.
+        :param code: The content of the file to run.
+        :param difficulty: The difficulty of the problem.
+        :param line_offset: The line offset for error logs.
+        :param fixture: The test data the code loads at runtime.
+        :param on_progress: Called from the running thread whenever a test finishes.
+        :param cancel: Cancelled when nobody waits for the result anymore, the run
+            should stop as soon as it can.
+        :return: The result of the execution.
+        """
+        raise NotImplementedError
+
+    def _build_result(
+        self,
+        output: ContainerOutput,
+        results: Optional[str],
+        line_offset: int,
+        progress: Optional[ProgressReader] = None,
+    ) -> ExecutionResult:
+        """
+        Turn the output and results file of a finished run into a result.
+
+        :param output: The output of the run.
+        :param results: The content of the results file, None if there is none.
+        :param line_offset: The line offset for error logs.
+        :param progress: The progress of the run, None if it stopped at compilation.
+        """
+        usage = output.usage
+        if output.timed_out:
+            # Keep the tests that finished before the time limit, they still count
+            if progress:
+                progress.poll()
+                return ExecutionResult(
+                    success=False,
+                    message="Runtime Error Detected: Time Limit Exceeded",
+                    test_results=progress.results[False],
+                    sample_results=progress.results[True],
+                    summary=progress.summary(),
+                    line_offset=line_offset,
+                    usage=usage,
+                )
+            return ExecutionResult(
+                success=False,
+                message="Runtime Error Detected: Time Limit Exceeded",
+                usage=usage,
+            )
+
+        # Check if the container stopped unexpectedly
+        if output.status_code != 0:
+            # SIGKILL - likely fired when memory limit is exceeded, or a known OOM kill
+            if output.status_code == 137 or (usage and usage["oom_killed"]):
+                return ExecutionResult(
+                    success=False,
+                    message="Runtime Error Detected: Memory Limit Exceeded",
+                    usage=usage,
+                )
+            return ExecutionResult(
+                success=False,
+                message="Runtime Error Detected\n" + output.logs.strip(),
+                line_offset=line_offset,
+                usage=usage,
+            )
+
+        if output.stderr.strip():
+            return ExecutionResult(
+                success=False,
+                message="Runtime Error Detected\n" + output.stderr.strip(),
+                line_offset=line_offset,
+                usage=usage,
+            )
+
+        if results is not None:
+            execution_data = json.loads(results)
+            test_results = execution_data["hidden_results"]["test_results"]
+            sample_results = execution_data["sample_results"]["test_results"]
+
+            # Tests over their own time limit fail the run like a killed container,
+            # the other tests still count
+            if any(t.get("time_limit_exceeded") for t in test_results + sample_results):
+                return ExecutionResult(
+                    success=False,
+                    message="Runtime Error Detected: Time Limit Exceeded",
+                    test_results=test_results,
+                    sample_results=sample_results,
+                    summary=execution_data["hidden_results"]["summary"],
+                    line_offset=line_offset,
+                    usage=usage,
+                )
+            return ExecutionResult(
+                success=True,
+                test_results=test_results,
+                sample_results=sample_results,
+                line_offset=line_offset,
+                usage=usage,
+            )
+        else:
+            return ExecutionResult(
+                success=False,
+                message="Test Runner Error: Results file not found\n"
+                + output.logs.strip(),
+                usage=usage,
+            )
@@ -0,0 +1,325 @@
+"""
+Runs a Python test runner inside a process sandbox, see ProcessRunner. Started as
+`python -I -S sandbox_launcher.py <config>` with a JSON config:
+
+    {"root": ..., "binds": [[host path, sandbox path, writable], ...],
+     "workdir": ..., "file": ..., "args": [...],
+     "memory_mb": ..., "cpu_seconds": ..., "file_size_mb": ..., "max_files": ...}
+
+It isolates itself (user, mount, network, IPC and UTS namespaces, a read-only root
+with only the Python installation, the job directory and the fixtures), limits its
+resources, drops the capabilities it has in its user namespace, installs a seccomp
+filter and then runs the runner in the same
+interpreter, so a run costs a single interpreter start. It shares the server's PID
+namespace, and the user namespace maps it back to the server's user, so the filter
+only lets it signal itself.
+
+This file is executed on its own, it must not import anything from the app.
+"""
+
+import ctypes
+import json
+import os
+import platform
+import resource
+import struct
+import sys
+import traceback
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+CLONE_THREAD = 0x00010000
+
+MS_RDONLY = 1
+MS_NOSUID = 2
+MS_NODEV = 4
+MS_NOEXEC = 8
+MS_REMOUNT = 32
+MS_NOATIME = 1024
+MS_NODIRATIME = 2048
+MS_BIND = 4096
+MS_REC = 16384
+MS_PRIVATE = 1 << 18
+MS_RELATIME = 1 << 21
+ST_RELATIME = 4096
+
+PR_CAPBSET_READ = 23
+PR_CAPBSET_DROP = 24
+PR_CAP_AMBIENT = 47
+PR_CAP_AMBIENT_CLEAR_ALL = 4
+LINUX_CAPABILITY_VERSION_3 = 0x20080522
+PR_SET_NO_NEW_PRIVS = 38
+PR_SET_SECCOMP = 22
+SECCOMP_MODE_FILTER = 2
+SECCOMP_RET_KILL_PROCESS = 0x80000000
+SECCOMP_RET_ERRNO = 0x00050000
+SECCOMP_RET_ALLOW = 0x7FFF0000
+EPERM = 1
+ENOSYS = 38
+
+# Classic BPF opcodes
+LD_ABS = 0x20  # BPF_LD | BPF_W | BPF_ABS
+JEQ = 0x15  # BPF_JMP | BPF_JEQ | BPF_K
+JGE = 0x35  # BPF_JMP | BPF_JGE | BPF_K
+JSET = 0x45  # BPF_JMP | BPF_JSET | BPF_K
+RET = 0x06  # BPF_RET | BPF_K
+
+# Offsets in struct seccomp_data
+NR_OFFSET = 0
+ARCH_OFFSET = 4
+ARG0_OFFSET = 16  # low half of the first argument, on little endian machines
+
+# Syscalls submitted code never needs: new processes and programs, sockets, and
+# anything that changes the sandbox (the old and the new mount API), inspects other
+# processes or signals them
+DENIED = [
+    "fork", "vfork", "execve", "execveat", "socket", "socketpair",
+    "ptrace", "process_vm_readv", "process_vm_writev", "tkill", "pidfd_send_signal",
+    "mount", "umount2", "pivot_root", "chroot", "open_tree", "move_mount", "fsopen",
+    "fsconfig", "fsmount", "fspick", "mount_setattr", "unshare", "setns", "keyctl",
+    "add_key", "request_key", "bpf", "perf_event_open", "userfaultfd",
+    "io_uring_setup", "kexec_load", "reboot", "init_module", "finit_module",
+    "delete_module",
+]  # fmt: skip
+
+# Syscalls that send signals to the process whose ID is their first argument, only
+# allowed for the sandbox itself, e.g. for abort()
+SELF_SIGNALS = ["kill", "tgkill", "rt_sigqueueinfo", "rt_tgsigqueueinfo"]
+
+# Audit architecture and syscall numbers. clone is allowed for threads only, and
+# clone3 (whose flags can't be checked) looks unsupported so libc falls back to clone
+ARCHITECTURES = {
+    "x86_64": (0xC000003E, {
+        "clone": 56, "fork": 57, "vfork": 58, "clone3": 435, "execve": 59,
+        "execveat": 322, "socket": 41, "socketpair": 53, "ptrace": 101,
+        "process_vm_readv": 310, "process_vm_writev": 311, "kill": 62, "tkill": 200,
+        "tgkill": 234, "rt_sigqueueinfo": 129, "rt_tgsigqueueinfo": 297,
+        "pidfd_send_signal": 424, "mount": 165, "umount2": 166, "pivot_root": 155,
+        "chroot": 161, "open_tree": 428, "move_mount": 429, "fsopen": 430,
+        "fsconfig": 431, "fsmount": 432, "fspick": 433, "mount_setattr": 442,
+        "unshare": 272, "setns": 308, "keyctl": 250, "add_key": 248,
+        "request_key": 249, "bpf": 321, "perf_event_open": 298, "userfaultfd": 323,
+        "io_uring_setup": 425, "kexec_load": 246, "reboot": 169, "init_module": 175,
+        "finit_module": 313, "delete_module": 176,
+    }),
+    "aarch64": (0xC00000B7, {
+        "clone": 220, "clone3": 435, "execve": 221, "execveat": 281, "socket": 198,
+        "socketpair": 199, "ptrace": 117, "process_vm_readv": 270,
+        "process_vm_writev": 271, "kill": 129, "tkill": 130, "tgkill": 131,
+        "rt_sigqueueinfo": 138, "rt_tgsigqueueinfo": 240, "pidfd_send_signal": 424,
+        "mount": 40, "umount2": 39, "pivot_root": 41, "chroot": 51, "open_tree": 428,
+        "move_mount": 429, "fsopen": 430, "fsconfig": 431, "fsmount": 432,
+        "fspick": 433, "mount_setattr": 442, "unshare": 97,
+        "setns": 268, "keyctl": 219, "add_key": 217, "request_key": 218, "bpf": 280,
+        "perf_event_open": 241, "userfaultfd": 282, "io_uring_setup": 425,
+        "kexec_load": 104, "reboot": 142, "init_module": 105, "finit_module": 273,
+        "delete_module": 106,
+    }),
+}  # fmt: skip
+
+EXIT_SETUP_FAILED = 125  # the sandbox couldn't be set up, nothing ran
+EXIT_MEMORY = 137  # the exit code of a container killed for its memory
+
+libc = ctypes.CDLL(None, use_errno=True)
+
+
+def check(result: int, what: str):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def mount(source, target, fstype, flags, data=None):
+    check(
+        libc.mount(
+            source and source.encode(),
+            target.encode(),
+            fstype and fstype.encode(),
+            ctypes.c_ulong(flags),
+            data and data.encode(),
+        ),
+        f"mount {target}",
+    )
+
+
+def write(path: str, content: str):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def isolate(config: dict):
+    """Enter new namespaces and switch to a root with only what the runner needs."""
+    uid, gid = os.geteuid(), os.getegid()
+    check(
+        libc.unshare(
+            CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS
+        ),
+        "unshare",
+    )
+    write("/proc/self/setgroups", "deny")
+    write("/proc/self/uid_map", f"0 {uid} 1")
+    write("/proc/self/gid_map", f"0 {gid} 1")
+
+    root = config["root"]
+    mount(None, "/", None, MS_REC | MS_PRIVATE)
+    mount("tmpfs", root, "tmpfs", MS_NOSUID | MS_NODEV, "size=1m,mode=755")
+
+    for source, target, writable in config["binds"]:
+        path = root + target
+        if os.path.isdir(source):
+            os.makedirs(path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "w").close()
+        mount(source, path, None, MS_BIND | MS_REC)
+
+        # Remounting must keep the flags the mount is locked with
+        stat = os.statvfs(source)
+        flags = stat.f_flag & (
+            MS_RDONLY | MS_NOSUID | MS_NODEV | MS_NOEXEC | MS_NOATIME | MS_NODIRATIME
+        )
+        if stat.f_flag & ST_RELATIME:
+            flags |= MS_RELATIME
+        if not writable:
+            flags |= MS_RDONLY
+        mount(None, path, None, MS_REMOUNT | MS_BIND | MS_NOSUID | MS_NODEV | flags)
+
+    mount(None, root, None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV)
+    os.chroot(root)
+    os.chdir(config["workdir"])
+
+
+def limit(config: dict):
+    """Limit the memory, CPU time, written file size and open files of the run."""
+    memory = config["memory_mb"] * 2**20
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    cpu = config["cpu_seconds"]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+    file_size = config["file_size_mb"] * 2**20
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_size, file_size))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (config["max_files"],) * 2)
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def drop_capabilities():
+    """
+    Drop every capability the sandbox has in its user namespace, so the binds it made
+    can't be changed back even with a syscall the filter misses.
+    """
+    cap = 0
+    while libc.prctl(PR_CAPBSET_READ, cap, 0, 0, 0) >= 0:
+        check(libc.prctl(PR_CAPBSET_DROP, cap, 0, 0, 0), "drop bounding set")
+        cap += 1
+    check(libc.prctl(PR_CAP_AMBIENT, PR_CAP_AMBIENT_CLEAR_ALL, 0, 0, 0), "ambient")
+
+    header = struct.pack("Ii", LINUX_CAPABILITY_VERSION_3, 0)
+    data = bytes(24)  # effective, permitted and inheritable sets of 64 bits, empty
+    check(libc.capset(header, data), "capset")
+
+
+def seccomp_filter(pid: int) -> bytes:
+    """
+    Build the seccomp program that denies the DENIED syscalls, and the SELF_SIGNALS
+    ones for any process but the sandbox.
+
+    :param pid: The ID of the sandbox process.
+    """
+    machine = platform.machine()
+    if machine not in ARCHITECTURES:
+        raise OSError(f"No seccomp filter for {machine}")
+    arch, numbers = ARCHITECTURES[machine]
+
+    def op(code, k, jt=0, jf=0):
+        return struct.pack("HBBI", code, jt, jf, k)
+
+    denied = [numbers[name] for name in DENIED if name in numbers]
+    program = [
+        op(LD_ABS, ARCH_OFFSET),
+        op(JEQ, arch, 1, 0),
+        op(RET, SECCOMP_RET_KILL_PROCESS),
+        op(LD_ABS, NR_OFFSET),
+    ]
+    if machine == "x86_64":
+        # x32 syscalls would get around the numbers above
+        program += [op(JGE, 0x40000000, 0, 1), op(RET, SECCOMP_RET_ERRNO | EPERM)]
+    for number in denied:
+        program += [op(JEQ, number, 0, 1), op(RET, SECCOMP_RET_ERRNO | EPERM)]
+    for name in SELF_SIGNALS:
+        program += [
+            op(JEQ, numbers[name], 0, 4),
+            op(LD_ABS, ARG0_OFFSET),
+            op(JEQ, pid, 0, 1),
+            op(RET, SECCOMP_RET_ALLOW),
+            op(RET, SECCOMP_RET_ERRNO | EPERM),
+        ]
+    program += [op(JEQ, numbers["clone3"], 0, 1), op(RET, SECCOMP_RET_ERRNO | ENOSYS)]
+    program += [
+        op(JEQ, numbers["clone"], 0, 3),
+        op(LD_ABS, ARG0_OFFSET),
+        op(JSET, CLONE_THREAD, 1, 0),
+        op(RET, SECCOMP_RET_ERRNO | EPERM),
+        op(RET, SECCOMP_RET_ALLOW),
+    ]
+    return b"".join(program)
+
+
+def confine():
+    """Install the seccomp filter, for this process and any thread it starts."""
+    program = seccomp_filter(os.getpid())
+    buffer = ctypes.create_string_buffer(program, len(program))
+
+    class Program(ctypes.Structure):
+        _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.c_void_p)]
+
+    fprog = Program(len(program) // 8, ctypes.addressof(buffer))
+    check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "no_new_privs")
+    check(
+        libc.prctl(PR_SET_SECCOMP, SECCOMP_MODE_FILTER, ctypes.byref(fprog), 0, 0),
+        "seccomp",
+    )
+
+
+def run(config: dict):
+    """Run the test runner as the main module, like `python <file> <args>`."""
+    file_name = config["file"]
+    with open(file_name) as f:
+        source = f.read()
+    sys.argv = [file_name] + config["args"]
+    sys.path[0:0] = [config["workdir"]]
+
+    try:
+        code = compile(source, file_name, "exec")
+    except SyntaxError as e:
+        sys.stderr.write("".join(traceback.format_exception_only(type(e), e)))
+        sys.exit(1)
+
+    try:
+        exec(code, {"__name__": "__main__", "__file__": file_name})
+    except MemoryError:
+        os._exit(EXIT_MEMORY)  # reported like a container over its memory limit
+    except SystemExit:
+        raise
+    except BaseException as e:
+        # Without this frame, the traceback is the one `python <file>` prints
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        sys.exit(1)
+
+
+def main():
+    config = json.loads(sys.argv[1])
+    try:
+        isolate(config)
+        limit(config)
+        drop_capabilities()
+        confine()
+    except Exception as e:
+        sys.stderr.write(f"Sandbox setup failed: {e}\n")
+        os._exit(EXIT_SETUP_FAILED)
+    run(config)
+
+
+if __name__ == "__main__":
+    main()
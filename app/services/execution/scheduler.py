@@ -0,0 +1,357 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+import itertools
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+PRIORITY_CLASSES = ["ranked", "unranked", "custom", "practice", "run"]
+DEFAULT_CLASS = "unranked"  # for jobs of an unknown match type
+WAIT_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]  # seconds
+SERVICE_TIME_SMOOTHING = 0.2  # weight of the latest job in the average job time
+LATENCY_SAMPLES = 200  # recent job times kept per pool, for percentiles
+
+
+class Ticket:
+    """
+    A job waiting for or holding a slot of the scheduler.
+
+    :param pool: The pool the job needs a slot of.
+    :param priority: The priority class of the job.
+    :param user_id: The user the job belongs to, None if it has no user.
+    :param deadline: Epoch time after which the result is useless, e.g. the game's end.
+    :param on_queue: Awaited with a queue event whenever the job's position changes.
+    """
+
+    def __init__(
+        self,
+        pool: str,
+        priority: str,
+        user_id: Optional[int],
+        deadline: Optional[float],
+        on_queue: Optional[Callable[[Dict], Awaitable]],
+        seq: int,
+    ):
+        self.pool = pool
+        self.priority = priority
+        self.user_id = user_id
+        self.deadline = deadline
+        self.on_queue = on_queue
+        self.seq = seq  # arrival order
+        self.enqueued = time.monotonic()
+        self.granted = asyncio.get_running_loop().create_future()
+        self.position: Optional[int] = None  # last position sent to on_queue
+        # Set by the job when its code hit its time limit, so its slot time is the
+        # code's own and says nothing about the host's load
+        self.timed_out = False
+
+
+class WaitHistogram:
+    """
+    Cumulative histogram of queue wait times, in the Prometheus layout.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(WAIT_BUCKETS + [math.inf]):
+            if seconds <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def to_dict(self) -> Dict:
+        buckets = {str(b): c for b, c in zip(WAIT_BUCKETS, self.counts)}
+        buckets["+Inf"] = self.counts[-1]
+        return {"buckets": buckets, "count": self.count, "sum": round(self.sum, 3)}
+
+
+class ExecutionScheduler:
+    """
+    Hands out execution slots. Every pool (a difficulty, or "run") has a fixed number
+    of slots, like the semaphores this replaces, but waiting jobs are ordered:
+
+    1. Jobs whose deadline is less than `deadline_margin` seconds away go first,
+       earliest deadline first, so a game about to end gets its result in time.
+       Jobs past their deadline are ordered like any other.
+    2. Other jobs share the slots by weighted fair queuing between priority classes:
+       a class with twice the weight gets twice the slots while both are waiting.
+       Jobs of the same class run in arrival order.
+
+    A user never has more than `user_limit` jobs running; their other jobs wait
+    without holding back anyone else.
+
+    :param capacities: The number of slots of every pool.
+    :param weights: The weight of every priority class.
+    :param user_limit: The maximum number of running jobs per user.
+    :param deadline_margin: Seconds before its deadline when a job becomes urgent.
+    """
+
+    def __init__(
+        self,
+        capacities: Dict[str, int],
+        weights: Dict[str, float],
+        user_limit: int,
+        deadline_margin: float,
+    ):
+        self.capacities = capacities
+        self.weights = weights
+        self.user_limit = user_limit
+        self.deadline_margin = deadline_margin
+        self.waiting: List[Ticket] = []
+        self.running = {pool: 0 for pool in capacities}
+        self.idle = asyncio.Event()  # set while no job waits or runs
+        self.idle.set()
+        self._user_running: Dict[int, int] = {}
+        self._finish_tags = {priority: 0.0 for priority in weights}  # fair queuing
+        self._virtual_time = 0.0
+        self._service_time: Dict[str, Optional[float]] = dict.fromkeys(capacities)
+        self._latencies = {pool: deque(maxlen=LATENCY_SAMPLES) for pool in capacities}
+        self._wait_times = {priority: WaitHistogram() for priority in weights}
+        self._seq = itertools.count()
+        self._notifications: Set[asyncio.Task] = set()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        pool: str,
+        priority: str = DEFAULT_CLASS,
+        user_id: Optional[int] = None,
+        deadline: Optional[float] = None,
+        on_queue: Optional[Callable[[Dict], Awaitable]] = None,
+    ):
+        """
+        Hold a slot of a pool while the block runs, waiting for one if needed. The
+        block gets the job's Ticket.
+
+        :param pool: The pool to get a slot of.
+        :param priority: The priority class of the job.
+        :param user_id: The user the job belongs to.
+        :param deadline: Epoch time after which the result is useless.
+        :param on_queue: Awaited with {"position", "estimated_wait"} while the job waits.
+        """
+        if priority not in self.weights:
+            priority = DEFAULT_CLASS
+        ticket = Ticket(pool, priority, user_id, deadline, on_queue, next(self._seq))
+        self._enqueue(ticket)
+
+        try:
+            await ticket.granted
+        except BaseException:
+            if ticket.granted.done() and not ticket.granted.cancelled():
+                self._release(ticket)  # granted just as the job was cancelled
+            else:
+                self.waiting.remove(ticket)
+                self._dispatch()
+            raise
+
+        started = time.monotonic()
+        self._wait_times[priority].observe(started - ticket.enqueued)
+        cancelled = False
+        try:
+            yield ticket
+        except asyncio.CancelledError:
+            cancelled = True  # stopped early, says nothing about how long jobs take
+            raise
+        finally:
+            if not cancelled:
+                self._record_service_time(
+                    pool, time.monotonic() - started, ticket.timed_out
+                )
+            self._release(ticket)
+
+    def set_capacity(self, pool: str, capacity: int):
+        """
+        Change the number of slots of a pool. Running jobs above a lowered capacity
+        finish normally, new jobs wait until the pool is under it.
+
+        :param pool: The pool to resize.
+        :param capacity: The new number of slots.
+        """
+        self.capacities[pool] = capacity
+        self._dispatch()
+
+    def headroom(self, pool: str) -> int:
+        """
+        Get the number of free slots of a pool that no waiting job is about to take.
+
+        :param pool: The pool.
+        """
+        waiting = len([t for t in self.waiting if t.pool == pool])
+        return max(0, self.capacities[pool] - self.running[pool] - waiting)
+
+    def service_time(self, pool: str) -> Optional[float]:
+        """
+        Get the average time jobs of a pool hold their slot, recent jobs weighing more.
+
+        :param pool: The pool.
+        :return: The average in seconds, or None if no job of the pool finished yet.
+        """
+        return self._service_time[pool]
+
+    def latency_percentile(
+        self, pool: str, percentile: float, window: float
+    ) -> Optional[float]:
+        """
+        Get a percentile of the time jobs of a pool held their slot, leaving out jobs
+        that hit their time limit.
+
+        :param pool: The pool.
+        :param percentile: The percentile, between 0 and 100.
+        :param window: Only count jobs that finished in the last `window` seconds.
+        :return: The percentile in seconds, or None if no job finished in the window.
+        """
+        since = time.monotonic() - window
+        samples = sorted(
+            s for finished, s in self._latencies[pool] if finished >= since
+        )
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def clear_latencies(self, pool: str):
+        """
+        Forget the slot times of the jobs of a pool that finished so far, so the
+        latency percentile only covers jobs that finish from now on.
+
+        :param pool: The pool.
+        """
+        self._latencies[pool].clear()
+
+    def stats(self) -> Dict:
+        """Get the queue depths, running jobs and wait times, for monitoring."""
+        return {
+            "queue_depth": {
+                pool: len([t for t in self.waiting if t.pool == pool])
+                for pool in self.capacities
+            },
+            "running": dict(self.running),
+            "wait_time": {
+                priority: histogram.to_dict()
+                for priority, histogram in self._wait_times.items()
+            },
+        }
+
+    def _enqueue(self, ticket: Ticket):
+        # A class that had nothing waiting can't claim the slots it didn't use
+        if not any(t.priority == ticket.priority for t in self.waiting):
+            self._finish_tags[ticket.priority] = max(
+                self._finish_tags[ticket.priority], self._virtual_time
+            )
+        self.waiting.append(ticket)
+        self.idle.clear()
+        self._dispatch()
+
+    def _release(self, ticket: Ticket):
+        self.running[ticket.pool] -= 1
+        if ticket.user_id is not None:
+            self._user_running[ticket.user_id] -= 1
+            if not self._user_running[ticket.user_id]:
+                del self._user_running[ticket.user_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant slots to the waiting jobs that can run, then update everyone else."""
+        while (ticket := self._next(self._eligible())) is not None:
+            self.waiting.remove(ticket)
+            self.running[ticket.pool] += 1
+            if ticket.user_id is not None:
+                self._user_running[ticket.user_id] = (
+                    self._user_running.get(ticket.user_id, 0) + 1
+                )
+            self._virtual_time = self._finish_tags[ticket.priority]
+            self._finish_tags[ticket.priority] += 1 / self.weights[ticket.priority]
+            ticket.granted.set_result(None)
+
+        if not self.waiting and not any(self.running.values()):
+            self.idle.set()
+        self._notify_positions()
+
+    def _eligible(self) -> List[Ticket]:
+        return [
+            t
+            for t in self.waiting
+            if not t.granted.done()  # cancelled, about to leave the queue
+            and self.running[t.pool] < self.capacities[t.pool]
+            and self._user_running.get(t.user_id, 0) < self.user_limit
+        ]
+
+    def _next(
+        self, tickets: List[Ticket], tags: Optional[Dict[str, float]] = None
+    ) -> Optional[Ticket]:
+        """
+        Pick the job to run next among the given ones.
+
+        :param tickets: The jobs to pick from.
+        :param tags: The fair queuing tags to use, the scheduler's by default.
+        """
+        if not tickets:
+            return None
+        tags = tags or self._finish_tags
+
+        now = time.time()
+        urgent = [
+            t
+            for t in tickets
+            # Past its deadline, a job has nothing left to be early for
+            if t.deadline is not None and 0 <= t.deadline - now <= self.deadline_margin
+        ]
+        if urgent:
+            return min(urgent, key=lambda t: (t.deadline, t.seq))
+        return min(tickets, key=lambda t: (tags[t.priority], t.seq))
+
+    def _notify_positions(self):
+        """Send every waiting job with a callback its position, if it changed."""
+        for pool in self.capacities:
+            queue = [t for t in self.waiting if t.pool == pool]
+            if not any(t.on_queue for t in queue):
+                continue
+
+            # The order jobs would start in if nothing else arrived
+            tags = dict(self._finish_tags)
+            order = []
+            while queue:
+                ticket = self._next(queue, tags)
+                queue.remove(ticket)
+                tags[ticket.priority] += 1 / self.weights[ticket.priority]
+                order.append(ticket)
+
+            for position, ticket in enumerate(order, start=1):
+                if ticket.on_queue and ticket.position != position:
+                    ticket.position = position
+                    self._send(ticket, position)
+
+    def _send(self, ticket: Ticket, position: int):
+        service_time = self._service_time[ticket.pool]
+        estimated_wait = (
+            round(math.ceil(position / self.capacities[ticket.pool]) * service_time, 1)
+            if service_time is not None
+            else None
+        )
+
+        async def send():
+            try:
+                await ticket.on_queue(
+                    {"position": position, "estimated_wait": estimated_wait}
+                )
+            except Exception as _:
+                pass  # a failed queue update must not fail the job
+
+        task = asyncio.create_task(send())
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+    def _record_service_time(self, pool: str, seconds: float, timed_out: bool):
+        if not timed_out:
+            self._latencies[pool].append((time.monotonic(), seconds))
+        # Timed out jobs still hold their slot that long, waits depend on them too
+        previous = self._service_time[pool]
+        self._service_time[pool] = (
+            seconds
+            if previous is None
+            else previous + SERVICE_TIME_SMOOTHING * (seconds - previous)
+        )
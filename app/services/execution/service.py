@@ -1,15 +1,31 @@
 import asyncio
-import os
-import tempfile
-from typing import List
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
 
 from core.config import settings
+from services.execution.cache import LRUCache
+from services.execution.cancellation import CancellationToken
+from services.execution.concurrency import ConcurrencyController
 from services.execution.docker import DockerRunner
+from services.execution.executor import (  # noqa: F401
+    RUNNER_NAME,
+    LocalExecutor,
+    make_runners,
+)
+from services.execution.measurement import measurement_inputs, summarize_measurement
+from services.execution.preflight import PYTHON_IMAGE_VERSION, PreflightChecker
+from services.execution.process import ProcessRunner
+from services.execution.remote import RemoteExecutor
+from services.execution.result_cache import ResultCache, test_data_version
 from services.execution.runtime_analysis import runtime_analysis_service
-from services.execution.test_generator import (
-    CppTestGenerator,
-    JavaTestGenerator,
-    PythonTestGenerator,
+from services.execution.sandbox import load_limits
+from services.execution.scheduler import PRIORITY_CLASSES, ExecutionScheduler
+from services.execution.sharding import (
+    merge_results,
+    shard_count,
+    shard_progress,
+    split_tests,
 )
 from services.execution.types import ExecutionResult
 
@@ -22,18 +38,102 @@ class CodeExecutionService:
     """
 
     def __init__(self):
-        self.docker = DockerRunner(docker.from_env())
-        self.test_generators = {
-            "python": PythonTestGenerator(),
-            "java": JavaTestGenerator(),
-            "cpp": CppTestGenerator(),
-        }
         easy, medium, hard = [int(x) for x in settings.MAX_CONCURRENT.split(",")]
-        self._execution_semaphores = {
-            "easy": asyncio.Semaphore(easy),
-            "medium": asyncio.Semaphore(medium),
-            "hard": asyncio.Semaphore(hard),
-        }
+        weights = [float(x) for x in settings.SCHEDULER_CLASS_WEIGHTS.split(",")]
+        self.scheduler = ExecutionScheduler(
+            {
+                "easy": easy,
+                "medium": medium,
+                "hard": hard,
+                # "Run" requests get their own budget so they never wait on submissions
+                "run": settings.RUN_MAX_CONCURRENT,
+            },
+            dict(zip(PRIORITY_CLASSES, weights)),
+            settings.SCHEDULER_USER_MAX_CONCURRENT,
+            settings.SCHEDULER_DEADLINE_MARGIN,
+        )
+        # MAX_CONCURRENT is the ceiling, the controller finds the limit the host handles
+        floors = [int(x) for x in settings.ADAPTIVE_MIN_CONCURRENT.split(",")]
+        targets = [float(x) for x in settings.ADAPTIVE_LATENCY_TARGET.split(",")]
+        self.concurrency = ConcurrencyController(
+            self.scheduler,
+            {
+                "easy": (floors[0], easy),
+                "medium": (floors[1], medium),
+                "hard": (floors[2], hard),
+            },
+            {"easy": targets[0], "medium": targets[1], "hard": targets[2]},
+            settings.ADAPTIVE_CPU_PRESSURE,
+            settings.ADAPTIVE_MEMORY_PRESSURE,
+            settings.ADAPTIVE_INTERVAL,
+        )
+        # Hidden tests of these difficulties may run in parallel shards
+        self.sharded_difficulties = {
+            d.strip().lower() for d in settings.SHARDING_DIFFICULTIES.split(",")
+        } - {""}
+        self._sharding_stats = {"submissions": 0, "shards": 0}
+        # Jobs given up on by where they were, and the sandbox time that saved
+        self._cancellation_stats = {"queued": 0, "running": 0, "reclaimed_seconds": 0.0}
+        # Complexity measurements only run while the scheduler is idle
+        self._measurement_semaphore = asyncio.Semaphore(
+            settings.COMPLEXITY_MEASUREMENT_MAX_CONCURRENT
+        )
+        workers = [a for a in settings.EXECUTION_WORKERS.split(",") if a.strip()]
+        if workers:
+            # Sandboxes run on execution workers, this host needs no Docker
+            self.docker = None
+            self.executor = RemoteExecutor(
+                workers,
+                settings.WORKER_TOKEN,
+                settings.WORKER_HEARTBEAT_TIMEOUT,
+                settings.WORKER_MAX_RETRIES,
+                settings.WORKER_DISPATCH_TIMEOUT,
+            )
+        else:
+            # The scheduler already bounds the number of runs in flight
+            self.docker = DockerRunner(docker.from_env())
+            self.executor = LocalExecutor(
+                make_runners(self.docker),
+                easy
+                + medium
+                + hard
+                + settings.RUN_MAX_CONCURRENT
+                + settings.COMPLEXITY_MEASUREMENT_MAX_CONCURRENT,
+            )
+        self.result_cache = ResultCache(
+            settings.RESULT_CACHE_SIZE, settings.RESULT_CACHE_TTL
+        )
+        self.preflight = PreflightChecker(
+            self.docker,
+            [lang.strip().lower() for lang in settings.PREFLIGHT_LANGUAGES.split(",")],
+            settings.PREFLIGHT_TIMEOUT,
+            # The process sandbox runs Python with the server's interpreter
+            sys.version_info[:2]
+            if self.docker
+            and isinstance(self.executor.runners["python"], ProcessRunner)
+            else PYTHON_IMAGE_VERSION,
+        )
+        self._measurements = LRUCache(settings.RESULT_CACHE_SIZE)
+        self._background = set()  # keeps scheduled measurements alive
+
+    async def start(self):
+        """
+        Warm up the sandboxes (or connect to the execution workers) and start
+        adjusting the concurrency to the host's load, if enabled.
+        """
+        await self.executor.start()
+        await self.preflight.start()
+        # The load of this host only matters if the sandboxes run on it
+        if (
+            settings.ADAPTIVE_CONCURRENCY_ENABLED
+            and not settings.TESTING
+            and self.docker is not None
+        ):
+            self.concurrency.start()
+
+    async def stop(self):
+        await self.concurrency.stop()
+        await self.executor.stop()
 
     async def execute_code(
         self,
@@ -46,6 +146,16 @@ class CodeExecutionService:
         difficulty: str,
         compare_func: str,
         lang: str = "python",
+        problem_id: Optional[int] = None,
+        on_progress: Optional[Callable[[Dict], Awaitable]] = None,
+        on_runtime_analysis: Optional[Callable[[str], Awaitable]] = None,
+        input_generator: Optional[List[Dict]] = None,
+        on_measurement: Optional[Callable[[Dict], Awaitable]] = None,
+        user_id: Optional[int] = None,
+        priority: str = "unranked",
+        deadline: Optional[float] = None,
+        on_queue: Optional[Callable[[Dict], Awaitable]] = None,
+        cancel: Optional[CancellationToken] = None,
     ) -> ExecutionResult:
         """
         Execute the code with the given test cases and expected results.
@@ -56,46 +166,581 @@ class CodeExecutionService:
         :param difficulty: The difficulty of the problem.
         :param compare_func: The name of the comparison function.
         :param lang: The programming language of the code.
+        :param problem_id: The ID of the problem, used to cache its test harness and
+            the results of its submissions.
+        :param on_progress: Awaited with a progress event whenever a test finishes.
+        :param on_runtime_analysis: Awaited with the runtime analysis of code that
+            passed every test, some time after the result is returned.
+        :param input_generator: The input generator of the problem, to measure the
+            complexity of code that passed every test.
+        :param on_measurement: Awaited with the measured complexity, see
+            measure_complexity.
+        :param user_id: The user who submitted the code, for per-user limits.
+        :param priority: The priority class, the type of the match.
+        :param deadline: Epoch time the match ends at, the result is useless after it.
+        :param on_queue: Awaited with the queue position and estimated wait while
+            the submission waits for a slot.
+        :param cancel: Cancelled when the result is no longer wanted, e.g. the game
+            ended, which stops the submission wherever it is.
+        """
+        queue = {
+            "priority": priority,
+            "user_id": user_id,
+            "deadline": deadline,
+            "on_queue": on_queue,
+        }
+        state = {}
+        result = await self._cancellable(
+            self._execute_cached(
+                code,
+                method_name,
+                test_cases,
+                expected_results,
+                sample_test_cases,
+                sample_expected_results,
+                difficulty,
+                compare_func,
+                lang,
+                problem_id,
+                on_progress,
+                queue,
+                state,
+            ),
+            cancel,
+            difficulty.lower(),
+            state,
+        )
+
+        # The analysis runs in the background, the result never waits for it
+        if result.all_cleared() and on_runtime_analysis and not settings.TESTING:
+            runtime_analysis_service.schedule(code, lang, on_runtime_analysis)
+        if (
+            result.all_cleared()
+            and input_generator
+            and on_measurement
+            and not settings.TESTING
+        ):
+            self._schedule_measurement(
+                code,
+                method_name,
+                input_generator,
+                compare_func,
+                lang,
+                problem_id,
+                on_measurement,
+            )
+        return result
+
+    async def _execute_cached(
+        self,
+        code: str,
+        method_name: str,
+        test_cases: List[str],
+        expected_results: List[str],
+        sample_test_cases: List[str],
+        sample_expected_results: List[str],
+        difficulty: str,
+        compare_func: str,
+        lang: str,
+        problem_id: Optional[int],
+        on_progress: Optional[Callable[[Dict], Awaitable]],
+        queue: Dict,
+        state: Dict,
+    ) -> ExecutionResult:
+        """
+        Execute the code through the result cache if it's for a problem, see execute_code.
+        """
+        args = (
+            code,
+            method_name,
+            test_cases,
+            expected_results,
+            sample_test_cases,
+            sample_expected_results,
+            difficulty,
+            compare_func,
+            lang,
+            problem_id,
+            on_progress,
+            queue,
+            state,
+        )
+        if problem_id is None:
+            return await self._execute(*args)
+
+        # Resubmitting the same code gets the same result, unless the tests changed
+        version = test_data_version(
+            test_cases,
+            expected_results,
+            sample_test_cases,
+            sample_expected_results,
+            [method_name, compare_func],
+        )
+        key = ResultCache.make_key(code, problem_id, lang, version)
+        return await self.result_cache.get_or_run(key, lambda: self._execute(*args))
+
+    async def _execute(
+        self,
+        code: str,
+        method_name: str,
+        test_cases: List[str],
+        expected_results: List[str],
+        sample_test_cases: List[str],
+        sample_expected_results: List[str],
+        difficulty: str,
+        compare_func: str,
+        lang: str,
+        problem_id: Optional[int],
+        on_progress: Optional[Callable[[Dict], Awaitable]],
+        queue: Dict,
+        state: Dict,
+    ) -> ExecutionResult:
+        """
+        Execute the code without looking at the result cache, see execute_code.
+
+        :param queue: The scheduling arguments of the submission, see
+            ExecutionScheduler.slot.
+        :param state: Gets when the submission started waiting for a slot and
+            running, see _cancellable.
+        """
+        # Code that doesn't compile fails the same way without waiting for a slot
+        rejected = await self.preflight.check(lang, code)
+        if rejected:
+            return rejected
+
+        state["queued"] = time.monotonic()
+        # Every difficulty has its own pool of slots, blocks until one is free
+        async with self.scheduler.slot(difficulty.lower(), **queue) as ticket:
+            state["running"] = time.monotonic()
+            # Test data are pairs of test cases and its expected results.
+            test_data = [
+                {"input": tc, "expected": er}
+                for tc, er in zip(test_cases, expected_results)
+            ]
+            sample_data = [
+                {"input": tc, "expected": er}
+                for tc, er in zip(sample_test_cases, sample_expected_results)
+            ]
+
+            job = self._job(
+                lang,
+                code,
+                method_name,
+                test_data,
+                sample_data,
+                difficulty,
+                compare_func,
+                problem_id,
+            )
+            shards = 1
+            if difficulty.lower() in self.sharded_difficulties:
+                # Only slots nobody waits for, sharding must not delay other jobs
+                shards = shard_count(
+                    len(test_data),
+                    self.scheduler.headroom(difficulty.lower()),
+                    settings.SHARDING_MAX_SHARDS,
+                    settings.SHARDING_MIN_TESTS,
+                )
+
+            events = asyncio.Queue()
+            forwarder = asyncio.create_task(self._forward_progress(events, on_progress))
+            try:
+                if shards > 1:
+                    result = await self._run_sharded(
+                        job, shards, events.put_nowait if on_progress else None, queue
+                    )
+                else:
+                    result = await self.executor.run(
+                        job, events.put_nowait if on_progress else None
+                    )
+            finally:
+                # Every progress event is sent before the final result
+                events.put_nowait(None)
+                await forwarder
+
+            ticket.timed_out = result.timed_out
+            return result
+
+    async def _run_sharded(
+        self,
+        job: Dict,
+        shards: int,
+        on_progress: Optional[Callable[[Dict], None]],
+        queue: Dict,
+    ) -> ExecutionResult:
+        """
+        Run the hidden tests of a job split into shards, each in its own sandbox at
+        the same time. The first shard also runs the sample tests and uses the
+        caller's slot, the others take free slots of the same pool.
+
+        :param job: The job, see JobExecutor.
+        :param shards: The number of shards.
+        :param on_progress: Called with the progress events of the whole job.
+        :param queue: The scheduling arguments of the job, see ExecutionScheduler.slot.
+        """
+        test_data = job["test_data"]
+        completed = [0]
+        offset = 0
+        runs = []
+        parts = split_tests(test_data, shards)
+        for index, part in enumerate(parts):
+            shard = {
+                **job,
+                "test_data": part,
+                "sample_data": job["sample_data"] if index == 0 else [],
+                # Every shard has its own harness, cached apart from the others
+                "problem_id": (
+                    f"{job['problem_id']}/{index}/{shards}"
+                    if job["problem_id"] is not None
+                    else None
+                ),
+            }
+            progress = (
+                shard_progress(offset, len(test_data), completed, on_progress)
+                if on_progress
+                else None
+            )
+            runs.append(self._run_shard(shard, progress, queue, index == 0))
+            offset += len(part)
+
+        self._sharding_stats["submissions"] += 1
+        self._sharding_stats["shards"] += shards
+        results = await asyncio.gather(*runs)
+        # Every shard gets the full time limit, the tests together must fit in it
+        _, time_limit, _ = load_limits(job["lang"])[job["difficulty"].lower()]
+        return merge_results(list(results), [len(part) for part in parts], time_limit)
+
+    async def _run_shard(
+        self,
+        shard: Dict,
+        on_progress: Optional[Callable[[Dict], None]],
+        queue: Dict,
+        first: bool,
+    ) -> ExecutionResult:
+        """Run a shard of a job, in its own slot unless it's the first one."""
+        if first:
+            return await self.executor.run(shard, on_progress)
+        # The shards are one submission, which already counts against its user
+        async with self.scheduler.slot(
+            shard["difficulty"].lower(), queue["priority"], None, queue["deadline"]
+        ) as ticket:
+            result = await self.executor.run(shard, on_progress)
+            ticket.timed_out = result.timed_out
+            return result
+
+    async def run_code(
+        self,
+        code: str,
+        method_name: str,
+        sample_test_cases: List[str],
+        sample_expected_results: List[str],
+        custom_test_cases: List[str],
+        compare_func: str,
+        lang: str = "python",
+        user_id: Optional[int] = None,
+        deadline: Optional[float] = None,
+        on_queue: Optional[Callable[[Dict], Awaitable]] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> ExecutionResult:
+        """
+        Run the code on the sample test cases and a few custom inputs only, without
+        hidden tests or runtime analysis. Custom inputs have no expected result, so
+        their results only show the output.
+
+        :param code: The code to execute.
+        :param sample_test_cases: A list of sample test cases.
+        :param sample_expected_results: A list of sample expected results.
+        :param custom_test_cases: Extra inputs, capped at RUN_MAX_CUSTOM_TESTS.
+        :param compare_func: The name of the comparison function.
+        :param lang: The programming language of the code.
+        :param user_id: The user who runs the code, see execute_code.
+        :param deadline: Epoch time the match ends at, see execute_code.
+        :param on_queue: Awaited with queue updates, see execute_code.
+        :param cancel: Stops the run when cancelled, see execute_code.
         """
-        # Limit the number of concurrent executions based on the difficulty level.
-        sem = self._execution_semaphores[difficulty.lower()]
-        gen = self.test_generators[lang]
-
-        async with sem:  # blocks until a semaphore is available
-            # Create a temporary file to store the test runner file.
-            with tempfile.NamedTemporaryFile(
-                mode="w", suffix=gen.get_file_extension(), delete=False
-            ) as f:
-                # Test data are pairs of test cases and its expected results.
-                test_data = [
-                    {"input": tc, "expected": er}
-                    for tc, er in zip(test_cases, expected_results)
-                ]
-                sample_data = [
-                    {"input": tc, "expected": er}
-                    for tc, er in zip(sample_test_cases, sample_expected_results)
-                ]
-
-                base_name = os.path.basename(f.name).split(".")[0]
-                file_content = gen.generate_test_file(
-                    code, base_name, method_name, test_data, sample_data, compare_func
+        state = {}
+        return await self._cancellable(
+            self._run_code(
+                code,
+                method_name,
+                sample_test_cases,
+                sample_expected_results,
+                custom_test_cases,
+                compare_func,
+                lang,
+                user_id,
+                deadline,
+                on_queue,
+                state,
+            ),
+            cancel,
+            "run",
+            state,
+        )
+
+    async def _run_code(
+        self,
+        code: str,
+        method_name: str,
+        sample_test_cases: List[str],
+        sample_expected_results: List[str],
+        custom_test_cases: List[str],
+        compare_func: str,
+        lang: str,
+        user_id: Optional[int],
+        deadline: Optional[float],
+        on_queue: Optional[Callable[[Dict], Awaitable]],
+        state: Dict,
+    ) -> ExecutionResult:
+        """Run the code, see run_code."""
+        rejected = await self.preflight.check(lang, code)
+        if rejected:
+            return rejected
+
+        state["queued"] = time.monotonic()
+        async with self.scheduler.slot(
+            "run", "run", user_id, deadline, on_queue
+        ) as ticket:
+            state["running"] = time.monotonic()
+            sample_data = [
+                {"input": tc, "expected": er}
+                for tc, er in zip(sample_test_cases, sample_expected_results)
+            ] + [
+                {"input": tc, "expected": None}
+                for tc in custom_test_cases[: settings.RUN_MAX_CUSTOM_TESTS]
+            ]
+
+            # Custom inputs change the test data on every run, so skip the harness cache
+            result = await self.executor.run(
+                self._job(
+                    lang, code, method_name, [], sample_data, "run", compare_func, None
                 )
-                f.write(file_content)
-                file_path = f.name
+            )
+            ticket.timed_out = result.timed_out
+
+            if result.success:
+                samples = result.sample_results[: len(sample_test_cases)]
+                result.summary = {
+                    "total_tests": len(samples),
+                    "passed_tests": len([t for t in samples if t.get("passed")]),
+                }
+            return result
+
+    async def measure_complexity(
+        self,
+        code: str,
+        method_name: str,
+        input_generator: List[Dict],
+        compare_func: str,
+        lang: str = "python",
+    ) -> Optional[Dict]:
+        """
+        Measure the complexity of the code by timing it on generated inputs of growing
+        size. Measurements run in the lowest priority lane: they wait until no
+        submission or run is in flight, so they never delay a game.
+
+        :param code: The code to measure, which should pass the problem's tests.
+        :param input_generator: The input generator of the problem.
+        :param compare_func: The name of the comparison function.
+        :param lang: The programming language of the code.
+        :return: The best fit complexity and its confidence, or None if the code didn't
+            finish enough of the inputs in time.
+        """
+        sizes = [
+            int(x)
+            for x in settings.COMPLEXITY_MEASUREMENT_SIZES.split(",")
+            if x.strip()
+        ]
+
+        async with self._measurement_semaphore:
             try:
-                result = self.docker.run_container(
-                    lang, file_path, difficulty, gen.get_line_offset()
+                await asyncio.wait_for(
+                    self._until_idle(), settings.COMPLEXITY_MEASUREMENT_MAX_WAIT
                 )
+            except asyncio.TimeoutError:
+                return None  # the server stayed busy, it's only a nice-to-have
 
-                # If all tests passed, get runtime analysis
-                if result.all_cleared() and not settings.TESTING:
-                    runtime_analysis = await runtime_analysis_service.analyze_code(code)
-                    result.runtime_analysis = runtime_analysis
+            # Generated once it runs, waiting measurements only hold their code
+            inputs = measurement_inputs(
+                input_generator, sizes, settings.COMPLEXITY_MEASUREMENT_REPEATS
+            )
+            # The inputs have no expected results, like the custom inputs of a run
+            result = await self.executor.run(
+                self._job(
+                    lang,
+                    code,
+                    method_name,
+                    [],
+                    [{"input": test_case, "expected": None} for _, test_case in inputs],
+                    "analysis",
+                    compare_func,
+                    None,
+                )
+            )
+        if result.sample_results is None:
+            return None  # e.g. it didn't compile
+        return summarize_measurement(inputs, result.sample_results)
 
-                return result
-            finally:
-                # Clean up the temporary file
-                os.unlink(file_path)
+    async def _until_idle(self):
+        while not self.scheduler.idle.is_set():
+            await self.scheduler.idle.wait()
+
+    def get_stats(self) -> Dict:
+        """Get the counters of the service, for monitoring."""
+        return {
+            "result_cache": self.result_cache.stats(),
+            "scheduler": self.scheduler.stats(),
+            "concurrency": self.concurrency.stats(),
+            "executor": self.executor.stats(),
+            "sharding": dict(self._sharding_stats),
+            "preflight": self.preflight.stats(),
+            "cancellation": {
+                **self._cancellation_stats,
+                "reclaimed_seconds": round(
+                    self._cancellation_stats["reclaimed_seconds"], 3
+                ),
+            },
+        }
+
+    async def _cancellable(
+        self,
+        run: Awaitable[ExecutionResult],
+        cancel: Optional[CancellationToken],
+        pool: str,
+        state: Dict,
+    ) -> ExecutionResult:
+        """
+        Await a submission or run until its token is cancelled. A cancelled job that
+        waits for a slot leaves the queue, a running one has its sandbox killed.
+
+        :param run: The submission or run.
+        :param cancel: The token, None if nothing cancels the job.
+        :param pool: The scheduler pool of the job.
+        :param state: Filled in by the job with when it started waiting for a slot
+            ("queued") and running ("running").
+        :return: The result of the job, or a failed one if it was cancelled.
+        """
+        if cancel is None:
+            return await run
+
+        task = asyncio.ensure_future(run)
+        cancelled = asyncio.ensure_future(cancel.wait())
+        try:
+            await asyncio.wait([task, cancelled], return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            cancelled.cancel()
+        if task.done():
+            return task.result()
+
+        task.cancel()
+        # The slot is given back before the result goes out
+        await asyncio.gather(task, return_exceptions=True)
+        self._record_cancellation(pool, state)
+        return ExecutionResult(
+            success=False, message=f"Execution Cancelled: {cancel.reason}"
+        )
+
+    def _record_cancellation(self, pool: str, state: Dict):
+        """
+        Count a cancelled job, and the sandbox time it would still have taken by the
+        pool's average job time.
+        """
+        average = self.scheduler.service_time(pool) or 0.0
+        stats = self._cancellation_stats
+        if "running" in state:
+            stats["running"] += 1
+            elapsed = time.monotonic() - state["running"]
+            stats["reclaimed_seconds"] += max(0.0, average - elapsed)
+        else:
+            stats["queued"] += 1
+            # A submission waiting for an identical one's run saves nothing
+            if "queued" in state:
+                stats["reclaimed_seconds"] += average
+
+    def _job(
+        self,
+        lang: str,
+        code: str,
+        method_name: str,
+        test_data: List[Dict],
+        sample_data: List[Dict],
+        difficulty: str,
+        compare_func: str,
+        problem_id: Optional[int],
+    ) -> Dict:
+        """Describe a job for the executor, see JobExecutor."""
+        return {
+            "lang": lang,
+            "code": code,
+            "method_name": method_name,
+            "test_data": test_data,
+            "sample_data": sample_data,
+            "difficulty": difficulty,
+            "compare_func": compare_func,
+            "problem_id": problem_id,
+        }
+
+    def _schedule_measurement(
+        self,
+        code: str,
+        method_name: str,
+        input_generator: List[Dict],
+        compare_func: str,
+        lang: str,
+        problem_id: Optional[int],
+        on_measurement: Callable[[Dict], Awaitable],
+    ):
+        """
+        Measure the complexity of the code in the background, memoized by the code.
+        At most COMPLEXITY_MEASUREMENT_MAX_PENDING wait at once, more are dropped.
+        """
+        if len(self._background) >= settings.COMPLEXITY_MEASUREMENT_MAX_PENDING:
+            print("Too many pending complexity measurements, dropping one")
+            return
+        version = test_data_version(input_generator, [method_name, compare_func])
+        key = ResultCache.make_key(code, problem_id, lang, version)
+
+        async def job():
+            measurement = self._measurements.get(key)
+            if measurement is None:
+                try:
+                    measurement = await self.measure_complexity(
+                        code, method_name, input_generator, compare_func, lang
+                    )
+                except Exception as e:
+                    print(f"Error measuring complexity: {e}")
+                    return
+                if measurement is None:
+                    return
+                self._measurements.put(key, measurement)
+            try:
+                await on_measurement(measurement)
+            except Exception as e:
+                print(f"Error delivering complexity measurement: {e}")
+
+        task = asyncio.create_task(job())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _forward_progress(
+        self,
+        events: asyncio.Queue,
+        on_progress: Optional[Callable[[Dict], Awaitable]],
+    ):
+        """
+        Await the progress callback with every event of a job, until a None event.
+
+        :param events: The progress events of the job.
+        :param on_progress: The callback, if any.
+        """
+        while (event := await events.get()) is not None:
+            try:
+                await on_progress(event)
+            except Exception as _:
+                pass  # a failed progress update must not fail the submission
 
 
 code_execution = CodeExecutionService()
@@ -0,0 +1,125 @@
+from typing import Callable, Dict, List
+
+from services.execution.types import ExecutionResult
+from services.execution.usage import merge_usage
+
+
+def shard_count(tests: int, headroom: int, max_shards: int, min_tests: int) -> int:
+    """
+    Get the number of shards to split a submission's hidden tests into.
+
+    :param tests: The number of hidden tests.
+    :param headroom: The free slots the extra shards can take, see
+        ExecutionScheduler.headroom.
+    :param max_shards: The most shards a submission gets.
+    :param min_tests: The fewest tests a shard gets, smaller shards cost more
+        sandbox startups than they save.
+    """
+    return max(1, min(max_shards, headroom + 1, tests // max(1, min_tests)))
+
+
+def split_tests(test_data: List[Dict], shards: int) -> List[List[Dict]]:
+    """
+    Split tests into contiguous shards of nearly equal size, so the results of the
+    shards put back together are in the original order.
+
+    :param test_data: The tests.
+    :param shards: The number of shards.
+    """
+    size, extra = divmod(len(test_data), shards)
+    result, start = [], 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        result.append(test_data[start:end])
+        start = end
+    return result
+
+
+def shard_progress(
+    offset: int, total: int, completed: List[int], callback: Callable[[Dict], None]
+) -> Callable[[Dict], None]:
+    """
+    Get the progress callback of a shard, which reports its hidden tests as tests
+    of the whole submission.
+
+    :param offset: The index of the shard's first test among all hidden tests.
+    :param total: The number of hidden tests of the submission.
+    :param completed: The number of finished hidden tests, shared by the shards.
+    :param callback: The progress callback of the submission.
+    """
+
+    def on_progress(event: Dict):
+        if event["sample"]:
+            callback(event)
+            return
+        completed[0] += 1
+        callback(
+            {
+                **event,
+                "index": event["index"] + offset,
+                "completed": completed[0],
+                "total": total,
+            }
+        )
+
+    return on_progress
+
+
+def merge_results(
+    results: List[ExecutionResult], sizes: List[int], time_limit: float
+) -> ExecutionResult:
+    """
+    Merge the results of a submission's shards into the result a single run would
+    have had. A single run goes through the tests in order, so the merged tests stop
+    where a shard stopped early, or where their summed wall time goes over the time
+    limit of the whole submission. Only the first shard runs the sample tests.
+
+    :param results: The result of every shard, in order.
+    :param sizes: The number of hidden tests of every shard.
+    :param time_limit: The time limit (ms) of the whole submission.
+    """
+    failed = next((r for r in results if not r.success), None)
+    if failed is not None and failed.test_results is None:
+        return failed  # compilation or runtime error, memory limit, ...
+
+    sample_results = results[0].sample_results or []
+    elapsed = sum(t.get("wall_time") or 0 for t in sample_results)
+    test_results = []
+    over_time = False
+    for result, size in zip(results, sizes):
+        tests = result.test_results or []
+        for test in tests:
+            elapsed += test.get("wall_time") or 0
+            if elapsed > time_limit:
+                over_time = True
+                break
+            test_results.append(test)
+        if over_time or len(tests) < size:
+            break
+
+    if failed is None and not over_time:
+        return ExecutionResult(
+            success=True,
+            test_results=test_results,
+            sample_results=sample_results,
+            line_offset=results[0].line_offset,
+            usage=merge_usage([r.usage for r in results]),
+        )
+
+    # Time limits keep the tests that finished in time
+    return ExecutionResult(
+        success=False,
+        message=(
+            "Runtime Error Detected: Time Limit Exceeded"
+            if over_time
+            else failed.message
+        ),
+        line_offset=(failed or results[0]).line_offset,
+        test_results=test_results,
+        sample_results=sample_results,
+        summary={
+            "total_tests": sum(sizes),
+            "passed_tests": len([t for t in test_results if t.get("passed")]),
+        },
+        usage=merge_usage([r.usage for r in results]),
+    )
@@ -1,7 +1,9 @@
 PYTHON_TEMPLATE = r"""import json
 import traceback
 import io
+import signal
 import sys
+import time
 from typing import *
 
 {code}
@@ -15,6 +17,9 @@ class TestResult:
         logs: str = None,
         error: str = None,
         input: str = None,
+        cpu_time: float = None,
+        wall_time: float = None,
+        time_limit_exceeded: bool = False,
     ):
         self.expected = expected
         self.output = str(output) if output is not None else None
@@ -22,6 +27,9 @@ class TestResult:
         self.logs = logs
         self.error = error
         self.input = input
+        self.cpu_time = cpu_time
+        self.wall_time = wall_time
+        self.time_limit_exceeded = time_limit_exceeded
         
     def to_dict(self, is_sample: bool = True):
         result = {{
@@ -29,6 +37,9 @@ class TestResult:
             "output": self.output,
             "passed": self.passed,
             "error": self.error,
+            "cpu_time": self.cpu_time,
+            "wall_time": self.wall_time,
+            "time_limit_exceeded": self.time_limit_exceeded,
         }}
         if is_sample:
             result["logs"] = self.logs
@@ -48,23 +59,59 @@ def format_test_data(method_name: str, args: str) -> str:
             params.append(val.strip())
     return f"{{method_name}}({{', '.join(params)}})"
 
-def run_tests(solution, method_name, test_data, is_sample: bool = False):
+def report_progress(progress, is_sample: bool, index: int, result: dict):
+    # One line per finished test, so the server can stream progress and keep the
+    # finished tests if the time limit kills the run
+    progress.write(json.dumps({{"type": "test", "sample": is_sample, "index": index, "result": result}}) + "\n")
+    progress.flush()
+
+class TimeLimitExceeded(BaseException):
+    # Not an Exception, so the submitted code can't catch it by accident
+    pass
+
+def on_time_limit(signum, frame):
+    raise TimeLimitExceeded()
+
+def call_with_limit(call: str, solution, time_limit: float):
+    # SIGPROF fires after time_limit seconds of CPU time, interrupting the call
+    # without ending the run
+    signal.setitimer(signal.ITIMER_PROF, time_limit)
+    try:
+        return eval(call)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+def run_tests(solution, method_name, test_data, progress, time_limit: float, is_sample: bool = False):
     results = []
     
-    for test in test_data:
+    for index, test in enumerate(test_data):
         old_stdout = sys.stdout
         new_stdout = io.StringIO()
         sys.stdout = new_stdout
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+
+        def elapsed():
+            return (
+                round((time.process_time() - cpu_start) * 1000, 3),
+                round((time.perf_counter() - wall_start) * 1000, 3),
+            )
 
         try:
-            result = eval(f"solution.{{format_test_data(method_name, test['input'])}}")
-            if test['expected'].lower() == 'true':
-                test['expected'] = 'True'
-            elif test['expected'].lower() == 'false':
-                test['expected'] = 'False'
-            elif test['expected'].lower() == 'null':
-                test['expected'] = 'None'
-            passed = compare_results(result, test['expected'])
+            result = call_with_limit(
+                f"solution.{{format_test_data(method_name, test['input'])}}", solution, time_limit
+            )
+            cpu_time, wall_time = elapsed()
+            if test['expected'] is None:  # custom input, nothing to compare against
+                passed = None
+            else:
+                if test['expected'].lower() == 'true':
+                    test['expected'] = 'True'
+                elif test['expected'].lower() == 'false':
+                    test['expected'] = 'False'
+                elif test['expected'].lower() == 'null':
+                    test['expected'] = 'None'
+                passed = compare_results(result, test['expected'])
             if isinstance(result, str):
                 result = f"'{{result}}'"
             results.append(TestResult(
@@ -73,17 +120,35 @@ def run_tests(solution, method_name, test_data, is_sample: bool = False):
                 passed=passed,
                 logs=new_stdout.getvalue(),
                 input=test['input'],
+                cpu_time=cpu_time,
+                wall_time=wall_time,
+            ).to_dict(is_sample=is_sample))
+        except TimeLimitExceeded:
+            cpu_time, wall_time = elapsed()
+            results.append(TestResult(
+                expected=test['expected'],
+                passed=False,
+                logs=new_stdout.getvalue(),
+                error="Time Limit Exceeded",
+                input=test['input'],
+                cpu_time=cpu_time,
+                wall_time=wall_time,
+                time_limit_exceeded=True,
             ).to_dict(is_sample=is_sample))
         except Exception as e:
+            cpu_time, wall_time = elapsed()
             results.append(TestResult(
                 expected=test['expected'],
                 passed=False,
                 logs=new_stdout.getvalue(),
                 error=traceback.format_exc(),
                 input=test['input'],
+                cpu_time=cpu_time,
+                wall_time=wall_time,
             ).to_dict(is_sample=is_sample))
         finally:
             sys.stdout = old_stdout
+        report_progress(progress, is_sample, index, results[-1])
             
     return {{
         "test_results": results,
@@ -95,12 +160,21 @@ def run_tests(solution, method_name, test_data, is_sample: bool = False):
     
 if __name__ == "__main__":
     method_name = {method_name!r}
-    test_data = {test_data}
-    sample_data = {sample_data}
+    time_limit = int(sys.argv[2]) / 1000  # CPU time limit of each test
+    signal.signal(signal.SIGPROF, on_time_limit)
+    with open(sys.argv[1]) as f:
+        fixture = json.load(f)
+    test_data = fixture["hidden"]
+    sample_data = fixture["sample"]
+
+    progress = open("{file_name}-progress.jsonl", "w")
+    progress.write(json.dumps({{"type": "start", "hidden": len(test_data), "sample": len(sample_data)}}) + "\n")
+    progress.flush()
 
     solution = Solution()
-    hidden_results = run_tests(solution, method_name, test_data, is_sample=False)
-    sample_results = run_tests(solution, method_name, sample_data, is_sample=True)
+    hidden_results = run_tests(solution, method_name, test_data, progress, time_limit, is_sample=False)
+    sample_results = run_tests(solution, method_name, sample_data, progress, time_limit, is_sample=True)
+    progress.close()
     results = {{
         "hidden_results": hidden_results,
         "sample_results": sample_results
@@ -116,6 +190,7 @@ import com.google.gson.*;
 import java.lang.reflect.*;
 import java.util.*;
 import java.io.*;
+import java.lang.management.*;
 
 {code}
 
@@ -158,11 +233,65 @@ public class {file_name} {{
         }}
     }}
 
+    private static class TimeLimitExceeded extends Exception {{}}
+
+    private static final ThreadMXBean THREADS = ManagementFactory.getThreadMXBean();
+
+    // Runs the method on its own thread and stops the thread once it used more CPU
+    // time than the limit, so a slow test doesn't end the whole run
+    @SuppressWarnings("deprecation")
+    private static Object invokeWithLimit(Method method, Solution solution, Object[] args, long timeLimitMs, long[] cpuTimeNs) throws Exception {{
+        Object[] output = new Object[1];
+        Throwable[] error = new Throwable[1];
+        Thread thread = new Thread(() -> {{
+            long start = THREADS.getCurrentThreadCpuTime();
+            try {{
+                output[0] = method.invoke(solution, args);
+            }} catch (Throwable t) {{
+                error[0] = t;
+            }} finally {{
+                cpuTimeNs[0] = THREADS.getCurrentThreadCpuTime() - start;
+            }}
+        }});
+        thread.setDaemon(true);
+        thread.start();
+
+        long limitNs = timeLimitMs * 1_000_000L;
+        thread.join(timeLimitMs);
+        while (thread.isAlive()) {{
+            if (THREADS.getThreadCpuTime(thread.getId()) > limitNs) {{
+                thread.stop();
+                thread.join(100);
+                cpuTimeNs[0] = limitNs;
+                throw new TimeLimitExceeded();
+            }}
+            thread.join(10);
+        }}
+
+        if (error[0] instanceof Exception) {{
+            throw (Exception) error[0];
+        }} else if (error[0] != null) {{
+            throw (Error) error[0];
+        }}
+        return output[0];
+    }}
+
     private static boolean compare(Object result, Object expected) {{
         {compare_func}
     }}
 
-    public static JsonArray runTests(Solution solution, JsonArray testData, boolean isSample) {{
+    // One line per finished test, so the server can stream progress and keep the
+    // finished tests if the time limit kills the run
+    private static void reportProgress(PrintWriter progress, boolean isSample, int index, JsonObject result) {{
+        JsonObject line = new JsonObject();
+        line.addProperty("type", "test");
+        line.addProperty("sample", isSample);
+        line.addProperty("index", index);
+        line.add("result", result);
+        progress.println(line.toString());
+    }}
+
+    public static JsonArray runTests(Solution solution, JsonArray testData, PrintWriter progress, long timeLimitMs, boolean isSample) {{
         JsonArray results = new JsonArray();
         Gson gson = new Gson();
 
@@ -186,29 +315,41 @@ public class {file_name} {{
         Class<?>[] paramTypes = targetMethod.getParameterTypes();
         Class<?> returnType = targetMethod.getReturnType();
 
-        for (JsonElement testElement : testData) {{
-            JsonObject test = testElement.getAsJsonObject();
+        for (int index = 0; index < testData.size(); index++) {{
+            JsonObject test = testData.get(index).getAsJsonObject();
             JsonObject result = new JsonObject();
             LogCapture logCapture = new LogCapture();
+            long[] cpuTimeNs = new long[1];
+            long wallStart = System.nanoTime();
 
             try {{
                 String inputStr = test.get("input").getAsString();
                 Object[] args = parseArguments(inputStr, paramTypes);
 
                 logCapture.start();
-                Object output = targetMethod.invoke(solution, args);
+                wallStart = System.nanoTime();
+                Object output = invokeWithLimit(targetMethod, solution, args, timeLimitMs, cpuTimeNs);
                 String logs = logCapture.stop();
 
-                Object expected = parseValue(test.get("expected").getAsString(), returnType);
-
-                boolean passed = compare(output, expected);
-                result.addProperty("passed", passed);
+                // Custom inputs have no expected result to compare against
+                if (test.get("expected").isJsonNull()) {{
+                    result.add("passed", JsonNull.INSTANCE);
+                    result.add("expected", JsonNull.INSTANCE);
+                }} else {{
+                    Object expected = parseValue(test.get("expected").getAsString(), returnType);
+                    result.addProperty("passed", compare(output, expected));
+                    result.addProperty("expected", test.get("expected").getAsString());
+                }}
                 result.addProperty("output", gson.toJson(output));
-                result.addProperty("expected", test.get("expected").getAsString());
                 if (isSample) {{
                     result.addProperty("logs", logs);
                     result.addProperty("input", inputStr);
                 }}
+            }} catch (TimeLimitExceeded e) {{
+                logCapture.stop();
+                result.addProperty("error", "Time Limit Exceeded");
+                result.addProperty("passed", false);
+                result.addProperty("time_limit_exceeded", true);
             }} catch (Exception e) {{
                 logCapture.stop();
                 Throwable cause = e;
@@ -218,7 +359,13 @@ public class {file_name} {{
                 result.addProperty("error", cause.toString());
                 result.addProperty("passed", false);
             }}
+            result.addProperty("cpu_time", cpuTimeNs[0] / 1e6);
+            result.addProperty("wall_time", (System.nanoTime() - wallStart) / 1e6);
+            if (!result.has("time_limit_exceeded")) {{
+                result.addProperty("time_limit_exceeded", false);
+            }}
             results.add(result);
+            reportProgress(progress, isSample, index, result);
         }}
         return results;
     }}
@@ -457,7 +604,7 @@ public class {file_name} {{
         int passedTests = 0;
         for (JsonElement element : results) {{
             JsonObject res = element.getAsJsonObject();
-            if (res.has("passed") && res.get("passed").getAsBoolean()) {{
+            if (res.has("passed") && !res.get("passed").isJsonNull() && res.get("passed").getAsBoolean()) {{
                 passedTests++;
             }}
         }}
@@ -475,16 +622,29 @@ public class {file_name} {{
             Gson gson = new Gson();
             Solution solution = new Solution();
 
-            String testStr = {test_data};
-            String sampleStr = {sample_data};
-            JsonArray testData = gson.fromJson(testStr, JsonArray.class);
-            JsonArray sampleData = gson.fromJson(sampleStr, JsonArray.class);
+            JsonObject fixture;
+            try (Reader reader = new FileReader(args[0])) {{
+                fixture = gson.fromJson(reader, JsonObject.class);
+            }}
+            JsonArray testData = fixture.getAsJsonArray("hidden");
+            JsonArray sampleData = fixture.getAsJsonArray("sample");
+
+            // The worker passes the job directory, its working directory is shared
+            String dir = args[1];
+            long timeLimitMs = Long.parseLong(args[2]);  // CPU time limit of each test
+            PrintWriter progress = new PrintWriter(new FileWriter(new File(dir, "{file_name}-progress.jsonl")), true);
+            JsonObject start = new JsonObject();
+            start.addProperty("type", "start");
+            start.addProperty("hidden", testData.size());
+            start.addProperty("sample", sampleData.size());
+            progress.println(start.toString());
 
             JsonObject results = new JsonObject();
-            results.add("hidden_results", createResultObject(runTests(solution, testData, false)));
-            results.add("sample_results", createResultObject(runTests(solution, sampleData, true)));
+            results.add("hidden_results", createResultObject(runTests(solution, testData, progress, timeLimitMs, false)));
+            results.add("sample_results", createResultObject(runTests(solution, sampleData, progress, timeLimitMs, true)));
+            progress.close();
 
-            java.io.FileWriter file = new java.io.FileWriter("{file_name}-results.txt");
+            java.io.FileWriter file = new java.io.FileWriter(new java.io.File(dir, "{file_name}-results.txt"));
             file.write(results.toString());
             file.close();
         }} catch (Exception e) {{
@@ -499,240 +659,24 @@ public class {file_name} {{
 """
 
 
-CPP_TEMPLATE = r"""#include <fstream>
-#include <functional>
-#include <iostream>
-#include <json/json.h>
-#include <regex>
-#include <sstream>
-#include <tuple>
-#include <type_traits>
-#include <bits/stdc++.h>
-#include <vector>
-#include <streambuf>
-
-using namespace std;
+CPP_TEMPLATE = r"""#include "beatcode.h"
 
 {code}
 
-template <typename T> struct function_traits;
-template <typename> struct always_false : std::false_type {{}};
-template <typename> struct is_vector : std::false_type {{}};
-template <typename T> struct is_vector<std::vector<T>> : std::true_type {{}};
-
-template <typename C, typename R, typename... Args>
-struct function_traits<R (C::*)(Args...)> {{
-    using return_type = R;
-    using args_tuple = std::tuple<typename std::remove_reference<Args>::type...>;
-    static constexpr size_t arg_count = sizeof...(Args);
-}};
-
-template <size_t N, typename T>
-using tuple_element_t = typename std::tuple_element<N, T>::type;
-template <size_t N, typename T> struct arg_type {{
-  using type = std::tuple_element_t<N, typename function_traits<T>::args_tuple>;
-}};
-
-template <typename T> T jsonToValue(const Json::Value &val) {{
-    // Handle nested vectors recursively
-    if constexpr (is_vector<T>::value) {{
-        using ElementType = typename T::value_type;
-        T result;
-        for (const auto &elem : val) {{
-            result.push_back(jsonToValue<ElementType>(elem));
-        }}
-        return result;
-    }}
-    // Handle booleans
-    else if constexpr (std::is_same_v<T, bool>) {{
-        if (val.isBool()) {{
-            return val.asBool();
-        }} else {{
-            throw std::runtime_error("JSON value is not a boolean");
-        }}
-    }}
-    // Handle chars specifically
-    else if constexpr (std::is_same_v<T, char>) {{
-        if (val.isString()) {{
-            std::string str_val = val.asString();
-            if (!str_val.empty()) {{
-                return str_val[0];
-            }} else {{
-                throw std::runtime_error("JSON string for char is empty");
-            }}
-        }} else {{
-            throw std::runtime_error("JSON value for char is not a string");
-        }}
-    }}
-    // Handle arithmetic types (int, float, double)
-    else if constexpr (std::is_arithmetic_v<T>) {{
-        if (val.isNumeric()) {{
-            return static_cast<T>(val.isDouble() ? val.asDouble() : val.asInt());
-        }}
-        throw std::runtime_error("JSON value is not numeric");
-    }}
-    // Handle strings
-    else if constexpr (std::is_same_v<T, std::string>) {{
-        return val.asString();
-    }}
-    else {{
-        static_assert(always_false<T>::value, "Unsupported type for JSON parsing");
-    }}
-}}
-
-template <typename T> Json::Value valueToJson(const T &value) {{
-    // Handle vectors recursively
-    if constexpr (is_vector<T>::value) {{
-        Json::Value json_array(Json::arrayValue);
-        for (const auto &elem : value) {{
-            json_array.append(valueToJson(elem));
-        }}
-        return json_array;
-    }}
-    // Handle arithmetic types
-    else if constexpr (std::is_arithmetic_v<T>) {{
-        return Json::Value(value);
-    }}
-    // Handle strings
-    else if constexpr (std::is_same_v<T, std::string>) {{
-        return Json::Value(value);
-    }} else {{
-        static_assert(always_false<T>::value, "Unsupported type for JSON serialization");
-    }}
-}}
-
-struct ArgType {{
-    Json::Value data;
-    std::function<void *(void)> converter;
-
-    template <typename T> T get() const {{ return jsonToValue<T>(data); }}
-}};
-
-vector<ArgType> parseArguments(const string& input) {{
-    vector<ArgType> args;
-    istringstream iss(input);
-    string token;
-    Json::CharReaderBuilder builder;
-    Json::CharReader* reader = builder.newCharReader();
-    string errors;
-
-    while (iss >> token) {{
-        size_t eq_pos = token.find('=');
-        if (eq_pos == std::string::npos || token.find("--arg") != 0)
-            continue;
-
-        std::string value_str = token.substr(eq_pos + 1);
-        Json::Value json_val;
-
-        // Attempt to parse as JSON
-        if (reader->parse(value_str.c_str(), value_str.c_str() + value_str.length(), &json_val, &errors)) {{
-            args.push_back({{json_val}});
-        }} else {{
-            // If not valid JSON, treat as string (highly likely with single quotes)
-            if (value_str.front() == '\'' && value_str.back() == '\'') {{
-                args.push_back({{Json::Value(value_str.substr(1, value_str.length() - 2))}});
-            }} else {{
-                args.push_back({{Json::Value(value_str)}});
-            }}
-        }}
-    }}
-    delete reader;
-    return args;
-}}
-
 bool compare(const Json::Value &result, const Json::Value &expected) {{
     {compare_func}
 }}
 
-Json::Value runTests(Solution& solution, const Json::Value& testData, bool isSample) {{
-    Json::Value results(Json::arrayValue);
-    Json::CharReaderBuilder builder;
-    Json::CharReader* reader = builder.newCharReader();
-    string errors;
-
-    for (const auto &test : testData) {{
-        Json::Value testResult;
-
-        stringstream logStream;
-        streambuf* oldCout = cout.rdbuf(); 
-        cout.rdbuf(logStream.rdbuf()); 
-
-        try {{
-            auto args = parseArguments(test["input"].asString());
-
-            using Solution_t = decltype(Solution());
-            using Method_t = decltype(&Solution_t::{method_name});
-
-            {args_init}
-            auto output = solution.{method_name}({args_param});
-
-            Json::Value expected;
-            const std::string& expected_str = test["expected"].asString();
-            if (!reader->parse(expected_str.c_str(), expected_str.c_str() + expected_str.length(), &expected, &errors)) {{
-                std::cerr << "Parse error: " << errors << std::endl;
-                return false;
-            }}
-
-            Json::Value output_json= valueToJson(output);
-
-            testResult["passed"] = compare(output_json, expected);
-            Json::StreamWriterBuilder writer;
-            writer["indentation"] = "";
-            testResult["output"] = Json::writeString(writer, output_json);
-            testResult["expected"] = Json::writeString(writer, expected);
-            if (isSample) {{
-                testResult["logs"] = logStream.str(); 
-                testResult["input"] = test["input"];
-            }}
-        }} catch (const exception &e) {{
-            testResult["error"] = e.what();
-            testResult["passed"] = false;
-        }}
-        cout.rdbuf(oldCout);
-        results.append(testResult);
-    }}
-    delete reader;
-    return results;
-}}
-
-Json::Value formatResults(const Json::Value& results) {{
-    Json::Value formatted;
-    int total_tests = results.size();
-    int passed_tests = 0;
-    
-    for (const auto& test : results) {{
-        if (test["passed"].asBool()) {{
-            passed_tests++;
-        }}
-    }}
-    
-    formatted["test_results"] = results;
-    formatted["summary"]["total_tests"] = total_tests;
-    formatted["summary"]["passed_tests"] = passed_tests;
-    
-    return formatted;
-}}
-
-int main() {{
+int main(int argc, char** argv) {{
     Solution solution;
-    Json::CharReaderBuilder builder;
-    Json::CharReader* reader = builder.newCharReader();
-    Json::Value test_data, sample_data;
-    string errors;
-    
-    const string test_str = "{test_data}";
-    reader->parse(test_str.c_str(), test_str.c_str() + test_str.length(), &test_data, &errors);
-    const string sample_str = "{sample_data}";
-    reader->parse(sample_str.c_str(), sample_str.c_str() + sample_str.length(), &sample_data, &errors);
-    delete reader;
-    
-    Json::Value results;
-    results["hidden_results"] = formatResults(runTests(solution, test_data, false));
-    results["sample_results"] = formatResults(runTests(solution, sample_data, true));
-    
-    ofstream output_file("{file_name}-results.txt");
-    output_file << results.toStyledString() << endl;
-    output_file.close();
-    return 0;
+    using Solution_t = decltype(Solution());
+    using Method_t = decltype(&Solution_t::{method_name});
+
+    Invoker invoke = [&solution](const vector<ArgType>& args) {{
+        {args_init}
+        return valueToJson(solution.{method_name}({args_param}));
+    }};
+    return runHarness("{file_name}", argc > 1 ? argv[1] : "", argc > 2 ? atol(argv[2]) : 0,
+                      invoke, compare);
 }}
 """
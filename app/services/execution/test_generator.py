@@ -1,16 +1,98 @@
 from abc import ABC, abstractmethod
 import json
 import re
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
 
+from core.config import settings
+from services.execution.cache import LRUCache
 from services.execution.templates import CPP_TEMPLATE, JAVA_TEMPLATE, PYTHON_TEMPLATE
 
+CODE_MARKER = "\0BEATCODE_CODE\0"  # stands in for the user code when building a harness
+
+
+class Harness:
+    """
+    Everything a test runner needs besides the user code: the generated source around
+    the code and the fixture with the test data.
+
+    :param content_hash: The hash of the problem data the harness was built from.
+    :param prefix: The generated source before the user code.
+    :param suffix: The generated source after the user code.
+    :param fixture: The fixture file content.
+    """
+
+    def __init__(self, content_hash: int, prefix: str, suffix: str, fixture: str):
+        self.content_hash = content_hash
+        self.prefix = prefix
+        self.suffix = suffix
+        self.fixture = fixture
+
+    def render(self, code: str) -> str:
+        """
+        Get the test runner source for the given user code.
+
+        :param code: The solution code.
+        """
+        return self.prefix + code + self.suffix
+
 
 class TestGenerator(ABC):
     """
     A class to generate test runner code for a given solution code, test data and compare function.
     """
 
+    def __init__(self):
+        self._harnesses = LRUCache(settings.HARNESS_CACHE_SIZE)  # problem id -> Harness
+
+    def get_harness(
+        self,
+        problem_id: Optional[Union[int, str]],
+        file_name: str,
+        method_name: str,
+        test_data: List[Dict],
+        sample_data: List[Dict],
+        compare_func: str,
+    ) -> Harness:
+        """
+        Get the harness of a problem, building it only if the problem isn't cached or its
+        data changed since it was cached.
+
+        :param problem_id: The ID of the problem (or of a shard of its tests), None to
+            skip the cache.
+        :param file_name: The file and class name of the test runner.
+        :param method_name: The solution's main function name.
+        :param test_data: The hidden test data.
+        :param sample_data: The sample test data.
+        :param compare_func: The compare function.
+        """
+        # Strings cache their hash, so this stays cheap for the same problem's data
+        content_hash = hash(
+            (
+                file_name,
+                method_name,
+                compare_func,
+                tuple((t["input"], t["expected"]) for t in test_data),
+                tuple((t["input"], t["expected"]) for t in sample_data),
+            )
+        )
+
+        if problem_id is not None:
+            harness = self._harnesses.get(problem_id)
+            if harness and harness.content_hash == content_hash:
+                return harness
+
+        source = self.generate_test_file(
+            CODE_MARKER, file_name, method_name, test_data, sample_data, compare_func
+        )
+        prefix, suffix = source.split(CODE_MARKER, 1)
+        harness = Harness(
+            content_hash, prefix, suffix, self.generate_fixture(test_data, sample_data)
+        )
+
+        if problem_id is not None:
+            self._harnesses.put(problem_id, harness)
+        return harness
+
     @abstractmethod
     def generate_test_file(
         self,
@@ -23,13 +105,23 @@ class TestGenerator(ABC):
     ) -> str:
         """
         Generate test runner code for a given solution code, test data and compare function.
+        The runner loads the test data from the fixture file passed as its first argument.
 
         :param code: The solution code.
         :param method_name: The solution's main function name.
-        :param test_data: The test data.
+        :param test_data: The test data, only used to work out the method's arguments.
         :param compare_func: The compare function.
         """
 
+    def generate_fixture(self, test_data: List[Dict], sample_data: List[Dict]) -> str:
+        """
+        Generate the fixture file the test runner loads its test data from.
+
+        :param test_data: The hidden test data.
+        :param sample_data: The sample test data.
+        """
+        return json.dumps({"hidden": test_data, "sample": sample_data})
+
     @abstractmethod
     def get_file_extension(self) -> str:
         """Get the file extension for the given language."""
@@ -38,15 +130,12 @@ class TestGenerator(ABC):
     def get_line_offset(self) -> int:
         """Get the line offset for the given language."""
 
-    def process_quotes(self, json_str: str) -> str:
+    @abstractmethod
+    def get_prelude(self) -> str:
         """
-        Process quotes in a JSON string.
-
-        :param json_str: The JSON string.
+        Get the generated source before the user code, the same for every problem and
+        get_line_offset lines long.
         """
-        return json_str.replace('"', '\\"').replace(
-            '\\\\"', '\\\\\\"'
-        )  # cursed code alert
 
 
 class PythonTestGenerator(TestGenerator):
@@ -64,15 +153,16 @@ class PythonTestGenerator(TestGenerator):
             file_name=file_name,
             method_name=method_name,
             compare_func=compare_func,
-            test_data=json.dumps(test_data),
-            sample_data=json.dumps(sample_data),
         )
 
     def get_file_extension(self) -> str:
         return ".py"
 
     def get_line_offset(self) -> int:
-        return 6
+        return 8
+
+    def get_prelude(self) -> str:
+        return PYTHON_TEMPLATE[: PYTHON_TEMPLATE.index("{code}")]
 
 
 class JavaTestGenerator(TestGenerator):
@@ -85,52 +175,21 @@ class JavaTestGenerator(TestGenerator):
         sample_data: List[Dict],
         compare_func: str,
     ) -> str:
-        MAX_STR_LEN = 60000
-        test_data = self.process_quotes(json.dumps(test_data))
-        sample_data = self.process_quotes(json.dumps(sample_data))
-        if len(test_data) > MAX_STR_LEN:
-            test_data = self.data_chunks(test_data)
-        else:
-            test_data = f'"{test_data}"'
-        if len(sample_data) > MAX_STR_LEN:
-            sample_data = self.data_chunks(test_data)
-        else:
-            sample_data = f'"{sample_data}"'
-
         return JAVA_TEMPLATE.format(
             code=code,
             file_name=file_name,
             method_name=method_name,
             compare_func=compare_func,
-            test_data=test_data,
-            sample_data=sample_data,
         )
 
-    def data_chunks(self, data: str) -> str:
-        """
-        Converts the data to a string of concatenated JSON strings.
-        Since C++ code can only handle 65k characters max in a string variable.
-
-        :param data: The test data string to process.
-        """
-        MAX_LENGTH = 1000
-        json_strings = []
-        cur = 0
-        while cur < len(data):
-            if cur + MAX_LENGTH < len(data):
-                next_chunk = data[cur : cur + MAX_LENGTH]
-            else:
-                next_chunk = data[cur:]
-            json_strings.append(next_chunk)
-            cur += MAX_LENGTH
-        chunks = "".join(['.append("' + s + '")' for s in json_strings])
-        return f"new StringBuilder(){chunks}.toString()"
-
     def get_file_extension(self) -> str:
         return ".java"
 
     def get_line_offset(self) -> int:
-        return 8
+        return 9
+
+    def get_prelude(self) -> str:
+        return JAVA_TEMPLATE[: JAVA_TEMPLATE.index("{code}")]
 
 
 class CppTestGenerator(TestGenerator):
@@ -143,20 +202,24 @@ class CppTestGenerator(TestGenerator):
         sample_data: List[Dict],
         compare_func: str,
     ) -> str:
-        args_init, args_param = self.process_args(test_data[0]["input"])
-        test_data = self.process_test_data(test_data)
-        sample_data = self.process_test_data(sample_data)
+        # Runs have no hidden tests, the samples have the same arguments
+        args_init, args_param = self.process_args(
+            (test_data or sample_data)[0]["input"]
+        )
         return CPP_TEMPLATE.format(
             code=code,
             file_name=file_name,
             method_name=method_name,
             compare_func=compare_func,
-            test_data=self.process_quotes(json.dumps(test_data)),
-            sample_data=self.process_quotes(json.dumps(sample_data)),
             args_init=args_init,
             args_param=args_param,
         )
 
+    def generate_fixture(self, test_data: List[Dict], sample_data: List[Dict]) -> str:
+        return super().generate_fixture(
+            self.process_test_data(test_data), self.process_test_data(sample_data)
+        )
+
     def process_args(self, args: str) -> (str, str):
         """
         Process the args string and return the initialization lines and parameters.
@@ -209,4 +272,7 @@ class CppTestGenerator(TestGenerator):
         return ".cpp"
 
     def get_line_offset(self) -> int:
-        return 14
+        return 2
+
+    def get_prelude(self) -> str:
+        return CPP_TEMPLATE[: CPP_TEMPLATE.index("{code}")]
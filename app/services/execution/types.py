@@ -33,6 +33,33 @@ class TestResult:
         return result
 
 
+class ContainerOutput:
+    """
+    The raw output of a single container run, owned by the call that produced it.
+
+    :param status_code: The exit code of the run, None if it timed out.
+    :param logs: The combined stdout/stderr logs.
+    :param stderr: The stderr logs.
+    :param usage: The resources the run used, see usage.make_usage.
+    """
+
+    def __init__(
+        self,
+        status_code: Optional[int],
+        logs: str = "",
+        stderr: str = "",
+        usage: Optional[Dict] = None,
+    ):
+        self.status_code = status_code
+        self.logs = logs
+        self.stderr = stderr
+        self.usage = usage
+
+    @property
+    def timed_out(self) -> bool:
+        return self.status_code is None
+
+
 class ExecutionResult:
     """
     A class to represent the result of an execution.
@@ -46,7 +73,8 @@ class ExecutionResult:
         test_results: Optional[List[TestResult]] = None,
         sample_results: Optional[List[TestResult]] = None,
         summary: Optional[Dict] = None,
-        runtime_analysis: Optional[str] = None,
+        usage: Optional[Dict] = None,  # CPU time, peak memory and OOM kill of the run
+        cached: bool = False,  # reused from an identical submission, not run again
     ):
         self.success = success
         self.message = message
@@ -54,7 +82,8 @@ class ExecutionResult:
         self.test_results = test_results
         self.sample_results = sample_results
         self.summary = summary
-        self.runtime_analysis = runtime_analysis
+        self.usage = usage
+        self.cached = cached
 
     def all_cleared(self) -> bool:
         """
@@ -66,6 +95,32 @@ class ExecutionResult:
             else False
         )
 
+    def _cpu_times(self) -> List[float]:
+        """Get the CPU time (ms) of every test that reported one."""
+        return [
+            t["cpu_time"]
+            for t in (self.test_results or []) + (self.sample_results or [])
+            if t.get("cpu_time") is not None
+        ]
+
+    @property
+    def total_runtime(self) -> float:
+        """The CPU time (ms) of all tests together."""
+        return round(sum(self._cpu_times()), 3)
+
+    @property
+    def max_runtime(self) -> float:
+        """The CPU time (ms) of the slowest test."""
+        return round(max(self._cpu_times(), default=0), 3)
+
+    @property
+    def timed_out(self) -> bool:
+        """Whether the run, or any of its tests, hit its time limit."""
+        return "Time Limit Exceeded" in (self.message or "") or any(
+            t.get("time_limit_exceeded")
+            for t in (self.test_results or []) + (self.sample_results or [])
+        )
+
     def to_dict(self) -> Dict:
         """
         Conversion method in case we need to serialize the object.
@@ -85,5 +140,8 @@ class ExecutionResult:
                     else 0
                 ),
             },
-            "runtime_analysis": self.runtime_analysis,
+            "total_runtime": self.total_runtime,
+            "max_runtime": self.max_runtime,
+            "usage": self.usage,
+            "cached": self.cached,
         }
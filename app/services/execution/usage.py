@@ -0,0 +1,110 @@
+from typing import Dict, List, Optional
+
+# Prints the cgroup v2 accounting files of the container it runs in, one section per
+# file: "==> cpu.stat <==" and so on
+CGROUP_USAGE_COMMAND = (
+    "cd /sys/fs/cgroup && head -n 64 cpu.stat memory.peak memory.events"
+)
+
+
+def make_usage(
+    cpu_time: Optional[float], peak_memory: Optional[int], oom_killed: bool
+) -> Dict:
+    """
+    Describe the resources a run used, measured outside of the submitted code.
+
+    :param cpu_time: The CPU time (ms) of the run, None if unknown.
+    :param peak_memory: The peak memory (kb) of the run, None if unknown.
+    :param oom_killed: Whether the run was killed for exceeding its memory limit.
+    """
+    return {
+        "cpu_time": round(cpu_time, 3) if cpu_time is not None else None,
+        "peak_memory": peak_memory,
+        "oom_killed": oom_killed,
+    }
+
+
+def rusage_usage(rusage, oom_killed: bool = False) -> Dict:
+    """
+    Get the usage of a process from its rusage, see os.wait4.
+
+    :param rusage: The rusage of the process and the children it waited for.
+    :param oom_killed: Whether the process was killed for its memory.
+    """
+    return make_usage(
+        (rusage.ru_utime + rusage.ru_stime) * 1000, rusage.ru_maxrss, oom_killed
+    )
+
+
+def parse_cgroup(text: str) -> Optional[Dict[str, int]]:
+    """
+    Parse the output of CGROUP_USAGE_COMMAND.
+
+    :param text: The output.
+    :return: The CPU time ("cpu_usec"), peak memory ("peak_bytes") and OOM kills
+        ("oom_kills") of the container so far, None if the files aren't there, e.g.
+        on cgroup v1 hosts. The peak needs Linux 5.19, it's None on older kernels.
+    """
+    values = {}
+    section = None
+    for line in text.splitlines():
+        if line.startswith("==> ") and line.endswith(" <=="):
+            section = line[4:-4]
+            continue
+        parts = line.split()
+        if section == "memory.peak" and len(parts) == 1 and parts[0].isdigit():
+            values["peak_bytes"] = int(parts[0])
+        elif len(parts) == 2 and parts[1].isdigit():
+            if (section, parts[0]) == ("cpu.stat", "usage_usec"):
+                values["cpu_usec"] = int(parts[1])
+            elif (section, parts[0]) == ("memory.events", "oom_kill"):
+                values["oom_kills"] = int(parts[1])
+
+    if "cpu_usec" not in values or "oom_kills" not in values:
+        return None
+    values.setdefault("peak_bytes", None)
+    return values
+
+
+def cgroup_usage(
+    after: Optional[Dict[str, int]], before: Optional[Dict[str, int]] = None
+) -> Optional[Dict]:
+    """
+    Get the usage of a run from the readings of its container's cgroup.
+
+    :param after: The reading after the run, see parse_cgroup.
+    :param before: The reading before the run, None if the container was created for
+        it. The cgroup only keeps the highest peak of all the container's runs, so
+        the run's own peak is only known if it went past the one before it.
+    :return: The usage, None if there is no reading after the run.
+    """
+    if after is None:
+        return None
+    before = before or {"cpu_usec": 0, "peak_bytes": 0, "oom_kills": 0}
+
+    peak = after["peak_bytes"]
+    if peak is not None and before["peak_bytes"] is not None:
+        peak = peak if peak > before["peak_bytes"] else None
+    return make_usage(
+        (after["cpu_usec"] - before["cpu_usec"]) / 1000,
+        peak // 1024 if peak is not None else None,
+        after["oom_kills"] > before["oom_kills"],
+    )
+
+
+def merge_usage(usages: List[Optional[Dict]]) -> Optional[Dict]:
+    """
+    Get the usage of runs that make up one job, e.g. its shards: their total CPU time,
+    their highest peak memory and whether any was killed for its memory.
+
+    :param usages: The usage of every run, None for the ones that weren't measured.
+    """
+    if not usages or any(u is None for u in usages):
+        return None
+    cpu_times = [u["cpu_time"] for u in usages]
+    peaks = [u["peak_memory"] for u in usages if u["peak_memory"] is not None]
+    return make_usage(
+        sum(cpu_times) if None not in cpu_times else None,
+        max(peaks) if peaks else None,
+        any(u["oom_killed"] for u in usages),
+    )
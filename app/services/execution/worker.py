@@ -0,0 +1,87 @@
+import json
+import select
+import time
+from typing import Optional
+
+import docker.errors
+from docker.utils import socket as socket_utils
+
+
+class WorkerProcess:
+    """
+    A long-lived process exec'd inside a sandbox container. Requests are sent as JSON
+    lines on its stdin and it answers each one with a JSON line on its stdout.
+
+    :param client: The Docker client.
+    :param container: The container to start the process in.
+    :param command: The command that starts the process.
+    """
+
+    def __init__(self, client: docker.DockerClient, container, command: list):
+        self.client = client
+        self.exec_id = client.api.exec_create(
+            container.id, command, stdin=True, workdir="/code"
+        )["Id"]
+        self._sock = client.api.exec_start(self.exec_id, socket=True)
+        self._buffer = b""
+        self._stderr = []
+        self.alive = True
+
+    def request(self, message: dict, timeout: float) -> Optional[dict]:
+        """
+        Send a request and wait for its response.
+
+        :param message: The request.
+        :param timeout: Seconds to wait for the response.
+        :return: The response, or None if the process didn't answer in time. If the
+            process exited instead, the response has its exit status and stderr.
+        """
+        try:
+            # exec sockets can come wrapped in a SocketIO that is read-only
+            getattr(self._sock, "_sock", self._sock).sendall(
+                json.dumps(message).encode() + b"\n"
+            )
+        except OSError:
+            return self._exited()
+
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self._sock], [], [], remaining)[0]:
+                self.close()
+                return None
+
+            stream, size = socket_utils.next_frame_header(self._sock)
+            if size < 0:
+                return self._exited()
+            data = socket_utils.read_exactly(self._sock, size) if size else b""
+            if stream == socket_utils.STDERR:
+                self._stderr.append(data)
+            else:
+                self._buffer += data
+
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def close(self):
+        """Close the connection, which ends the process when it reads EOF."""
+        self.alive = False
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+    def _exited(self) -> dict:
+        """Build a response for a process that exited without answering."""
+        self.close()
+        try:
+            status = self.client.api.exec_inspect(self.exec_id)["ExitCode"]
+        except docker.errors.APIError:
+            status = None
+        stderr = b"".join(self._stderr).decode("utf-8", errors="replace")
+        return {
+            "status": 1 if status is None else status,
+            "stdout": "",
+            "stderr": stderr,
+            "recycle": True,
+        }
@@ -570,6 +570,8 @@ class GameManager:
         if game:
             self.player_to_game.pop(game.player1.user_id, None)
             self.player_to_game.pop(game.player2.user_id, None)
+            # Nobody needs the results of the submissions still running
+            game.cancellation.cancel("the game ended")
 
 
 game_manager = GameManager()
@@ -6,8 +6,9 @@ from typing import Dict, List, Optional
 from core.config import settings
 from db.models.problem import Problem
 from fastapi import WebSocket
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from schemas.game import GameEvent
+from services.execution.cancellation import CancellationToken
 
 
 class GameStatus(str, Enum):
@@ -94,6 +95,8 @@ class GameState(BaseModel):
     :param match_type: The type of the match.
     :param winner: The ID of the winner of the game.
     :param is_cleaning_up: A flag indicating whether the game is cleaning up.
+    :param cancellation: Cancelled when the game ends, which stops the executions
+        still running for it.
     """
 
     id: str
@@ -109,6 +112,7 @@ class GameState(BaseModel):
     player1_rating_change: Optional[float] = None
     player2_rating_change: Optional[float] = None
     custom_settings: Optional[Dict] = None
+    cancellation: CancellationToken = Field(default_factory=CancellationToken)
 
     class Config:
         arbitrary_types_allowed = True
@@ -154,8 +158,15 @@ class GameState(BaseModel):
 
         :return: True if the match has timed out, False otherwise.
         """
-        elapsed_time = time.time() - self.start_time
+        return time.time() >= self.end_time()
+
+    def end_time(self) -> float:
+        """
+        Get the time the match times out at.
+
+        :return: The epoch time of the timeout.
+        """
         timeout = (
             settings.MATCH_TIMEOUT_MINUTES * 60 if not settings.TESTING else 3 * 60
         )  # change when testing (timeout test = 20, normal = 3 * 60)
-        return elapsed_time >= timeout
+        return self.start_time + timeout
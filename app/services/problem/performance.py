@@ -0,0 +1,289 @@
+import asyncio
+import math
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from db.models.game import Submission
+from db.models.problem import Problem
+from db.session import SessionLocal
+from sqlalchemy.orm import Session
+
+
+class LogHistogram:
+    """
+    Counts of values in buckets of logarithmic width, so a fixed number of buckets
+    covers values from microseconds to minutes with the same relative precision.
+
+    :param low: The upper bound of the first bucket, smaller values count there too.
+    :param size: The number of buckets, the last one counts every larger value.
+    :param per_doubling: The number of buckets each doubling of the value spans.
+    :param counts: The counts to start from, e.g. loaded from the database.
+    """
+
+    def __init__(
+        self,
+        low: float,
+        size: int,
+        per_doubling: int,
+        counts: Optional[List[int]] = None,
+    ):
+        self.low = low
+        self.per_doubling = per_doubling
+        self.counts = list(counts) if counts and len(counts) == size else [0] * size
+        self.total = sum(self.counts)
+
+    def bucket(self, value: float) -> int:
+        """Get the index of the bucket a value counts in."""
+        if value <= self.low:
+            return 0
+        index = 1 + int(math.log2(value / self.low) * self.per_doubling)
+        return min(index, len(self.counts) - 1)
+
+    def add(self, value: float, count: int = 1):
+        self.counts[self.bucket(value)] += count
+        self.total += count
+
+    def merge(self, other: "LogHistogram"):
+        """Add the counts of a histogram with the same buckets."""
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+
+    def rank(self, value: float) -> Optional[float]:
+        """
+        Get the percentage of the counted values that are larger than a value.
+
+        :param value: The value.
+        :return: The percentage, None if nothing was counted yet.
+        """
+        if not self.total:
+            return None
+        index = self.bucket(value)
+        # Values in the same bucket are as likely to be smaller as larger
+        larger = sum(self.counts[index + 1 :]) + self.counts[index] / 2
+        return round(100 * larger / self.total, 1)
+
+
+# Metric -> (result value, first bucket, buckets, buckets per doubling). Runtimes are
+# the CPU time (ms) of all tests, from 10µs to about 2 minutes, memory the peak (kb)
+# of the run, from 1 mb to about 16 gb.
+METRICS = {
+    "runtime": (lambda result: result["total_runtime"] or None, 0.01, 96, 4),
+    "memory": (
+        lambda result: (result["usage"] or {}).get("peak_memory"),
+        1024,
+        56,
+        4,
+    ),
+}
+
+
+def make_histogram(metric: str, counts: Optional[List[int]] = None) -> LogHistogram:
+    _, low, size, per_doubling = METRICS[metric]
+    return LogHistogram(low, size, per_doubling, counts)
+
+
+class PerformanceStats:
+    """
+    Ranks accepted solutions by runtime and peak memory among the accepted solutions
+    of the same problem and language ("faster than X%"), with a histogram per metric.
+
+    The histograms are loaded from their problem the first time it's needed, updated
+    in memory, and their new counts are added to the problem's every
+    PERFORMANCE_FLUSH_INTERVAL seconds. Servers sharing the database each add their
+    own counts, and pick up the others' when they flush.
+
+    :param flush_interval: Seconds between flushes.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        # (problem ID, language) -> metric -> histogram, counts in the database and new
+        self._histograms: Dict[Tuple[int, str], Dict[str, LogHistogram]] = {}
+        # Counts not flushed yet, same keys
+        self._pending: Dict[Tuple[int, str], Dict[str, LogHistogram]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Flush the histograms in the background until stopped."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop flushing in the background and flush what's left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def record(
+        self, db: Session, user_id: int, problem_id: int, lang: str, result: Dict
+    ) -> Optional[Dict]:
+        """
+        Rank a solution among the accepted solutions before it, then count it. Only
+        the first accepted solution of a user to a problem in a language counts, and
+        only if it was run rather than answered from the result cache, so resubmits
+        can't skew the histograms. Call it before the submission is saved.
+
+        :param db: The database session, to load the histograms the first time.
+        :param user_id: The ID of the user who submitted the solution.
+        :param problem_id: The ID of the problem the solution was submitted to.
+        :param lang: The programming language of the solution.
+        :param result: The result of the solution, see ExecutionResult.to_dict.
+        :return: The percentage of accepted solutions that were slower ("runtime")
+            and that used more memory ("memory"), each None if it wasn't measured or
+            there is nothing to compare it to yet. None if the solution didn't pass
+            every test.
+        """
+        summary = result["summary"]
+        if not result["success"] or not (
+            0 < summary["passed_tests"] == summary["total_tests"]
+        ):
+            return None
+
+        key = (problem_id, lang)
+        if key not in self._histograms:
+            performance = (
+                db.query(Problem.performance).filter(Problem.id == problem_id).scalar()
+            )
+            stored = (performance or {}).get(lang, {})
+            self._histograms[key] = {
+                metric: make_histogram(metric, stored.get(metric)) for metric in METRICS
+            }
+        histograms = self._histograms[key]
+        count = not result["cached"] and not self._accepted_before(
+            db, user_id, problem_id, lang
+        )
+        pending = self._pending.setdefault(
+            key, {metric: make_histogram(metric) for metric in METRICS}
+        )
+
+        ranks = {}
+        for metric, (value_of, *_) in METRICS.items():
+            value = value_of(result)
+            ranks[metric] = histograms[metric].rank(value) if value else None
+            if value and count:
+                histograms[metric].add(value)
+                pending[metric].add(value)
+        return ranks
+
+    def _accepted_before(
+        self, db: Session, user_id: int, problem_id: int, lang: str
+    ) -> bool:
+        """Check if a user has an earlier accepted submission to a problem."""
+        earlier = (
+            db.query(Submission.id)
+            .filter(
+                Submission.user_id == user_id,
+                Submission.problem_id == problem_id,
+                Submission.lang == lang,
+                Submission.success.is_(True),
+                Submission.total_tests > 0,
+                Submission.passed_tests == Submission.total_tests,
+            )
+            .first()
+        )
+        return earlier is not None
+
+    async def flush(self):
+        """Add the new counts to the problems in the database."""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        try:
+            stored = await asyncio.to_thread(self._flush, pending)
+        except Exception:
+            print(traceback.format_exc())
+            # Kept for the next flush, unless new counts came in for the same key
+            for key, histograms in pending.items():
+                self._pending.setdefault(key, histograms)
+            return
+
+        # The database has every server's counts, then the ones that came in since
+        for key, counts in stored.items():
+            histograms = {
+                metric: make_histogram(metric, counts.get(metric)) for metric in METRICS
+            }
+            for metric, histogram in self._pending.get(key, {}).items():
+                histograms[metric].merge(histogram)
+            self._histograms[key] = histograms
+
+    def _flush(
+        self, pending: Dict[Tuple[int, str], Dict[str, LogHistogram]]
+    ) -> Dict[Tuple[int, str], Dict[str, List[int]]]:
+        """
+        Add counts to the histograms of their problems, one problem at a time.
+
+        :param pending: The counts, see _pending.
+        :return: The counts in the database after the flush.
+        """
+        stored = {}
+        db = SessionLocal()
+        try:
+            for problem_id in {problem_id for problem_id, _ in pending}:
+                languages = {
+                    lang: histograms
+                    for (pid, lang), histograms in pending.items()
+                    if pid == problem_id
+                }
+                performance = self._flush_problem(db, problem_id, languages)
+                for lang in languages:
+                    stored[(problem_id, lang)] = performance.get(lang, {})
+        finally:
+            db.close()
+        return stored
+
+    def _flush_problem(
+        self,
+        db: Session,
+        problem_id: int,
+        languages: Dict[str, Dict[str, LogHistogram]],
+    ) -> Dict:
+        """
+        Add counts to the histograms of a problem, locking its row so servers that
+        flush at the same time don't lose each other's counts.
+
+        :param db: The database session.
+        :param problem_id: The ID of the problem.
+        :param languages: Language -> metric -> the counts to add.
+        :return: The histograms of the problem after the flush.
+        """
+        try:
+            problem = (
+                db.query(Problem).filter(Problem.id == problem_id).with_for_update()
+            ).first()
+            if problem is None:
+                db.rollback()
+                return {}
+
+            performance = dict(problem.performance or {})
+            for lang, histograms in languages.items():
+                stored = performance.get(lang, {})
+                counts = {}
+                for metric, histogram in histograms.items():
+                    total = make_histogram(metric, stored.get(metric))
+                    total.merge(histogram)
+                    counts[metric] = total.counts
+                performance[lang] = counts
+
+            # A new dict, so the JSON column sees the change
+            problem.performance = performance
+            db.commit()
+            return performance
+        except Exception:
+            db.rollback()
+            raise
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+performance_stats = PerformanceStats(settings.PERFORMANCE_FLUSH_INTERVAL)
@@ -2,6 +2,7 @@ import random
 from typing import Dict, List, Optional
 
 from core.config import settings
+from db.models.game import Submission
 from db.models.problem import Problem
 from sqlalchemy import func
 from sqlalchemy.orm import Session
@@ -142,4 +143,48 @@ class ProblemManager:
             "sample_test_results": problem.sample_test_results,
             "method_name": problem.method_name,
             "compare_func": problem.compare_func,
+            "input_generator": problem.input_generator,
         }
+
+    @staticmethod
+    def save_submission(
+        db: Session,
+        user_id: int,
+        problem: Problem,
+        match_type: str,
+        lang: str,
+        result: Dict,
+    ):
+        """
+        Store the result of a submission, with the resources its run used. Cancelled
+        runs were never shown to the player, they aren't stored.
+
+        :param db: The database session.
+        :param user_id: The ID of the user who submitted the code.
+        :param problem: The problem the code was submitted to.
+        :param match_type: The type of the match, or "practice".
+        :param lang: The programming language of the code.
+        :param result: The result of the execution, see ExecutionResult.to_dict.
+        """
+        if (result["message"] or "").startswith("Execution Cancelled"):
+            return
+
+        usage = result["usage"] or {}
+        submission = Submission(
+            user_id=user_id,
+            problem_id=problem.id,
+            match_type=match_type,
+            lang=lang,
+            success=result["success"],
+            passed_tests=result["summary"]["passed_tests"],
+            total_tests=result["summary"]["total_tests"],
+            cpu_time=usage.get("cpu_time"),
+            peak_memory=usage.get("peak_memory"),
+            oom_killed=usage.get("oom_killed"),
+        )
+        try:
+            db.add(submission)
+            db.commit()
+        except Exception as e:
+            print(f"Error saving submission: {e}")
+            db.rollback()
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.cancellation import CancellationToken, on_cancel
+
+# fmt: on
+
+
+def test_callbacks_run_once():
+    token = CancellationToken()
+    calls = []
+    token.add_callback(lambda: calls.append("first"))
+    remove = token.add_callback(lambda: calls.append("removed"))
+    remove()
+
+    token.cancel("the game ended")
+    token.cancel("the player left")
+
+    assert calls == ["first"]
+    assert token.reason == "the game ended"
+
+
+def test_callback_after_cancel_runs_right_away():
+    token = CancellationToken()
+    token.cancel()
+    calls = []
+    token.add_callback(lambda: calls.append(True))
+
+    assert calls == [True]
+
+
+def test_parent_cancels_children():
+    game = CancellationToken()
+    connection = CancellationToken(game)
+    game.cancel("the game ended")
+
+    assert connection.cancelled
+    assert connection.reason == "the game ended"
+    # A child of a cancelled token starts cancelled
+    assert CancellationToken(game).cancelled
+
+
+def test_child_leaves_parent():
+    game = CancellationToken()
+    for _ in range(3):
+        CancellationToken(game).cancel("the player left")
+
+    assert not game.cancelled
+    assert not game._callbacks
+
+
+def test_on_cancel_only_inside_the_block():
+    token = CancellationToken()
+    calls = []
+    with on_cancel(token, lambda: calls.append(True)):
+        pass
+    token.cancel()
+
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_wait_for_a_cancel_from_another_thread():
+    token = CancellationToken()
+    waiter = asyncio.create_task(token.wait())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    threading.Thread(target=token.cancel).start()
+    await asyncio.wait_for(waiter, 1)
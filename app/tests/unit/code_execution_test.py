@@ -1,11 +1,14 @@
 import asyncio
 import os
 import sys
+import time
 
 import pytest
 
 # fmt: off
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from core.config import settings
+from services.execution.cancellation import CancellationToken
 from services.execution.service import CodeExecutionService
 
 # fmt: on
@@ -264,11 +267,388 @@ class Solution:
         assert all(r.success for r in results)
         assert len(results) == 20
 
-    def test_different_difficulty_semaphores(self, executor):
+    @pytest.mark.asyncio
+    async def test_run_with_custom_inputs(self, executor, valid_solution):
+        result = await executor.run_code(
+            code=valid_solution,
+            method_name="add",
+            sample_test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0"],
+            sample_expected_results=["3", "1"],
+            custom_test_cases=["--arg1=20 --arg2=22"],
+            compare_func="return result == int(expected)",
+            lang="python",
+        )
+
+        assert result.success
+        assert result.test_results == []
+        assert [t["passed"] for t in result.sample_results] == [True, False, None]
+        assert "42" in result.sample_results[2]["output"]
+        assert result.summary == {"total_tests": 2, "passed_tests": 1}
+
+    @pytest.mark.asyncio
+    async def test_progress_and_partial_timeout(self, executor):
+        events = []
+
+        async def on_progress(event):
+            events.append(event)
+
+        # Only the last hidden test waits forever, without using CPU time so only the
+        # container's time limit stops it
+        result = await executor.execute_code(
+            code="""
+import time
+
+class Solution:
+    def add(self, a: int, b: int) -> int:
+        while a < 0:
+            time.sleep(1)
+        return a + b
+""",
+            method_name="add",
+            test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0", "--arg1=-1 --arg2=1"],
+            expected_results=["3", "0", "0"],
+            sample_test_cases=["--arg1=1 --arg2=2"],
+            sample_expected_results=["3"],
+            difficulty="easy",
+            compare_func="return result == int(expected)",
+            lang="python",
+            on_progress=on_progress,
+        )
+
+        assert not result.success
+        assert "Time Limit Exceeded" in result.message
+        assert result.summary == {"total_tests": 3, "passed_tests": 2}
+        assert [(e["index"], e["passed"], e["completed"]) for e in events] == [
+            (0, True, 1),
+            (1, True, 2),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_per_test_time_limit(self, executor):
+        # Only the last hidden test loops forever, the run goes on after it
+        result = await executor.execute_code(
+            code="""
+class Solution:
+    def add(self, a: int, b: int) -> int:
+        while a < 0:
+            pass
+        return a + b
+""",
+            method_name="add",
+            test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0", "--arg1=-1 --arg2=1"],
+            expected_results=["3", "0", "0"],
+            sample_test_cases=["--arg1=1 --arg2=2"],
+            sample_expected_results=["3"],
+            difficulty="easy",
+            compare_func="return result == int(expected)",
+            lang="python",
+        )
+
+        assert not result.success
+        assert "Time Limit Exceeded" in result.message
+        assert result.summary == {"total_tests": 3, "passed_tests": 2}
+        assert [t["time_limit_exceeded"] for t in result.test_results] == [
+            False,
+            False,
+            True,
+        ]
+        assert result.sample_results[0]["passed"]
+        assert result.test_results[2]["cpu_time"] >= 900
+        assert result.max_runtime == result.test_results[2]["cpu_time"]
+        assert result.total_runtime >= result.max_runtime
+
+    @pytest.mark.asyncio
+    async def test_result_cache(self, executor, valid_solution):
+        def submit(code):
+            return executor.execute_code(
+                code=code,
+                method_name="add",
+                test_cases=["--arg1=1 --arg2=2"],
+                expected_results=["3"],
+                sample_test_cases=["--arg1=1 --arg2=2"],
+                sample_expected_results=["3"],
+                difficulty="easy",
+                compare_func="return result == int(expected)",
+                problem_id=1,
+            )
+
+        # Identical submissions in flight share one run
+        first, second = await asyncio.gather(
+            submit(valid_solution), submit(valid_solution)
+        )
+        assert sorted([first.cached, second.cached]) == [False, True]
+        assert first.to_dict()["test_results"] == second.to_dict()["test_results"]
+        # A resubmit that only differs in line endings is answered from the cache
+        third = await submit(valid_solution.replace("\n", "\r\n"))
+        assert third.cached
+        # Blank lines can change a string literal, and line numbers of errors
+        fourth = await submit(valid_solution + "\n\n")
+        assert not fourth.cached
+        assert executor.get_stats()["result_cache"] == {
+            "hits": 1,
+            "misses": 2,
+            "shared": 1,
+            "size": 2,
+        }
+
+    @pytest.mark.asyncio
+    async def test_measure_complexity(self, executor, valid_solution, monkeypatch):
+        monkeypatch.setattr(
+            settings, "COMPLEXITY_MEASUREMENT_SIZES", "500, 1000, 2000, 4000"
+        )
+        monkeypatch.setattr(settings, "COMPLEXITY_MEASUREMENT_REPEATS", 2)
+        quadratic_solution = """
+class Solution:
+    def twoSum(self, nums: list[int], target: int) -> list[int]:
+        for i in range(len(nums)):
+            for j in range(i + 1, len(nums)):
+                if nums[i] + nums[j] == target:
+                    return [i, j]
+        return []
+"""
+        # The target can't be reached, so every solution scans the whole input
+        generator = [
+            {"type": "int_array", "min": -1000, "max": 1000},
+            {"type": "int", "min": 3000, "max": 3000},
+        ]
+
+        def measure(code):
+            return executor.measure_complexity(
+                code, "twoSum", generator, "return result == expected"
+            )
+
+        quadratic = await measure(quadratic_solution)
+        assert quadratic["complexity"] == "O(n^2)"
+        assert 0 <= quadratic["confidence"] <= 1
+        linear = await measure(valid_solution)
+        assert linear["complexity"] in ("O(n)", "O(n log n)")
+
+    @pytest.mark.asyncio
+    async def test_measurement_waits_for_live_jobs(self, executor, valid_solution):
+        generator = [{"type": "int_array"}, {"type": "int", "min": 3000, "max": 3000}]
+        submission = asyncio.create_task(
+            executor.execute_code(
+                code=valid_solution,
+                method_name="add",
+                test_cases=["--arg1=1 --arg2=2"],
+                expected_results=["3"],
+                sample_test_cases=["--arg1=1 --arg2=2"],
+                sample_expected_results=["3"],
+                difficulty="easy",
+                compare_func="return result == int(expected)",
+            )
+        )
+        await asyncio.sleep(0)  # let the submission start
+        measurement = asyncio.create_task(
+            executor.measure_complexity(
+                valid_solution, "twoSum", generator, "return result == expected"
+            )
+        )
+
+        await submission
+        assert not measurement.done()
+        await measurement
+
+    @pytest.mark.asyncio
+    async def test_measurement_gives_up(
+        self, executor, valid_solution, invalid_syntax_solution, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "COMPLEXITY_MEASUREMENT_MAX_WAIT", 0.1)
+        generator = [{"type": "int_array"}, {"type": "int", "min": 3000, "max": 3000}]
+
+        def measure(code):
+            return executor.measure_complexity(
+                code, "twoSum", generator, "return result == expected"
+            )
+
+        # The server stays busy
+        executor.scheduler.idle.clear()
+        try:
+            assert await measure(valid_solution) is None
+        finally:
+            executor.scheduler.idle.set()
+        # Nothing to measure
+        assert await measure(invalid_syntax_solution) is None
+
+    @pytest.mark.asyncio
+    async def test_zygote_survives_failures(
+        self,
+        executor,
+        valid_solution,
+        invalid_syntax_solution,
+        undefined_variable_solution,
+        infinite_loop_solution,
+    ):
+        # Every run is a fresh child of the zygote, failures must not affect later runs
+        executor.docker.python_zygote_enabled = bool(executor.docker.pool)
+        for code in [
+            infinite_loop_solution,
+            invalid_syntax_solution,
+            undefined_variable_solution,
+            valid_solution,
+        ]:
+            result = await executor.execute_code(
+                code=code,
+                method_name="add",
+                test_cases=["--arg1=1 --arg2=2"],
+                expected_results=["3"],
+                sample_test_cases=["--arg1=1 --arg2=2"],
+                sample_expected_results=["3"],
+                difficulty="easy",
+                compare_func="return result == int(expected)",
+            )
+            if code == undefined_variable_solution:
+                # The source comes from the request, tracebacks still show its lines
+                assert "return n" in result.test_results[0]["error"]
+            assert result.all_cleared() == (code == valid_solution)
+
+        # The zygote measures its children
+        if executor.docker.python_zygote_enabled:
+            assert result.usage["cpu_time"] > 0
+            assert result.usage["peak_memory"] > 0
+
+    @pytest.mark.asyncio
+    async def test_fresh_container(
+        self, executor, valid_solution, undefined_variable_solution
+    ):
+        # Without the pool, the job goes in and out of the container through the API
+        executor.docker.pool = None
+        events = []
+
+        async def on_progress(event):
+            events.append(event)
+
+        for code in [valid_solution, undefined_variable_solution]:
+            result = await executor.execute_code(
+                code=code,
+                method_name="add",
+                test_cases=["--arg1=1 --arg2=2", "--arg1=2 --arg2=2"],
+                expected_results=["3", "4"],
+                sample_test_cases=["--arg1=1 --arg2=2"],
+                sample_expected_results=["3"],
+                difficulty="easy",
+                compare_func="return result == int(expected)",
+                on_progress=on_progress,
+            )
+            assert result.success
+            assert result.all_cleared() == (code == valid_solution)
+
+        assert "NameError" in result.test_results[0]["error"]
+        assert [e["completed"] for e in events] == [1, 2, 1, 1, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_sharded_hidden_tests(self, executor, valid_solution, monkeypatch):
+        monkeypatch.setattr(settings, "SHARDING_MIN_TESTS", 2)
+        events = []
+
+        async def on_progress(event):
+            events.append(event)
+
+        test_cases = [f"--arg1={i} --arg2=1" for i in range(7)]
+        result = await executor.execute_code(
+            code=valid_solution,
+            method_name="add",
+            test_cases=test_cases,
+            expected_results=[str(i + 1) for i in range(6)] + ["0"],
+            sample_test_cases=["--arg1=1 --arg2=2"],
+            sample_expected_results=["3"],
+            difficulty="hard",
+            compare_func="return result == int(expected)",
+            problem_id=1,
+            on_progress=on_progress,
+        )
+
+        # Merged back in the original order, like a single run
+        assert result.success
+        assert [t["passed"] for t in result.test_results] == [True] * 6 + [False]
+        assert len(result.sample_results) == 1
+        hidden = [e for e in events if not e["sample"]]
+        assert sorted(e["index"] for e in hidden) == list(range(7))
+        assert [e["completed"] for e in hidden] == list(range(1, 8))
+        assert all(e["total"] == 7 for e in hidden)
+        assert executor.get_stats()["sharding"]["submissions"] == 1
+        assert executor.get_stats()["sharding"]["shards"] > 1
+
+    @pytest.mark.asyncio
+    async def test_cancellation(self, executor, infinite_loop_solution):
+        executor.scheduler.set_capacity("easy", 1)
+        tokens = [CancellationToken(), CancellationToken()]
+        submissions = [
+            asyncio.create_task(
+                executor.execute_code(
+                    code=infinite_loop_solution,
+                    method_name="add",
+                    test_cases=["--arg1=1 --arg2=2"],
+                    expected_results=["3"],
+                    sample_test_cases=["--arg1=1 --arg2=2"],
+                    sample_expected_results=["3"],
+                    difficulty="easy",
+                    compare_func="return result == int(expected)",
+                    cancel=token,
+                )
+            )
+            for token in tokens
+        ]
+        await asyncio.sleep(0.5)  # the first one runs, the second one waits
+
+        started = time.monotonic()
+        tokens[1].cancel("the player left")
+        tokens[0].cancel("the game ended")
+        results = await asyncio.gather(*submissions)
+
+        # The running one was killed rather than waited for until its time limit
+        assert time.monotonic() - started < 1
+        assert results[0].message == "Execution Cancelled: the game ended"
+        assert results[1].message == "Execution Cancelled: the player left"
+        stats = executor.get_stats()["cancellation"]
+        assert (stats["queued"], stats["running"]) == (1, 1)
+        assert executor.scheduler.running["easy"] == 0
+        assert not executor.scheduler.waiting
+
+    @pytest.mark.asyncio
+    async def test_preflight(self, executor, invalid_syntax_solution, monkeypatch):
+        jobs = []
+        run = executor.executor.run
+
+        async def counting_run(job, on_progress=None):
+            jobs.append(job)
+            return await run(job, on_progress)
+
+        monkeypatch.setattr(executor.executor, "run", counting_run)
+
+        async def submit():
+            return await executor.execute_code(
+                code=invalid_syntax_solution,
+                method_name="add",
+                test_cases=["--arg1=1 --arg2=2"],
+                expected_results=["3"],
+                sample_test_cases=["--arg1=1 --arg2=2"],
+                sample_expected_results=["3"],
+                difficulty="easy",
+                compare_func="return result == int(expected)",
+            )
+
+        rejected = await submit()
+        assert not rejected.success
+        assert not jobs  # never reached a sandbox
+        assert executor.get_stats()["preflight"] == {
+            "checked": 1,
+            "rejected": 1,
+            "undecided": 0,
+        }
+
+        # The sandbox reports the same error, on the same line
+        executor.preflight.languages = set()
+        result = await submit()
+        assert len(jobs) == 1
+        assert "line 11" in rejected.message and "line 11" in result.message
+        assert rejected.line_offset == result.line_offset
+
+    def test_different_difficulty_pools(self, executor):
         assert (
-            executor._execution_semaphores["easy"]._value
-            > executor._execution_semaphores["medium"]._value
-            > executor._execution_semaphores["hard"]._value
+            executor.scheduler.capacities["easy"]
+            > executor.scheduler.capacities["medium"]
+            > executor.scheduler.capacities["hard"]
         )
 
 
@@ -526,11 +906,129 @@ class Solution {
         assert all(r.success for r in results)
         assert len(results) == 20
 
-    def test_different_difficulty_semaphores(self, executor):
+    @pytest.mark.asyncio
+    async def test_worker_survives_recycling(
+        self, executor, valid_solution, infinite_loop_solution
+    ):
+        # Timeouts and max jobs both restart the JVM worker, later jobs must still run
+        executor.docker.java_worker_max_jobs = 2
+        for code in [
+            valid_solution,
+            infinite_loop_solution,
+            valid_solution,
+            valid_solution,
+            valid_solution,
+        ]:
+            result = await executor.execute_code(
+                code=code,
+                method_name="add",
+                test_cases=["--arg1=1 --arg2=2"],
+                expected_results=["3"],
+                sample_test_cases=["--arg1=1 --arg2=2"],
+                sample_expected_results=["3"],
+                difficulty="easy",
+                compare_func="return ((Integer)result).intValue() == ((Integer)expected).intValue();",
+                lang="java",
+            )
+            assert result.success == (code == valid_solution)
+
+    @pytest.mark.asyncio
+    async def test_run_with_custom_inputs(self, executor, valid_solution):
+        result = await executor.run_code(
+            code=valid_solution,
+            method_name="add",
+            sample_test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0"],
+            sample_expected_results=["3", "1"],
+            custom_test_cases=["--arg1=20 --arg2=22"],
+            compare_func="return ((Integer)result).intValue() == ((Integer)expected).intValue();",
+            lang="java",
+        )
+
+        assert result.success
+        assert result.test_results == []
+        assert [t["passed"] for t in result.sample_results] == [True, False, None]
+        assert "42" in result.sample_results[2]["output"]
+        assert result.summary == {"total_tests": 2, "passed_tests": 1}
+
+    @pytest.mark.asyncio
+    async def test_progress_and_partial_timeout(self, executor):
+        events = []
+
+        async def on_progress(event):
+            events.append(event)
+
+        # Only the last hidden test waits forever, without using CPU time so only the
+        # container's time limit stops it
+        result = await executor.execute_code(
+            code="""
+class Solution {
+    public int add(int a, int b) throws InterruptedException {
+        while (a < 0) {
+            Thread.sleep(1000);
+        }
+        return a + b;
+    }
+}
+""",
+            method_name="add",
+            test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0", "--arg1=-1 --arg2=1"],
+            expected_results=["3", "0", "0"],
+            sample_test_cases=["--arg1=1 --arg2=2"],
+            sample_expected_results=["3"],
+            difficulty="easy",
+            compare_func="return ((Integer)result).intValue() == ((Integer)expected).intValue();",
+            lang="java",
+            on_progress=on_progress,
+        )
+
+        assert not result.success
+        assert "Time Limit Exceeded" in result.message
+        assert result.summary == {"total_tests": 3, "passed_tests": 2}
+        assert [(e["index"], e["passed"], e["completed"]) for e in events] == [
+            (0, True, 1),
+            (1, True, 2),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_per_test_time_limit(self, executor):
+        # Only the last hidden test loops forever, the run goes on after it
+        result = await executor.execute_code(
+            code="""
+class Solution {
+    public int add(int a, int b) {
+        while (a < 0) {}
+        return a + b;
+    }
+}
+""",
+            method_name="add",
+            test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0", "--arg1=-1 --arg2=1"],
+            expected_results=["3", "0", "0"],
+            sample_test_cases=["--arg1=1 --arg2=2"],
+            sample_expected_results=["3"],
+            difficulty="easy",
+            compare_func="return ((Integer)result).intValue() == ((Integer)expected).intValue();",
+            lang="java",
+        )
+
+        assert not result.success
+        assert "Time Limit Exceeded" in result.message
+        assert result.summary == {"total_tests": 3, "passed_tests": 2}
+        assert [t["time_limit_exceeded"] for t in result.test_results] == [
+            False,
+            False,
+            True,
+        ]
+        assert result.sample_results[0]["passed"]
+        assert result.test_results[2]["cpu_time"] >= 900
+        assert result.max_runtime == result.test_results[2]["cpu_time"]
+        assert result.total_runtime >= result.max_runtime
+
+    def test_different_difficulty_pools(self, executor):
         assert (
-            executor._execution_semaphores["easy"]._value
-            > executor._execution_semaphores["medium"]._value
-            > executor._execution_semaphores["hard"]._value
+            executor.scheduler.capacities["easy"]
+            > executor.scheduler.capacities["medium"]
+            > executor.scheduler.capacities["hard"]
         )
 
 
@@ -806,11 +1304,105 @@ public:
         assert all(r.success for r in results)
         assert len(results) == 20
 
-    def test_different_difficulty_semaphores(self, executor):
+    @pytest.mark.asyncio
+    async def test_run_with_custom_inputs(self, executor, valid_solution):
+        result = await executor.run_code(
+            code=valid_solution,
+            method_name="add",
+            sample_test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0"],
+            sample_expected_results=["3", "1"],
+            custom_test_cases=["--arg1=20 --arg2=22"],
+            compare_func="return result == expected;",
+            lang="cpp",
+        )
+
+        assert result.success
+        assert result.test_results == []
+        assert [t["passed"] for t in result.sample_results] == [True, False, None]
+        assert "42" in result.sample_results[2]["output"]
+        assert result.summary == {"total_tests": 2, "passed_tests": 1}
+
+    @pytest.mark.asyncio
+    async def test_progress_and_partial_timeout(self, executor):
+        events = []
+
+        async def on_progress(event):
+            events.append(event)
+
+        # Only the last hidden test waits forever, without using CPU time so only the
+        # container's time limit stops it
+        result = await executor.execute_code(
+            code=r"""
+class Solution {
+public:
+    int add(int a, int b) {
+        while (a < 0) {
+            this_thread::sleep_for(chrono::seconds(1));
+        }
+        return a + b;
+    }
+};
+""",
+            method_name="add",
+            test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0", "--arg1=-1 --arg2=1"],
+            expected_results=["3", "0", "0"],
+            sample_test_cases=["--arg1=1 --arg2=2"],
+            sample_expected_results=["3"],
+            difficulty="easy",
+            compare_func="return result == expected;",
+            lang="cpp",
+            on_progress=on_progress,
+        )
+
+        assert not result.success
+        assert "Time Limit Exceeded" in result.message
+        assert result.summary == {"total_tests": 3, "passed_tests": 2}
+        assert [(e["index"], e["passed"], e["completed"]) for e in events] == [
+            (0, True, 1),
+            (1, True, 2),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_per_test_time_limit(self, executor):
+        # Only the last hidden test loops forever, the run goes on after it
+        result = await executor.execute_code(
+            code=r"""
+class Solution {
+public:
+    int add(int a, int b) {
+        while (a < 0) {}
+        return a + b;
+    }
+};
+""",
+            method_name="add",
+            test_cases=["--arg1=1 --arg2=2", "--arg1=0 --arg2=0", "--arg1=-1 --arg2=1"],
+            expected_results=["3", "0", "0"],
+            sample_test_cases=["--arg1=1 --arg2=2"],
+            sample_expected_results=["3"],
+            difficulty="easy",
+            compare_func="return result == expected;",
+            lang="cpp",
+        )
+
+        assert not result.success
+        assert "Time Limit Exceeded" in result.message
+        assert result.summary == {"total_tests": 3, "passed_tests": 2}
+        assert [t["time_limit_exceeded"] for t in result.test_results] == [
+            False,
+            False,
+            True,
+        ]
+        assert result.sample_results[0]["passed"]
+        assert result.test_results[2]["cpu_time"] >= 900
+        assert result.max_runtime == result.test_results[2]["cpu_time"]
+        assert result.total_runtime >= result.max_runtime
+
+    def test_different_difficulty_pools(self, executor):
         assert (
-            executor._execution_semaphores["easy"]._value
-            > executor._execution_semaphores["medium"]._value
-            > executor._execution_semaphores["hard"]._value
+            executor.scheduler.capacities["easy"]
+            > executor.scheduler.capacities["medium"]
+            > executor.scheduler.capacities["hard"]
         )
 
 
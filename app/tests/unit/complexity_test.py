@@ -0,0 +1,142 @@
+import os
+import sys
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.complexity import estimate_complexity
+
+# fmt: on
+
+
+class TestPython:
+    @pytest.mark.parametrize(
+        "body, expected",
+        [
+            ("return a + b", "O(1)"),
+            ("for x in nums:\n    s = max(s, x)", "O(n)"),
+            (
+                "for i in range(len(nums)):\n    for j in range(i + 1, len(nums)):\n"
+                "        s += nums[i] * nums[j]",
+                "O(n^2)",
+            ),
+            ("nums.sort()\nfor i in range(26):\n    s += i", "O(n log n)"),
+            (
+                "lo, hi = 0, len(nums) - 1\nwhile lo < hi:\n    mid = (lo + hi) // 2\n"
+                "    if nums[mid] < a:\n        lo = mid + 1\n    else:\n        hi = mid",
+                "O(log n)",
+            ),
+            ("return [sum(nums) for _ in nums]", "O(n^2)"),
+        ],
+    )
+    def test_loops_and_calls(self, body, expected):
+        code = "class Solution:\n    def solve(self, nums, a, b, s=0):\n"
+        code += "".join(f"        {line}\n" for line in body.split("\n"))
+        assert estimate_complexity(code, "python") == expected
+
+    def test_recursion(self):
+        fib = """
+class Solution:
+    def fib(self, n):
+        if n < 2:
+            return n
+        return self.fib(n - 1) + self.fib(n - 2)
+"""
+        memoized = """
+from functools import cache
+class Solution:
+    def fib(self, n):
+        @cache
+        def go(n):
+            return n if n < 2 else go(n - 1) + go(n - 2)
+        return go(n)
+"""
+        merge_sort = """
+class Solution:
+    def sort(self, nums):
+        if len(nums) < 2:
+            return nums
+        mid = len(nums) // 2
+        left, right = self.sort(nums[:mid]), self.sort(nums[mid:])
+        return [x for x in left + right]
+"""
+        assert estimate_complexity(fib, "python") == "O(2^n)"
+        assert estimate_complexity(memoized, "python") == "O(n)"
+        assert estimate_complexity(merge_sort, "python") == "O(n log n)"
+
+    def test_syntax_error(self):
+        assert estimate_complexity("def solve(:", "python") is None
+
+
+class TestJava:
+    def test_loops_and_calls(self):
+        code = """
+import java.util.*;
+
+class Solution {
+    public int solve(int[] nums) throws Exception {
+        // for (int i = 0; i < nums.length; i++) {
+        String s = "while (true) {";
+        Arrays.sort(nums);
+        int count = 0;
+        for (int i = 0; i < nums.length; i++)
+            for (int j = i + 1; j < nums.length; j++) count++;
+        return count;
+    }
+}
+"""
+        assert estimate_complexity(code, "java") == "O(n^2)"
+
+    def test_recursion(self):
+        code = """
+class Solution {
+    public int fib(int n) {
+        if (n < 2) return n;
+        return fib(n - 1) + fib(n - 2);
+    }
+}
+"""
+        assert estimate_complexity(code, "java") == "O(2^n)"
+
+    def test_unclosed_braces(self):
+        # Code cut off mid-loop is read up to its end
+        code = "class S{ int f(int n){ for(;;) {"
+        assert estimate_complexity(code, "java") == "O(n)"
+
+
+class TestCpp:
+    def test_binary_search(self):
+        code = """
+#include <vector>
+
+class Solution {
+public:
+    int solve(vector<int>& nums, int target) const {
+        int lo = 0, hi = nums.size() - 1;
+        while (lo <= hi) {
+            int mid = lo + (hi - lo) / 2;
+            if (nums[mid] < target) lo = mid + 1;
+            else hi = mid - 1;
+        }
+        return lo;
+    }
+};
+"""
+        assert estimate_complexity(code, "cpp") == "O(log n)"
+
+    def test_loops_and_calls(self):
+        code = """
+class Solution {
+public:
+    int solve(vector<int>& nums) {
+        int total = 0;
+        sort(nums.begin(), nums.end());
+        for (auto& x : nums) {
+            for (int bit = 0; bit < 32; bit++) total += (x >> bit) & 1;
+        }
+        return total;
+    }
+};
+"""
+        assert estimate_complexity(code, "cpp") == "O(n log n)"
@@ -0,0 +1,125 @@
+import os
+import sys
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution import concurrency
+from services.execution.concurrency import ConcurrencyController, read_pressure
+from services.execution.scheduler import ExecutionScheduler
+
+# fmt: on
+
+PSI = (
+    "some avg10={some} avg60=1.00 avg300=0.50 total=12345\n"
+    "full avg10=0.00 avg60=0.00 avg300=0.00 total=0\n"
+)
+
+
+def make_controller(monkeypatch, capacity=4, cpu=0.0, memory=0.0):
+    """A controller of one pool with bounds (1, 8), under the given host pressure."""
+    pressure = {"cpu": cpu, "memory": memory}
+    monkeypatch.setattr(
+        concurrency, "read_pressure", lambda resource: pressure[resource]
+    )
+    scheduler = ExecutionScheduler(
+        {"easy": capacity}, {"unranked": 1}, user_limit=10, deadline_margin=30
+    )
+    controller = ConcurrencyController(
+        scheduler, {"easy": (1, 8)}, {"easy": 5.0}, 50, 10, interval=5
+    )
+    return scheduler, controller
+
+
+class TestReadPressure:
+    def test_worst_of_host_and_cgroup(self, tmp_path, monkeypatch):
+        host, cgroup = tmp_path / "host", tmp_path / "cgroup"
+        host.write_text(PSI.format(some="12.50"))
+        cgroup.write_text(PSI.format(some="30.25"))
+        monkeypatch.setitem(concurrency.PRESSURE_FILES, "cpu", [str(host), str(cgroup)])
+
+        assert read_pressure("cpu") == 30.25
+
+    def test_falls_back_to_load_average(self, tmp_path, monkeypatch):
+        loadavg = tmp_path / "loadavg"
+        loadavg.write_text("3.00 2.00 1.00 1/100 1000\n")
+        monkeypatch.setitem(
+            concurrency.PRESSURE_FILES, "cpu", [str(tmp_path / "missing")]
+        )
+        monkeypatch.setattr(concurrency, "LOADAVG_FILE", str(loadavg))
+        monkeypatch.setattr(concurrency.os, "cpu_count", lambda: 2)
+
+        assert read_pressure("cpu") == 50.0
+
+    def test_falls_back_to_available_memory(self, tmp_path, monkeypatch):
+        meminfo = tmp_path / "meminfo"
+        meminfo.write_text("MemTotal: 1000 kB\nMemAvailable: 50 kB\n")
+        monkeypatch.setitem(
+            concurrency.PRESSURE_FILES, "memory", [str(tmp_path / "missing")]
+        )
+        monkeypatch.setattr(concurrency, "MEMINFO_FILE", str(meminfo))
+
+        assert read_pressure("memory") == 50.0
+
+
+class TestConcurrencyController:
+    @pytest.mark.asyncio
+    async def test_decreases_under_cpu_pressure(self, monkeypatch):
+        scheduler, controller = make_controller(monkeypatch, capacity=8, cpu=80)
+
+        controller.adjust()
+        assert scheduler.capacities["easy"] == 6
+        controller.adjust()
+        assert scheduler.capacities["easy"] == 4
+        assert controller.decreases == 2
+
+    @pytest.mark.asyncio
+    async def test_never_below_floor(self, monkeypatch):
+        scheduler, controller = make_controller(monkeypatch, capacity=2, memory=50)
+
+        for _ in range(5):
+            controller.adjust()
+        assert scheduler.capacities["easy"] == 1
+
+    @pytest.mark.asyncio
+    async def test_increases_while_saturated(self, monkeypatch):
+        scheduler, controller = make_controller(monkeypatch, capacity=7)
+
+        controller.adjust()
+        assert scheduler.capacities["easy"] == 7  # nothing running, no need
+
+        scheduler.running["easy"] = 7
+        controller.adjust()
+        assert scheduler.capacities["easy"] == 8
+        scheduler.running["easy"] = 8
+        controller.adjust()
+        assert scheduler.capacities["easy"] == 8  # ceiling
+        assert controller.increases == 1
+
+    @pytest.mark.asyncio
+    async def test_decreases_when_slower_than_target(self, monkeypatch):
+        scheduler, controller = make_controller(monkeypatch, capacity=4)
+        for _ in range(10):
+            scheduler._record_service_time("easy", 6.0, timed_out=False)
+        assert controller.stats()["p95_latency"]["easy"] == 6.0
+
+        controller.adjust()
+        assert scheduler.capacities["easy"] == 3
+        assert controller.stats()["limits"] == {"easy": 3}
+        # Only jobs that finish under the new limit count for the next decision
+        assert controller.stats()["p95_latency"]["easy"] is None
+        controller.adjust()
+        assert scheduler.capacities["easy"] == 3
+
+    @pytest.mark.asyncio
+    async def test_ignores_timed_out_jobs(self, monkeypatch):
+        scheduler, controller = make_controller(monkeypatch, capacity=4)
+        scheduler._record_service_time("easy", 1.0, timed_out=False)
+        for _ in range(10):
+            # Slow because of the submitted code, not because of the host
+            scheduler._record_service_time("easy", 30.0, timed_out=True)
+
+        controller.adjust()
+        assert scheduler.capacities["easy"] == 4
+        assert controller.stats()["p95_latency"]["easy"] == 1.0
@@ -0,0 +1,297 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from core.config import settings
+from services.execution.docker import CPP_HARNESS_DIR
+from services.execution.service import RUNNER_NAME, CodeExecutionService
+from services.execution.test_generator import (
+    CppTestGenerator,
+    JavaTestGenerator,
+    PythonTestGenerator,
+)
+
+# fmt: on
+
+IN_FLIGHT = 50
+TICK = 0.01
+COMPILE_ROUNDS = 3
+CODEGEN_ROUNDS = 50
+STARTUP_ROUNDS = 10
+
+
+async def measure_loop_lag(stop: asyncio.Event) -> list:
+    """
+    Repeatedly sleep for TICK seconds and record how late the event loop wakes us up.
+    """
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+    return lags
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class TestEventLoopLatency:
+    @pytest.fixture
+    def executor(self):
+        return CodeExecutionService()
+
+    @pytest.fixture
+    def slow_solution(self):
+        return """
+class Solution:
+    def add(self, a: int, b: int) -> int:
+        total = 0
+        for i in range(3 * 10**6):
+            total += i
+        return a + b
+"""
+
+    @pytest.mark.asyncio
+    async def test_loop_latency_with_submissions_in_flight(
+        self, executor, slow_solution
+    ):
+        # Idle baseline
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(measure_loop_lag(stop))
+        await asyncio.sleep(1)
+        stop.set()
+        idle_lags = await ticker
+
+        # Same measurement while IN_FLIGHT submissions are queued or running
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(measure_loop_lag(stop))
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[
+                executor.execute_code(
+                    code=slow_solution,
+                    method_name="add",
+                    test_cases=["--arg1=1 --arg2=2"],
+                    expected_results=["3"],
+                    sample_test_cases=["--arg1=1 --arg2=2"],
+                    sample_expected_results=["3"],
+                    difficulty="easy",
+                    compare_func="return result == int(expected)",
+                )
+                for _ in range(IN_FLIGHT)
+            ]
+        )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        loaded_lags = await ticker
+
+        print(
+            f"\n{IN_FLIGHT} submissions in {elapsed:.2f}s | "
+            f"idle lag p50={statistics.median(idle_lags) * 1000:.2f}ms "
+            f"p99={percentile(idle_lags, 0.99) * 1000:.2f}ms | "
+            f"loaded lag p50={statistics.median(loaded_lags) * 1000:.2f}ms "
+            f"p99={percentile(loaded_lags, 0.99) * 1000:.2f}ms "
+            f"max={max(loaded_lags) * 1000:.2f}ms"
+        )
+
+        assert all(r.success for r in results)
+        # The loop should keep ticking while containers run, not stall for whole runs
+        assert percentile(loaded_lags, 0.99) < 0.05
+
+
+class TestCppCompileTime:
+    @pytest.fixture
+    def executor(self):
+        return CodeExecutionService()
+
+    @pytest.fixture
+    def runner_file(self):
+        code = """
+class Solution {
+public:
+    vector<int> twoSum(vector<int>& nums, int target) {
+        unordered_map<int, int> seen;
+        for (int i = 0; i < nums.size(); i++) {
+            if (seen.count(target - nums[i])) return {seen[target - nums[i]], i};
+            seen[nums[i]] = i;
+        }
+        return {};
+    }
+};
+"""
+        test_data = [{"input": "--arg1=[2,7,11,15] --arg2=9", "expected": "[0,1]"}]
+        return CppTestGenerator().generate_test_file(
+            code,
+            RUNNER_NAME,
+            "twoSum",
+            test_data,
+            test_data,
+            "return result == expected;",
+        )
+
+    def test_precompiled_harness_compile_time(self, executor, runner_file, tmp_path):
+        file_name = RUNNER_NAME + ".cpp"
+        (tmp_path / file_name).write_text(runner_file)
+
+        # The old single translation unit: the whole harness inlined into the runner
+        inline_cmd = (
+            f"cat {CPP_HARNESS_DIR}/beatcode.h {CPP_HARNESS_DIR}/beatcode.cpp "
+            f"{file_name} | grep -v '#include \"beatcode.h\"' > Inline.cpp "
+            "&& g++ -std=c++17 -o Inline Inline.cpp -ljsoncpp"
+        )
+        pch_cmd = executor.docker.get_compile_commands("cpp", file_name)
+
+        container = executor.docker.client.containers.run(
+            settings.DOCKER_IMAGE_CPP,
+            ["tail", "-f", "/dev/null"],
+            volumes={str(tmp_path): {"bind": "/code", "mode": "rw"}},
+            working_dir="/code",
+            detach=True,
+        )
+        try:
+            timings = {"inline": [], "pch": []}
+            for _ in range(COMPILE_ROUNDS):
+                for name, cmd in (("inline", inline_cmd), ("pch", pch_cmd)):
+                    start = time.perf_counter()
+                    exit_code, output = container.exec_run(["sh", "-c", cmd])
+                    timings[name].append(time.perf_counter() - start)
+                    assert exit_code == 0, output
+        finally:
+            container.remove(force=True)
+
+        inline = statistics.median(timings["inline"])
+        pch = statistics.median(timings["pch"])
+        print(
+            f"\nC++ compile time | inline harness={inline:.2f}s | pch + lib={pch:.2f}s"
+        )
+        assert pch < inline
+
+
+class TestCodegenTime:
+    @pytest.fixture
+    def problem(self):
+        # A problem with large hidden inputs, where codegen used to dominate
+        test_data = [
+            {
+                "input": f"--arg1={list(range(i, i + 500))} --arg2={i}",
+                "expected": f"[{i}, {i + 1}]",
+            }
+            for i in range(500)
+        ]
+        return {
+            "method_name": "twoSum",
+            "test_data": test_data,
+            "sample_data": test_data[:3],
+        }
+
+    @pytest.mark.parametrize(
+        "generator,compare_func",
+        [
+            (PythonTestGenerator, "return result == eval(expected)"),
+            (JavaTestGenerator, "return result.equals(expected);"),
+            (CppTestGenerator, "return result == expected;"),
+        ],
+    )
+    def test_cached_harness_codegen_time(self, problem, generator, compare_func):
+        gen = generator()
+
+        def codegen(problem_id):
+            # Same as a submission: fresh test data dicts every time
+            harness = gen.get_harness(
+                problem_id,
+                RUNNER_NAME,
+                problem["method_name"],
+                [dict(t) for t in problem["test_data"]],
+                [dict(t) for t in problem["sample_data"]],
+                compare_func,
+            )
+            return harness.render("class Solution: pass"), harness.fixture
+
+        timings = {}
+        for name, problem_id in (("uncached", None), ("cached", 1)):
+            start = time.perf_counter()
+            for _ in range(CODEGEN_ROUNDS):
+                output = codegen(problem_id)
+            timings[name] = (time.perf_counter() - start) / CODEGEN_ROUNDS
+            timings[name + "_output"] = output
+
+        print(
+            f"\n{generator.__name__} codegen per submission | "
+            f"uncached={timings['uncached'] * 1000:.2f}ms "
+            f"cached={timings['cached'] * 1000:.2f}ms"
+        )
+        assert timings["cached_output"] == timings["uncached_output"]
+        assert timings["cached"] < timings["uncached"]
+
+    def test_harness_rebuilt_when_problem_changes(self, problem):
+        gen = PythonTestGenerator()
+        args = (RUNNER_NAME, "twoSum", problem["test_data"], problem["sample_data"])
+
+        first = gen.get_harness(1, *args, "return result == eval(expected)")
+        assert gen.get_harness(1, *args, "return result == eval(expected)") is first
+
+        changed = gen.get_harness(1, *args, "return sorted(result) == eval(expected)")
+        assert changed is not first
+        assert "sorted(result)" in changed.render("")
+
+
+class TestPythonStartupLatency:
+    @pytest.fixture
+    def executor(self):
+        executor = CodeExecutionService()
+        if not executor.docker or not executor.docker.pool:
+            pytest.skip("The zygote runs in pooled containers")
+        yield executor
+        executor.docker.stop()
+
+    def test_zygote_time_to_first_test(self, executor):
+        gen = PythonTestGenerator()
+        test_data = [{"input": "--arg1=1 --arg2=2", "expected": "3"}]
+        harness = gen.get_harness(
+            None, RUNNER_NAME, "add", test_data, test_data, "return result == 3"
+        )
+        code = harness.render(
+            "class Solution:\n    def add(self, a: int, b: int) -> int:\n"
+            "        return a + b\n"
+        )
+
+        def time_to_first_test():
+            # From the submission reaching the runner to its first finished test
+            first = []
+            start = time.perf_counter()
+            result = executor.docker.run_container(
+                "python",
+                RUNNER_NAME + gen.get_file_extension(),
+                code,
+                "easy",
+                gen.get_line_offset(),
+                harness.fixture,
+                lambda event: first or first.append(time.perf_counter()),
+            )
+            assert result.all_cleared(), result.message
+            return first[0] - start
+
+        timings = {}
+        for name, enabled in (("exec", False), ("zygote", True)):
+            executor.docker.python_zygote_enabled = enabled
+            time_to_first_test()  # warm the pooled container and the zygote
+            timings[name] = [time_to_first_test() for _ in range(STARTUP_ROUNDS)]
+
+        exec_p50 = statistics.median(timings["exec"])
+        zygote_p50 = statistics.median(timings["zygote"])
+        print(
+            f"\nPython time to first test | "
+            f"exec p50={exec_p50 * 1000:.2f}ms "
+            f"p90={percentile(timings['exec'], 0.9) * 1000:.2f}ms | "
+            f"zygote p50={zygote_p50 * 1000:.2f}ms "
+            f"p90={percentile(timings['zygote'], 0.9) * 1000:.2f}ms"
+        )
+        assert zygote_p50 < exec_p50
@@ -0,0 +1,73 @@
+import math
+import os
+import random
+import sys
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.measurement import (
+    fit_complexity,
+    measurement_inputs,
+    summarize_measurement,
+)
+
+# fmt: on
+
+SIZES = [500, 1000, 2000, 4000, 8000]
+
+
+@pytest.mark.parametrize(
+    "growth, expected",
+    [
+        (lambda n: 2, "O(1)"),
+        (lambda n: 2 * math.log(n), "O(log n)"),
+        (lambda n: n / 100, "O(n)"),
+        (lambda n: n * math.log(n) / 100, "O(n log n)"),
+        (lambda n: n * n / 1e5, "O(n^2)"),
+        (lambda n: n**3 / 1e9, "O(n^3)"),
+    ],
+)
+def test_fit_complexity(growth, expected):
+    rng = random.Random(0)
+    times = [1 + growth(n) * rng.uniform(0.97, 1.03) for n in SIZES]
+
+    complexity, confidence = fit_complexity(SIZES, times)
+    assert complexity == expected
+    assert 0 <= confidence <= 1
+
+
+def test_too_few_sizes():
+    assert fit_complexity([500, 1000], [1, 2]) is None
+
+
+def test_summarize_measurement():
+    generator = [
+        {"type": "int_array", "min": 1, "max": 9},
+        {"type": "int", "size": True},
+    ]
+    inputs = measurement_inputs(generator, SIZES, 2)
+    assert [n for n, _ in inputs] == [
+        500,
+        500,
+        1000,
+        1000,
+        2000,
+        2000,
+        4000,
+        4000,
+        8000,
+        8000,
+    ]
+    assert inputs[0][1].startswith("--arg1=[") and inputs[0][1].endswith(" --arg2=500")
+    assert inputs[0] == measurement_inputs(generator, SIZES, 2)[0]  # deterministic
+
+    # The fastest run of each size counts, sizes that hit the time limit don't
+    results = [
+        {"wall_time": n / 10 + (i % 2) * 50, "error": None}
+        for i, (n, _) in enumerate(inputs)
+    ]
+    results[-1] = results[-2] = {"wall_time": 2500, "error": "Time Limit Exceeded"}
+    assert summarize_measurement(inputs, results)["complexity"] == "O(n)"
+    assert summarize_measurement(inputs, results[:4]) is None
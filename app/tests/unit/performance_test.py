@@ -0,0 +1,167 @@
+import os
+import sys
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from db.models.game import Submission
+from services.problem.performance import LogHistogram, PerformanceStats
+
+# fmt: on
+
+
+class FakeQuery:
+    def __init__(self, value):
+        self.value = value
+
+    def filter(self, *args):
+        return self
+
+    def scalar(self):
+        return self.value
+
+    def first(self):
+        return self.value
+
+
+class FakeSession:
+    """Answers the query of a problem's histograms and of earlier submissions."""
+
+    def __init__(self, performance=None, accepted=()):
+        self.performance = performance
+        self.accepted = set(accepted)  # users with an earlier accepted submission
+        self.queries = 0
+        self.user_id = None
+
+    def query(self, column):
+        if column is Submission.id:
+            return FakeQuery((1,) if self.user_id in self.accepted else None)
+        self.queries += 1
+        return FakeQuery(self.performance)
+
+
+def record(stats, db, user_id, result, lang="python"):
+    db.user_id = user_id
+    return stats.record(db, user_id, 1, lang, result)
+
+
+def make_result(runtime, peak_memory=None, passed=3, total=3, success=True):
+    return {
+        "success": success,
+        "total_runtime": runtime,
+        "usage": {"cpu_time": runtime, "peak_memory": peak_memory, "oom_killed": False},
+        "summary": {"passed_tests": passed, "total_tests": total},
+        "cached": False,
+    }
+
+
+def test_histogram_buckets():
+    histogram = LogHistogram(1, 10, 2)
+
+    assert histogram.bucket(0) == 0
+    assert histogram.bucket(1) == 0
+    assert histogram.bucket(1.2) == 1
+    assert histogram.bucket(2) == 3  # two buckets per doubling
+    assert histogram.bucket(10**9) == 9  # the last bucket takes the rest
+
+
+def test_histogram_rank():
+    histogram = LogHistogram(1, 48, 4)
+    assert histogram.rank(5) is None
+
+    for value in [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]:
+        histogram.add(value)
+
+    assert histogram.rank(0.5) == 95.0  # same bucket as 1
+    assert histogram.rank(100) == 30.0  # 128, 256, 512 are larger
+    assert histogram.rank(512) == 5.0
+    assert histogram.rank(10**6) == 0.0
+    assert histogram.total == 10
+
+
+def test_record_ranks_accepted_solutions():
+    stats = PerformanceStats(60)
+    db = FakeSession()
+
+    first = record(stats, db, 1, make_result(10, 20000))
+    assert first == {"runtime": None, "memory": None}
+
+    for user_id, runtime in [(2, 20), (3, 40), (4, 80)]:
+        record(stats, db, user_id, make_result(runtime, 20000))
+    ranks = record(stats, db, 5, make_result(15))
+    assert ranks == {"runtime": 75.0, "memory": None}  # memory wasn't measured
+
+    # Only loaded once, languages are ranked separately
+    assert db.queries == 1
+    assert record(stats, db, 6, make_result(15), "java")["runtime"] is None
+
+
+def test_record_counts_first_fresh_solution_only():
+    stats = PerformanceStats(60)
+    db = FakeSession(accepted=[1])
+
+    record(stats, db, 1, make_result(10))  # accepted before
+    record(stats, db, 2, {**make_result(10), "cached": True})
+    assert record(stats, db, 3, make_result(15))["runtime"] is None  # still empty
+
+    # Resubmits are still ranked, they just don't count
+    assert record(stats, db, 1, make_result(10))["runtime"] == 100.0
+    assert stats._histograms[(1, "python")]["runtime"].total == 1
+
+
+def test_record_skips_failed_solutions():
+    stats = PerformanceStats(60)
+    db = FakeSession()
+
+    assert record(stats, db, 1, make_result(10, passed=2)) is None
+    assert record(stats, db, 1, make_result(10, success=False)) is None
+    assert record(stats, db, 1, make_result(10, passed=0, total=0)) is None
+    assert db.queries == 0
+
+
+def test_record_loads_stored_histograms():
+    stats = PerformanceStats(60)
+    stored = LogHistogram(0.01, 96, 4)
+    for _ in range(4):
+        stored.add(100)
+    db = FakeSession({"python": {"runtime": stored.counts}})
+
+    ranks = record(stats, db, 1, make_result(50, 20000))
+    assert ranks == {"runtime": 100.0, "memory": None}
+
+
+@pytest.mark.asyncio
+async def test_flush_picks_up_other_servers():
+    stats = PerformanceStats(60)
+    db = FakeSession()
+    record(stats, db, 1, make_result(10))
+    flushed = []
+
+    def flush(pending):
+        flushed.append(pending[(1, "python")]["runtime"].total)
+        stored = LogHistogram(0.01, 96, 4)
+        for runtime in [10, 20, 40]:  # another server flushed 20 and 40
+            stored.add(runtime)
+        return {(1, "python"): {"runtime": stored.counts}}
+
+    stats._flush = flush
+    await stats.flush()
+    await stats.flush()  # nothing new
+
+    assert flushed == [1]
+    assert record(stats, db, 2, make_result(15))["runtime"] == 66.7
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_counts():
+    stats = PerformanceStats(60)
+    record(stats, FakeSession(), 1, make_result(10))
+
+    def flush(pending):
+        raise ConnectionError("database is down")
+
+    stats._flush = flush
+    await stats.flush()
+
+    assert stats._pending[(1, "python")]["runtime"].total == 1
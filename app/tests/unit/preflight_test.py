@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.preflight import PreflightChecker
+
+# fmt: on
+
+
+@pytest.fixture
+def checker():
+    return PreflightChecker(None, ["python", "java", "cpp"], 5)
+
+
+def test_only_python_without_sandboxes(checker):
+    assert checker.languages == {"python"}
+
+
+@pytest.mark.asyncio
+async def test_valid_code_passes(checker):
+    code = "class Solution:\n    def add(self, a: int, b: int) -> int:\n        return a + b\n"
+
+    assert await checker.check("python", code) is None
+    # Checked without running it
+    assert await checker.check("python", "import os\nos._exit(1)\n") is None
+
+
+@pytest.mark.asyncio
+async def test_syntax_error_line_numbers(checker):
+    result = await checker.check("python", "class Solution:\n    def add(self)\n")
+
+    assert not result.success
+    assert result.message.startswith("Runtime Error Detected\n")
+    assert 'File "BeatcodeRunner.py", line 10' in result.message
+    assert result.line_offset == 8  # the message's line 10 is the code's line 2
+
+
+@pytest.mark.asyncio
+async def test_undecided_checks_pass(checker):
+    # Too deep for the server's parser, the sandbox gets to report it
+    assert await checker.check("python", "x = " + "-" * 100000 + "1") is None
+    assert await checker.check("java", "class Solution {") is None  # not checked
+    assert checker.stats() == {"checked": 1, "rejected": 0, "undecided": 1}
+
+
+@pytest.mark.asyncio
+async def test_python_version_of_the_sandbox():
+    code = "match 1:\n    case 1:\n        pass\n"
+    python39 = PreflightChecker(None, ["python"], 5, (3, 9))
+    python310 = PreflightChecker(None, ["python"], 5, (3, 10))
+
+    assert not (await python39.check("python", code)).success
+    assert await python310.check("python", code) is None
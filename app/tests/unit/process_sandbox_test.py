@@ -0,0 +1,139 @@
+import os
+import sys
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.executor import RUNNER_NAME
+from services.execution.fixtures import FixtureStore
+from services.execution.process import ProcessRunner
+from services.execution.test_generator import PythonTestGenerator
+
+# fmt: on
+
+TEST_DATA = [
+    {"input": "a=1, b=2", "expected": "3"},
+    {"input": "a=-1, b=1", "expected": "0"},
+]
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = ProcessRunner(
+        FixtureStore(str(tmp_path / "fixtures"), 2**20), str(tmp_path / "jobs")
+    )
+    try:
+        runner.start()
+    except RuntimeError as e:
+        pytest.skip(f"Process sandboxes aren't supported here: {e}")
+    return runner
+
+
+def run(runner, code, on_progress=None):
+    gen = PythonTestGenerator()
+    harness = gen.get_harness(
+        None,
+        RUNNER_NAME,
+        "add",
+        TEST_DATA,
+        TEST_DATA[:1],
+        "    return str(result) == expected",
+    )
+    return runner.run_container(
+        "python",
+        RUNNER_NAME + gen.get_file_extension(),
+        harness.render(code),
+        "easy",
+        gen.get_line_offset(),
+        harness.fixture,
+        on_progress,
+    )
+
+
+def solution(body):
+    return f"""
+class Solution:
+    def add(self, a: int, b: int) -> int:
+        {body}
+"""
+
+
+class TestProcessSandbox:
+    def test_passing_solution(self, runner):
+        events = []
+        result = run(runner, solution("return a + b"), events.append)
+
+        assert result.success
+        assert result.all_cleared()
+        assert len(result.sample_results) == 1
+        assert [e["completed"] for e in events] == [1, 2, 1]
+
+    def test_syntax_error(self, runner):
+        result = run(runner, solution("return a +"))
+
+        assert not result.success
+        assert "SyntaxError" in result.message
+        assert "sandbox_launcher" not in result.message
+
+    def test_time_limit(self, runner):
+        result = run(runner, "while True:\n    pass\n")
+
+        assert not result.success
+        assert "Time Limit Exceeded" in result.message
+
+    @pytest.mark.parametrize(
+        "body,error",
+        [
+            ("import os; return os.fork()", "PermissionError"),
+            ("import subprocess; return subprocess.run(['ls'])", "PermissionError"),
+            ("import socket; return socket.socket()", "PermissionError"),
+            ("import os; return os.kill(os.getppid(), 0)", "PermissionError"),
+            (f"return open({os.path.abspath(__file__)!r}).read()", "FileNotFoundError"),
+            ("return open('/etc/hostname').read()", "FileNotFoundError"),
+        ],
+    )
+    def test_escapes_are_blocked(self, runner, body, error):
+        result = run(runner, solution(body))
+
+        assert result.success
+        assert not result.test_results[0]["passed"]
+        assert error in result.test_results[0]["error"]
+
+    def test_threads_still_work(self, runner):
+        code = solution(
+            "import threading; r = []; "
+            "t = threading.Thread(target=lambda: r.append(a + b)); "
+            "t.start(); t.join(); return r[0]"
+        )
+        result = run(runner, code)
+
+        assert result.all_cleared()
+
+    def test_mounts_are_locked(self, runner):
+        # No capabilities left, and mount_setattr (442) can't make a bind writable
+        code = solution(
+            "import ctypes; libc = ctypes.CDLL(None, use_errno=True); "
+            "caps = libc.prctl(23, 21, 0, 0, 0); "  # CAP_SYS_ADMIN in the bounding set
+            "libc.syscall(442, -100, b'/', 0, None, 0); "
+            "return caps + ctypes.get_errno()"
+        )
+        result = run(runner, code)
+
+        assert result.test_results[0]["output"] == "1"  # EPERM
+
+    def test_signals_to_itself(self, runner):
+        result = run(
+            runner, solution("import os; os.kill(os.getpid(), 0); return a + b")
+        )
+
+        assert result.all_cleared()
+
+    def test_resource_usage(self, runner):
+        result = run(runner, solution("x = b'x' * (64 * 2**20); return a + b"))
+        usage = result.to_dict()["usage"]
+
+        assert result.all_cleared()
+        assert usage["cpu_time"] > 0
+        assert usage["peak_memory"] >= 64 * 1024
+        assert not usage["oom_killed"]
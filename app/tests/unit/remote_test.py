@@ -0,0 +1,197 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.executor import JobExecutor
+from services.execution.remote import (
+    ExecutionWorker,
+    RemoteExecutor,
+    WorkerConnection,
+    parse_address,
+)
+from services.execution.types import ExecutionResult
+
+# fmt: on
+
+
+class FakeExecutor(JobExecutor):
+    """Runs jobs without sandboxes: the code is the output, "raise" fails the job."""
+
+    def __init__(self):
+        self.jobs = []
+
+    async def run(self, job, on_progress=None):
+        self.jobs.append(job)
+        if on_progress:
+            on_progress({"type": "test", "index": 0, "passed": True})
+        await asyncio.sleep(job.get("delay", 0))
+        if job["code"] == "raise":
+            raise ValueError("broken harness")
+        return ExecutionResult(
+            True, test_results=[{"passed": True, "output": job["code"]}]
+        )
+
+
+@pytest.fixture
+def socket_dir():
+    # Unix socket paths are short, pytest's tmp_path can be too long
+    path = tempfile.mkdtemp(prefix="workers")
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+async def start_worker(address, capacity=2, token="secret", heartbeat_interval=0.05):
+    worker = ExecutionWorker(
+        FakeExecutor(), capacity, token, heartbeat_interval, worker_id=address
+    )
+    await worker.start(address)
+    return worker
+
+
+async def start_client(addresses, token="secret", **kwargs):
+    options = {"heartbeat_timeout": 0.5, "max_retries": 2, "dispatch_timeout": 2}
+    options.update(kwargs)
+    client = RemoteExecutor(addresses, token, **options)
+    await client.start()
+    return client
+
+
+def job(code="ok", **extra):
+    return {"lang": "python", "code": code, "problem_id": None, **extra}
+
+
+class TestParseAddress:
+    def test_addresses(self):
+        assert parse_address("judge-1:9000") == {"host": "judge-1", "port": 9000}
+        assert parse_address("tcp://10.0.0.2:9000") == {
+            "host": "10.0.0.2",
+            "port": 9000,
+        }
+        assert parse_address("unix:///run/worker.sock") == {"path": "/run/worker.sock"}
+
+    def test_invalid_address(self):
+        with pytest.raises(ValueError):
+            parse_address("judge-1")
+
+
+class TestRemoteExecutor:
+    @pytest.mark.asyncio
+    async def test_runs_job_with_progress(self, socket_dir):
+        address = f"unix://{socket_dir}/a.sock"
+        worker = await start_worker(address)
+        client = await start_client([address])
+        events = []
+        try:
+            result = await client.run(job("42"), events.append)
+
+            assert result.success
+            assert result.test_results == [{"passed": True, "output": "42"}]
+            assert events == [{"type": "test", "index": 0, "passed": True}]
+            assert worker.executor.jobs[0]["code"] == "42"
+            stats = client.stats()["workers"][address]
+            assert stats["connected"] and stats["capacity"] == 2
+        finally:
+            await client.stop()
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_job_error(self, socket_dir):
+        address = f"unix://{socket_dir}/a.sock"
+        worker = await start_worker(address)
+        client = await start_client([address])
+        try:
+            result = await client.run(job("raise"))
+            assert not result.success
+            assert result.message == "Execution Error"
+            assert client.retries == 0
+        finally:
+            await client.stop()
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_retries_on_worker_loss(self, socket_dir):
+        first, second = f"unix://{socket_dir}/a.sock", f"unix://{socket_dir}/b.sock"
+        big = await start_worker(first, capacity=4)
+        small = await start_worker(second, capacity=1)
+        client = await start_client([first, second])
+        try:
+            while len(client.connections) < 2:
+                await asyncio.sleep(0.01)
+
+            # The worker with the most free slots gets the job, then goes away
+            running = asyncio.create_task(client.run(job("slow", delay=0.3)))
+            while not big.executor.jobs:
+                await asyncio.sleep(0.01)
+            await big.close()
+
+            result = await running
+            assert result.test_results[0]["output"] == "slow"
+            assert len(small.executor.jobs) == 1
+            assert client.retries == 1
+            assert client.lost == 1
+        finally:
+            await client.stop()
+            await small.close()
+
+    @pytest.mark.asyncio
+    async def test_cancel_stops_job_on_worker(self, socket_dir):
+        address = f"unix://{socket_dir}/a.sock"
+        worker = await start_worker(address)
+        client = await start_client([address])
+        try:
+            running = asyncio.create_task(client.run(job("slow", delay=5)))
+            while not worker.running:
+                await asyncio.sleep(0.01)
+            running.cancel()
+
+            # The worker frees the slot long before the job would have finished
+            await asyncio.wait_for(self._until_idle(worker), 1)
+            assert not client.connections[address].in_flight
+        finally:
+            await client.stop()
+            await worker.close()
+
+    async def _until_idle(self, worker):
+        while worker.running:
+            await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_lost_on_missing_heartbeat(self, socket_dir):
+        address = f"unix://{socket_dir}/a.sock"
+        worker = await start_worker(address, heartbeat_interval=60)
+        client = await start_client([address], heartbeat_timeout=0.2, max_retries=0)
+        try:
+            result = await client.run(job("slow", delay=5))
+            assert result.message == "Execution Error"
+            assert client.lost == 1
+        finally:
+            await client.stop()
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_unavailable_without_workers(self, socket_dir):
+        address = f"unix://{socket_dir}/a.sock"
+        worker = await start_worker(address, token="other")
+        client = await start_client([address], dispatch_timeout=0.3)
+        try:
+            result = await client.run(job())
+            assert result.message == "Execution Error"
+            assert not client.stats()["workers"][address]["connected"]
+        finally:
+            await client.stop()
+            await worker.close()
+
+
+def test_free_slots_count_other_servers_jobs():
+    connection = WorkerConnection("judge-1:9000", None, {"capacity": 4})
+    connection.in_flight = {0: {}}
+
+    assert connection.free == 3
+    connection.running = 3  # two jobs of other API servers
+    assert connection.free == 1
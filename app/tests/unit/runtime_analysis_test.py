@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from core.config import settings
+from services.execution.runtime_analysis import (
+    RuntimeAnalysisBackend,
+    RuntimeAnalysisService,
+    StaticAnalysisBackend,
+)
+
+# fmt: on
+
+
+class FakeBackend(RuntimeAnalysisBackend):
+    """Stands in for the model, these tests only cover what happens around it"""
+
+    remote = True
+
+    def __init__(self):
+        self.calls = []
+
+    async def analyze(self, code, lang):
+        self.calls.append(code)
+        if "sleep" in code:
+            await asyncio.sleep(settings.RUNTIME_ANALYSIS_TIMEOUT + 1)
+        return "O(n)"
+
+
+class TestRuntimeAnalysis:
+    @pytest.fixture
+    def service(self):
+        backend = FakeBackend()
+        service = RuntimeAnalysisService([backend])
+        service.calls = backend.calls
+        return service
+
+    @pytest.mark.asyncio
+    async def test_memoized_by_normalized_code(self, service):
+        code = "class Solution:\n    def add(self, a, b):\n        return a + b\n"
+
+        results = await asyncio.gather(
+            service.analyze_code(code), service.analyze_code(code)
+        )
+        assert results == ["O(n)", "O(n)"]
+        assert await service.analyze_code(code.replace("\n", "\r\n")) == "O(n)"
+        assert len(service.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_timeout(self, service, monkeypatch):
+        monkeypatch.setattr(settings, "RUNTIME_ANALYSIS_TIMEOUT", 0.1)
+
+        assert await service.analyze_code("sleep") is None
+
+    @pytest.mark.asyncio
+    async def test_scheduled_in_background(self, service):
+        delivered = asyncio.Event()
+        results = []
+
+        async def on_result(analysis):
+            results.append(analysis)
+            delivered.set()
+
+        service.schedule("code", "python", on_result)
+        assert results == []
+
+        await asyncio.wait_for(delivered.wait(), 1)
+        assert results == ["O(n)"]
+
+    @pytest.mark.asyncio
+    async def test_static_backend_first(self):
+        backend = FakeBackend()
+        service = RuntimeAnalysisService([StaticAnalysisBackend(), backend])
+        code = "class Solution:\n    def f(self, nums):\n        return sorted(nums)\n"
+
+        assert await service.analyze_code(code, "python") == "O(n log n)"
+        assert backend.calls == []
+
+        # Code the static analyzer can't read falls back to the next backend
+        assert await service.analyze_code("def f(:", "python") == "O(n)"
+        assert backend.calls == ["def f(:"]
+
+    @pytest.mark.asyncio
+    async def test_failing_backend_falls_through(self):
+        class BrokenBackend(RuntimeAnalysisBackend):
+            async def analyze(self, code, lang):
+                raise IndexError("list index out of range")
+
+        backend = FakeBackend()
+        service = RuntimeAnalysisService([BrokenBackend(), backend])
+
+        assert await service.analyze_code("code", "java") == "O(n)"
+        assert backend.calls == ["code"]
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.scheduler import ExecutionScheduler
+
+# fmt: on
+
+
+def make_scheduler(capacity=1, user_limit=2):
+    return ExecutionScheduler(
+        {"easy": capacity},
+        {"ranked": 2, "unranked": 1, "run": 1},
+        user_limit,
+        deadline_margin=30,
+    )
+
+
+async def hold(scheduler, started, name, release, **kwargs):
+    """Take a slot, record when it was granted and keep it until released."""
+    async with scheduler.slot("easy", **kwargs):
+        started.append(name)
+        await release.wait()
+
+
+async def drain(scheduler, started, release, count):
+    """Let the queued jobs run one by one until `count` of them started."""
+    while len(started) < count:
+        release.set()
+        await asyncio.sleep(0)
+        release.clear()
+        await asyncio.sleep(0)
+
+
+class TestScheduler:
+    @pytest.mark.asyncio
+    async def test_weighted_fairness(self):
+        scheduler = make_scheduler()
+        started, release = [], asyncio.Event()
+        blocker = asyncio.create_task(hold(scheduler, started, "blocker", release))
+        await asyncio.sleep(0)
+
+        tasks = [
+            asyncio.create_task(
+                hold(scheduler, started, f"{priority}{i}", release, priority=priority)
+            )
+            for i in range(4)
+            for priority in ("unranked", "ranked")
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == {"easy": 8}
+
+        await drain(scheduler, started, release, 7)
+        # Ranked has twice the weight, so it gets two slots for every unranked one
+        assert started[1:7] == [
+            "ranked0",
+            "ranked1",
+            "unranked0",
+            "ranked2",
+            "ranked3",
+            "unranked1",
+        ]
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+        assert scheduler.idle.is_set()
+
+    @pytest.mark.asyncio
+    async def test_deadline_goes_first(self):
+        scheduler = make_scheduler()
+        started, release = [], asyncio.Event()
+        blocker = asyncio.create_task(hold(scheduler, started, "blocker", release))
+        await asyncio.sleep(0)
+
+        tasks = [
+            asyncio.create_task(
+                hold(scheduler, started, "ranked", release, priority="ranked")
+            ),
+            asyncio.create_task(
+                hold(scheduler, started, "later", release, deadline=time.time() + 600)
+            ),
+            asyncio.create_task(
+                hold(scheduler, started, "ending", release, deadline=time.time() + 5)
+            ),
+            asyncio.create_task(
+                hold(scheduler, started, "ended", release, deadline=time.time() - 5)
+            ),
+        ]
+        await asyncio.sleep(0)
+
+        await drain(scheduler, started, release, 5)
+        # A passed deadline doesn't jump the queue
+        assert started == ["blocker", "ending", "ranked", "later", "ended"]
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+
+    @pytest.mark.asyncio
+    async def test_user_limit(self):
+        scheduler = make_scheduler(capacity=3, user_limit=2)
+        started, release = [], asyncio.Event()
+        tasks = [
+            asyncio.create_task(hold(scheduler, started, name, release, user_id=user))
+            for name, user in [("a0", 1), ("a1", 1), ("a2", 1), ("b0", 2)]
+        ]
+        await asyncio.sleep(0)
+
+        # The third job of user 1 waits, but doesn't hold back user 2
+        assert started == ["a0", "a1", "b0"]
+        assert scheduler.stats()["queue_depth"] == {"easy": 1}
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started[-1] == "a2"
+
+    @pytest.mark.asyncio
+    async def test_queue_events_and_stats(self):
+        scheduler = make_scheduler()
+        started, release = [], asyncio.Event()
+        events = []
+
+        async def on_queue(event):
+            events.append(event)
+
+        blocker = asyncio.create_task(hold(scheduler, started, "blocker", release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(
+            hold(scheduler, started, "first", release, on_queue=on_queue)
+        )
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(
+            hold(
+                scheduler,
+                started,
+                "ranked",
+                release,
+                priority="ranked",
+                on_queue=on_queue,
+            )
+        )
+        await asyncio.sleep(0.01)
+
+        # The ranked job goes ahead of the first one; no job finished, so no estimate
+        assert {"position": 1, "estimated_wait": None} in events
+        assert {"position": 2, "estimated_wait": None} in events
+
+        release.set()
+        await asyncio.gather(blocker, waiting, queued)
+        stats = scheduler.stats()
+        assert stats["queue_depth"] == {"easy": 0}
+        assert stats["running"] == {"easy": 0}
+        assert stats["wait_time"]["ranked"]["count"] == 1
+        assert stats["wait_time"]["unranked"]["count"] == 2
+        assert stats["wait_time"]["unranked"]["buckets"]["+Inf"] == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_while_waiting(self):
+        scheduler = make_scheduler()
+        started, release = [], asyncio.Event()
+        blocker = asyncio.create_task(hold(scheduler, started, "blocker", release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(hold(scheduler, started, "waiting", release))
+        await asyncio.sleep(0)
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.waiting == []
+
+        release.set()
+        await blocker
+        assert started == ["blocker"]
+        assert scheduler.idle.is_set()
+
+    @pytest.mark.asyncio
+    async def test_headroom(self):
+        scheduler = make_scheduler(capacity=3)
+        started, release = [], asyncio.Event()
+        assert scheduler.headroom("easy") == 3
+
+        tasks = [
+            asyncio.create_task(hold(scheduler, started, str(i), release))
+            for i in range(2)
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.headroom("easy") == 1
+
+        # A waiting job claims the free slots first
+        scheduler.set_capacity("easy", 2)
+        tasks.append(asyncio.create_task(hold(scheduler, started, "2", release)))
+        await asyncio.sleep(0)
+        assert scheduler.headroom("easy") == 0
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.headroom("easy") == 2
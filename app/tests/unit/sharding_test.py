@@ -0,0 +1,158 @@
+import os
+import sys
+
+import pytest
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.sharding import (
+    merge_results,
+    shard_count,
+    shard_progress,
+    split_tests,
+)
+from services.execution.types import ExecutionResult
+
+# fmt: on
+
+
+def make_results(first, count, passed=True, wall_time=10):
+    return [
+        {"input": str(i), "passed": passed, "wall_time": wall_time}
+        for i in range(first, first + count)
+    ]
+
+
+@pytest.mark.parametrize(
+    "tests, headroom, expected",
+    [
+        (100, 10, 4),  # capped by SHARDING_MAX_SHARDS
+        (100, 1, 2),  # only one free slot besides the submission's own
+        (100, 0, 1),  # the pool is busy
+        (25, 10, 2),  # shards need at least 10 tests
+        (5, 10, 1),
+    ],
+)
+def test_shard_count(tests, headroom, expected):
+    assert shard_count(tests, headroom, 4, 10) == expected
+
+
+def test_split_tests_keeps_order():
+    tests = list(range(10))
+    shards = split_tests(tests, 3)
+
+    assert [len(s) for s in shards] == [4, 3, 3]
+    assert [t for s in shards for t in s] == tests
+
+
+def test_shard_progress_counts_all_shards():
+    events = []
+    completed = [0]
+    first = shard_progress(0, 4, completed, events.append)
+    second = shard_progress(2, 4, completed, events.append)
+
+    second({"sample": False, "index": 0, "passed": True, "completed": 1, "total": 2})
+    first({"sample": False, "index": 0, "passed": True, "completed": 1, "total": 2})
+    first({"sample": True, "index": 0, "passed": True, "completed": 1, "total": 1})
+
+    assert [(e["index"], e["completed"], e["total"]) for e in events] == [
+        (2, 1, 4),
+        (0, 2, 4),
+        (0, 1, 1),  # samples only run in the first shard, as they are
+    ]
+
+
+def test_merge_results_in_order():
+    samples = make_results(0, 1)
+    result = merge_results(
+        [
+            ExecutionResult(
+                True,
+                test_results=make_results(0, 2),
+                line_offset=5,
+                sample_results=samples,
+            ),
+            ExecutionResult(
+                True, test_results=make_results(2, 2), line_offset=5, sample_results=[]
+            ),
+        ],
+        [2, 2],
+        1000,
+    )
+
+    assert result.all_cleared()
+    assert [t["input"] for t in result.test_results] == ["0", "1", "2", "3"]
+    assert result.sample_results == samples
+    assert result.line_offset == 5
+
+
+def test_merge_results_keeps_finished_tests_of_a_timeout():
+    result = merge_results(
+        [
+            ExecutionResult(
+                True, test_results=make_results(0, 2), sample_results=make_results(0, 1)
+            ),
+            ExecutionResult(
+                False,
+                "Runtime Error Detected: Time Limit Exceeded",
+                test_results=make_results(2, 1),
+                sample_results=[],
+            ),
+        ],
+        [2, 2],
+        1000,
+    )
+
+    assert not result.success
+    assert "Time Limit Exceeded" in result.message
+    assert len(result.test_results) == 3
+    assert result.summary == {"total_tests": 4, "passed_tests": 3}
+
+
+def test_merge_results_fails_like_a_single_run():
+    error = ExecutionResult(False, "Runtime Error Detected: Memory Limit Exceeded")
+    result = merge_results(
+        [ExecutionResult(True, test_results=make_results(0, 2)), error], [2, 2], 1000
+    )
+
+    assert result is error
+
+
+def test_merge_results_stops_where_a_shard_stopped():
+    result = merge_results(
+        [
+            ExecutionResult(
+                False,
+                "Runtime Error Detected: Time Limit Exceeded",
+                test_results=make_results(0, 1),
+                sample_results=[],
+            ),
+            ExecutionResult(True, test_results=make_results(2, 2)),
+        ],
+        [2, 2],
+        1000,
+    )
+
+    # The tests of the second shard would come after the one that never finished
+    assert [t["input"] for t in result.test_results] == ["0"]
+    assert result.summary == {"total_tests": 4, "passed_tests": 1}
+
+
+def test_merge_results_shares_the_time_limit():
+    result = merge_results(
+        [
+            ExecutionResult(
+                True,
+                test_results=make_results(0, 2, wall_time=400),
+                sample_results=make_results(0, 1, wall_time=100),
+            ),
+            ExecutionResult(True, test_results=make_results(2, 2, wall_time=400)),
+        ],
+        [2, 2],
+        1000,
+    )
+
+    assert not result.success
+    assert result.timed_out
+    assert len(result.test_results) == 2  # the third goes over 1000ms
+    assert result.summary == {"total_tests": 4, "passed_tests": 2}
@@ -0,0 +1,72 @@
+import os
+import sys
+
+# fmt: off
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from services.execution.usage import (
+    cgroup_usage,
+    make_usage,
+    merge_usage,
+    parse_cgroup,
+)
+
+# fmt: on
+
+
+def cgroup_output(cpu_usec, peak_bytes, oom_kills):
+    return f"""==> cpu.stat <==
+usage_usec {cpu_usec}
+user_usec {cpu_usec - 10}
+system_usec 10
+
+==> memory.peak <==
+{peak_bytes}
+
+==> memory.events <==
+low 0
+high 0
+max 3
+oom {oom_kills}
+oom_kill {oom_kills}
+"""
+
+
+def test_parse_cgroup():
+    assert parse_cgroup(cgroup_output(1500, 8 * 2**20, 0)) == {
+        "cpu_usec": 1500,
+        "peak_bytes": 8 * 2**20,
+        "oom_kills": 0,
+    }
+
+
+def test_parse_cgroup_without_v2_files():
+    output = "head: cpu.stat: No such file or directory\n"
+    assert parse_cgroup(output) is None
+
+    # Kernels before 5.19 have no memory.peak
+    output = cgroup_output(1500, 0, 0).replace("==> memory.peak <==\n0\n", "")
+    assert parse_cgroup(output)["peak_bytes"] is None
+
+
+def test_usage_of_a_fresh_container():
+    usage = cgroup_usage(parse_cgroup(cgroup_output(1500, 8 * 2**20, 1)))
+
+    assert usage == make_usage(1.5, 8192, True)
+
+
+def test_usage_of_a_pooled_container():
+    before = parse_cgroup(cgroup_output(1000, 16 * 2**20, 1))
+    after = parse_cgroup(cgroup_output(4000, 16 * 2**20, 1))
+
+    # The container's peak is from an earlier job
+    assert cgroup_usage(after, before) == make_usage(3, None, False)
+
+    after = parse_cgroup(cgroup_output(4000, 32 * 2**20, 2))
+    assert cgroup_usage(after, before) == make_usage(3, 32768, True)
+
+
+def test_merge_usage():
+    usages = [make_usage(3, None, False), make_usage(2, 1024, True)]
+
+    assert merge_usage(usages) == make_usage(5, 1024, True)
+    assert merge_usage(usages + [None]) is None
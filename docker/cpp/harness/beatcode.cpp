@@ -0,0 +1,245 @@
+#include "beatcode.h"
+
+#include <sys/resource.h>
+#include <sys/time.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+vector<ArgType> parseArguments(const string& input) {
+    vector<ArgType> args;
+    istringstream iss(input);
+    string token;
+    Json::CharReaderBuilder builder;
+    Json::CharReader* reader = builder.newCharReader();
+    string errors;
+
+    while (iss >> token) {
+        size_t eq_pos = token.find('=');
+        if (eq_pos == std::string::npos || token.find("--arg") != 0)
+            continue;
+
+        std::string value_str = token.substr(eq_pos + 1);
+        Json::Value json_val;
+
+        // Attempt to parse as JSON
+        if (reader->parse(value_str.c_str(), value_str.c_str() + value_str.length(), &json_val, &errors)) {
+            args.push_back({json_val});
+        } else {
+            // If not valid JSON, treat as string (highly likely with single quotes)
+            if (value_str.front() == '\'' && value_str.back() == '\'') {
+                args.push_back({Json::Value(value_str.substr(1, value_str.length() - 2))});
+            } else {
+                args.push_back({Json::Value(value_str)});
+            }
+        }
+    }
+    delete reader;
+    return args;
+}
+
+// Runs one test and builds its result entry, without timings
+static Json::Value evaluateTest(const Json::Value& test, bool isSample, const Invoker& invoke,
+                                Comparator compare) {
+    Json::Value testResult;
+    Json::CharReaderBuilder builder;
+    unique_ptr<Json::CharReader> reader(builder.newCharReader());
+    string errors;
+
+    stringstream logStream;
+    streambuf* oldCout = cout.rdbuf();
+    cout.rdbuf(logStream.rdbuf());
+
+    try {
+        auto args = parseArguments(test["input"].asString());
+        Json::Value output_json = invoke(args);
+
+        Json::StreamWriterBuilder writer;
+        writer["indentation"] = "";
+        // Custom inputs have no expected result to compare against
+        if (test["expected"].isNull()) {
+            testResult["passed"] = Json::Value();
+            testResult["expected"] = Json::Value();
+        } else {
+            Json::Value expected;
+            const std::string& expected_str = test["expected"].asString();
+            if (!reader->parse(expected_str.c_str(), expected_str.c_str() + expected_str.length(), &expected, &errors)) {
+                std::cerr << "Parse error: " << errors << std::endl;
+                throw std::runtime_error("Parse error: " + errors);
+            }
+            testResult["passed"] = compare(output_json, expected);
+            testResult["expected"] = Json::writeString(writer, expected);
+        }
+        testResult["output"] = Json::writeString(writer, output_json);
+        if (isSample) {
+            testResult["logs"] = logStream.str();
+            testResult["input"] = test["input"];
+        }
+    } catch (const exception &e) {
+        testResult["error"] = e.what();
+        testResult["passed"] = false;
+    }
+    cout.rdbuf(oldCout);
+    return testResult;
+}
+
+// Runs one test in a forked child that SIGPROF kills once it used more CPU time than
+// the limit, so a slow test doesn't end the whole run
+static Json::Value runTestWithLimit(const Json::Value& test, bool isSample, const Invoker& invoke,
+                                    Comparator compare, long timeLimitMs) {
+    int fds[2];
+    if (pipe(fds) != 0) {
+        throw runtime_error("Could not create a pipe for the test");
+    }
+    cout.flush();
+    cerr.flush();
+
+    auto wallStart = chrono::steady_clock::now();
+    pid_t pid = fork();
+    if (pid < 0) {
+        throw runtime_error("Could not fork the test");
+    }
+    if (pid == 0) {
+        close(fds[0]);
+        struct itimerval timer = {};
+        timer.it_value.tv_sec = timeLimitMs / 1000;
+        timer.it_value.tv_usec = (timeLimitMs % 1000) * 1000;
+        setitimer(ITIMER_PROF, &timer, nullptr);
+
+        Json::StreamWriterBuilder writer;
+        writer["indentation"] = "";
+        string data = Json::writeString(writer, evaluateTest(test, isSample, invoke, compare));
+        for (size_t written = 0; written < data.size();) {
+            ssize_t n = write(fds[1], data.data() + written, data.size() - written);
+            if (n < 0 && errno != EINTR) {
+                _exit(1);
+            }
+            written += max<ssize_t>(n, 0);
+        }
+        _exit(0);
+    }
+
+    close(fds[1]);
+    string data;
+    char buffer[65536];
+    ssize_t n;
+    while ((n = read(fds[0], buffer, sizeof(buffer))) != 0) {
+        if (n > 0) {
+            data.append(buffer, n);
+        } else if (errno != EINTR) {
+            break;
+        }
+    }
+    close(fds[0]);
+
+    int status;
+    struct rusage usage;
+    while (wait4(pid, &status, 0, &usage) < 0 && errno == EINTR) {
+    }
+    double wallTime =
+        chrono::duration<double, milli>(chrono::steady_clock::now() - wallStart).count();
+    double cpuTime = (usage.ru_utime.tv_sec + usage.ru_stime.tv_sec) * 1e3 +
+                     (usage.ru_utime.tv_usec + usage.ru_stime.tv_usec) / 1e3;
+
+    Json::Value testResult;
+    if (WIFSIGNALED(status) && WTERMSIG(status) == SIGPROF) {
+        testResult["passed"] = false;
+        testResult["error"] = "Time Limit Exceeded";
+        testResult["time_limit_exceeded"] = true;
+    } else if (WIFSIGNALED(status)) {
+        // Crashes and the OOM killer still end the whole run, like before tests forked
+        signal(WTERMSIG(status), SIG_DFL);
+        raise(WTERMSIG(status));
+    } else {
+        Json::CharReaderBuilder builder;
+        string errors;
+        istringstream stream(data);
+        if (!Json::parseFromStream(builder, stream, &testResult, &errors)) {
+            // The submitted code exited by itself
+            exit(WEXITSTATUS(status));
+        }
+        testResult["time_limit_exceeded"] = false;
+    }
+    testResult["cpu_time"] = cpuTime;
+    testResult["wall_time"] = wallTime;
+    return testResult;
+}
+
+Json::Value runTests(const Json::Value& testData, bool isSample, const Invoker& invoke,
+                     Comparator compare, long timeLimitMs, ostream& progress) {
+    Json::Value results(Json::arrayValue);
+    Json::StreamWriterBuilder lineWriter;
+    lineWriter["indentation"] = "";
+
+    for (Json::ArrayIndex index = 0; index < testData.size(); index++) {
+        Json::Value testResult;
+        try {
+            testResult = runTestWithLimit(testData[index], isSample, invoke, compare, timeLimitMs);
+        } catch (const exception &e) {
+            testResult["error"] = e.what();
+            testResult["passed"] = false;
+        }
+        results.append(testResult);
+
+        Json::Value line;
+        line["type"] = "test";
+        line["sample"] = isSample;
+        line["index"] = index;
+        line["result"] = testResult;
+        progress << Json::writeString(lineWriter, line) << endl;
+    }
+    return results;
+}
+
+Json::Value formatResults(const Json::Value& results) {
+    Json::Value formatted;
+    int total_tests = results.size();
+    int passed_tests = 0;
+
+    for (const auto& test : results) {
+        if (test["passed"].asBool()) {
+            passed_tests++;
+        }
+    }
+
+    formatted["test_results"] = results;
+    formatted["summary"]["total_tests"] = total_tests;
+    formatted["summary"]["passed_tests"] = passed_tests;
+
+    return formatted;
+}
+
+int runHarness(const string& fileName, const string& fixturePath, long timeLimitMs,
+               const Invoker& invoke, Comparator compare) {
+    ifstream fixture_file(fixturePath);
+    Json::CharReaderBuilder builder;
+    Json::Value fixture;
+    string errors;
+
+    if (!fixture_file || !Json::parseFromStream(builder, fixture_file, &fixture, &errors)) {
+        cerr << "Could not load test data from " << fixturePath << ": " << errors << endl;
+        return 1;
+    }
+    const Json::Value& test_data = fixture["hidden"];
+    const Json::Value& sample_data = fixture["sample"];
+
+    ofstream progress_file(fileName + "-progress.jsonl");
+    Json::StreamWriterBuilder writer;
+    writer["indentation"] = "";
+    Json::Value start;
+    start["type"] = "start";
+    start["hidden"] = test_data.size();
+    start["sample"] = sample_data.size();
+    progress_file << Json::writeString(writer, start) << endl;
+
+    Json::Value results;
+    results["hidden_results"] =
+        formatResults(runTests(test_data, false, invoke, compare, timeLimitMs, progress_file));
+    results["sample_results"] =
+        formatResults(runTests(sample_data, true, invoke, compare, timeLimitMs, progress_file));
+    progress_file.close();
+
+    ofstream output_file(fileName + "-results.txt");
+    output_file << results.toStyledString() << endl;
+    output_file.close();
+    return 0;
+}
@@ -0,0 +1,135 @@
+// Static part of the C++ test runner. This header is precompiled in the image
+// (beatcode.h.gch) and the non-template code lives in libbeatcode.a, so only
+// the submitted Solution and a small per-problem glue file compile per run.
+// The PCH is only picked up with the same flags it was built with (-std=c++17).
+#ifndef BEATCODE_HARNESS_H
+#define BEATCODE_HARNESS_H
+
+#include <fstream>
+#include <functional>
+#include <iostream>
+#include <json/json.h>
+#include <regex>
+#include <sstream>
+#include <tuple>
+#include <type_traits>
+#include <bits/stdc++.h>
+#include <vector>
+#include <streambuf>
+
+using namespace std;
+
+template <typename T> struct function_traits;
+template <typename> struct always_false : std::false_type {};
+template <typename> struct is_vector : std::false_type {};
+template <typename T> struct is_vector<std::vector<T>> : std::true_type {};
+
+template <typename C, typename R, typename... Args>
+struct function_traits<R (C::*)(Args...)> {
+    using return_type = R;
+    using args_tuple = std::tuple<typename std::remove_reference<Args>::type...>;
+    static constexpr size_t arg_count = sizeof...(Args);
+};
+
+template <size_t N, typename T>
+using tuple_element_t = typename std::tuple_element<N, T>::type;
+template <size_t N, typename T> struct arg_type {
+  using type = std::tuple_element_t<N, typename function_traits<T>::args_tuple>;
+};
+
+template <typename T> T jsonToValue(const Json::Value &val) {
+    // Handle nested vectors recursively
+    if constexpr (is_vector<T>::value) {
+        using ElementType = typename T::value_type;
+        T result;
+        for (const auto &elem : val) {
+            result.push_back(jsonToValue<ElementType>(elem));
+        }
+        return result;
+    }
+    // Handle booleans
+    else if constexpr (std::is_same_v<T, bool>) {
+        if (val.isBool()) {
+            return val.asBool();
+        } else {
+            throw std::runtime_error("JSON value is not a boolean");
+        }
+    }
+    // Handle chars specifically
+    else if constexpr (std::is_same_v<T, char>) {
+        if (val.isString()) {
+            std::string str_val = val.asString();
+            if (!str_val.empty()) {
+                return str_val[0];
+            } else {
+                throw std::runtime_error("JSON string for char is empty");
+            }
+        } else {
+            throw std::runtime_error("JSON value for char is not a string");
+        }
+    }
+    // Handle arithmetic types (int, float, double)
+    else if constexpr (std::is_arithmetic_v<T>) {
+        if (val.isNumeric()) {
+            return static_cast<T>(val.isDouble() ? val.asDouble() : val.asInt());
+        }
+        throw std::runtime_error("JSON value is not numeric");
+    }
+    // Handle strings
+    else if constexpr (std::is_same_v<T, std::string>) {
+        return val.asString();
+    }
+    else {
+        static_assert(always_false<T>::value, "Unsupported type for JSON parsing");
+    }
+}
+
+template <typename T> Json::Value valueToJson(const T &value) {
+    // Handle vectors recursively
+    if constexpr (is_vector<T>::value) {
+        Json::Value json_array(Json::arrayValue);
+        for (const auto &elem : value) {
+            json_array.append(valueToJson(elem));
+        }
+        return json_array;
+    }
+    // Handle arithmetic types
+    else if constexpr (std::is_arithmetic_v<T>) {
+        return Json::Value(value);
+    }
+    // Handle strings
+    else if constexpr (std::is_same_v<T, std::string>) {
+        return Json::Value(value);
+    } else {
+        static_assert(always_false<T>::value, "Unsupported type for JSON serialization");
+    }
+}
+
+struct ArgType {
+    Json::Value data;
+    std::function<void *(void)> converter;
+
+    template <typename T> T get() const { return jsonToValue<T>(data); }
+};
+
+// Calls the submitted method with the parsed arguments and returns its output as JSON
+using Invoker = std::function<Json::Value(const vector<ArgType> &)>;
+// The problem's compare function
+using Comparator = bool (*)(const Json::Value &, const Json::Value &);
+
+vector<ArgType> parseArguments(const string &input);
+
+// Runs each test in its own child process with timeLimitMs of CPU time (0 for none) and
+// appends one line per finished test to progress, so the server can stream progress
+// and keep the finished tests if the time limit kills the run
+Json::Value runTests(const Json::Value &testData, bool isSample, const Invoker &invoke,
+                     Comparator compare, long timeLimitMs, ostream &progress);
+
+Json::Value formatResults(const Json::Value &results);
+
+// Runs the hidden and sample tests of the fixture file and writes {fileName}-results.txt,
+// reporting each finished test in {fileName}-progress.jsonl
+int runHarness(const string &fileName, const string &fixturePath, long timeLimitMs,
+               const Invoker &invoke, Comparator compare);
+
+#endif
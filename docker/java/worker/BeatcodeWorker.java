@@ -0,0 +1,255 @@
+import com.google.gson.*;
+import java.io.*;
+import java.lang.reflect.*;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.*;
+import java.util.*;
+import javax.tools.*;
+
+/**
+ * Long-lived compiler and runner for Java submissions. Started once per sandbox container,
+ * it reads one JSON request per line on stdin and answers with one JSON line on stdout:
+ *
+ *   {"action": "compile", "dir": "/code/<job>", "file": "BeatcodeRunner.java"}
+ *   {"action": "run", "dir": "/code/<job>", "class": "BeatcodeRunner", "args": [...], "timeout": <ms>}
+ *
+ * Responses carry "status" (null when the run timed out), "stdout", "stderr" and "recycle".
+ * The worker exits after answering a request with recycle set: after max jobs, a time limit
+ * violation, an OutOfMemoryError/StackOverflowError, or when submitted code left threads or
+ * processes behind, which the server then kills with the worker.
+ */
+public class BeatcodeWorker {
+    private static final String[] VIOLATIONS = {"java.lang.OutOfMemoryError", "java.lang.StackOverflowError"};
+    private static final String WARMUP_SOURCE =
+        "public class Warmup { public static void main(String[] args) {"
+            + " System.out.println(new com.google.gson.Gson().toJson(new int[]{1, 2})); } }";
+
+    private final JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+    private final StandardJavaFileManager fileManager =
+        compiler.getStandardFileManager(null, null, StandardCharsets.UTF_8);
+    private final String classPath = System.getProperty("java.class.path");
+    private final PrintStream originalOut = System.out;
+    private final PrintStream originalErr = System.err;
+    private final Gson gson = new Gson();
+    private int jobs = 0;
+
+    public static void main(String[] args) throws Exception {
+        int maxJobs = 50;
+        boolean warmup = false;
+        for (int i = 0; i < args.length; i++) {
+            if (args[i].equals("--max-jobs")) {
+                maxJobs = Integer.parseInt(args[++i]);
+            } else if (args[i].equals("--warmup")) {
+                warmup = true;
+            }
+        }
+
+        BeatcodeWorker worker = new BeatcodeWorker();
+        if (warmup) {
+            worker.warmup();
+            return;
+        }
+
+        PrintStream protocol = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        System.setOut(worker.originalErr); // nothing but responses goes to stdout
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        String line;
+        while ((line = in.readLine()) != null) {
+            JsonObject response = worker.handle(JsonParser.parseString(line).getAsJsonObject());
+            boolean recycle = response.get("recycle").getAsBoolean() || worker.jobs >= maxJobs;
+            response.addProperty("recycle", recycle);
+            protocol.println(response.toString());
+            if (recycle) {
+                // Threads of the submission may still be running, don't wait for them
+                Runtime.getRuntime().halt(0);
+            }
+        }
+    }
+
+    private JsonObject handle(JsonObject request) {
+        String action = request.get("action").getAsString();
+        Path dir = Paths.get(request.get("dir").getAsString());
+        if (action.equals("compile")) {
+            return compile(dir, request.get("file").getAsString());
+        }
+        jobs++;
+        JsonArray argsJson = request.getAsJsonArray("args");
+        String[] args = new String[argsJson.size()];
+        for (int i = 0; i < args.length; i++) {
+            args[i] = argsJson.get(i).getAsString();
+        }
+        return run(dir, request.get("class").getAsString(), args, request.get("timeout").getAsLong());
+    }
+
+    /** Compile a source file into its directory with the in-process compiler. */
+    private JsonObject compile(Path dir, String fileName) {
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        Path source = dir.resolve(fileName);
+        List<String> options = Arrays.asList(
+            "-classpath", classPath + File.pathSeparator + dir,
+            "-d", dir.toString(),
+            "-proc:none"
+        );
+
+        boolean success;
+        try {
+            success = compiler.getTask(
+                null, fileManager, diagnostics, options, null,
+                fileManager.getJavaFileObjects(source.toFile())
+            ).call();
+        } catch (RuntimeException e) {
+            return response(1, "", e.toString(), false);
+        }
+        return response(success ? 0 : 1, "", formatDiagnostics(diagnostics, source, fileName), false);
+    }
+
+    /** Format errors the way javac prints them, so line offsets still apply. */
+    private String formatDiagnostics(DiagnosticCollector<JavaFileObject> diagnostics, Path source, String fileName) {
+        List<String> lines;
+        try {
+            lines = Files.readAllLines(source, StandardCharsets.UTF_8);
+        } catch (IOException e) {
+            lines = Collections.emptyList();
+        }
+
+        StringBuilder out = new StringBuilder();
+        int errors = 0;
+        for (Diagnostic<? extends JavaFileObject> d : diagnostics.getDiagnostics()) {
+            if (d.getKind() != Diagnostic.Kind.ERROR) {
+                continue;
+            }
+            errors++;
+            long lineNumber = d.getLineNumber();
+            out.append(fileName).append(':').append(lineNumber).append(": error: ")
+                .append(d.getMessage(Locale.ENGLISH)).append('\n');
+            if (lineNumber > 0 && lineNumber <= lines.size()) {
+                out.append(lines.get((int) lineNumber - 1)).append('\n');
+                long column = Math.max(1, d.getColumnNumber());
+                out.append(" ".repeat((int) column - 1)).append("^\n");
+            }
+        }
+        if (errors > 0) {
+            out.append(errors).append(errors == 1 ? " error\n" : " errors\n");
+        }
+        return out.toString();
+    }
+
+    /** Run the main method of a compiled class in its own classloader, under a watchdog. */
+    private JsonObject run(Path dir, String className, String[] args, long timeoutMs) {
+        ByteArrayOutputStream stdout = new ByteArrayOutputStream();
+        ByteArrayOutputStream stderr = new ByteArrayOutputStream();
+        PrintStream jobOut = new PrintStream(stdout, true);
+        PrintStream jobErr = new PrintStream(stderr, true);
+        int[] status = {0};
+
+        URL url;
+        try {
+            url = dir.toUri().toURL();
+        } catch (IOException e) {
+            return response(1, "", e.toString(), false);
+        }
+        URLClassLoader loader = new URLClassLoader(new URL[] {url}, BeatcodeWorker.class.getClassLoader());
+
+        ThreadGroup group = new ThreadGroup("job");
+        Thread thread = new Thread(group, () -> {
+            try {
+                Class<?> cls = Class.forName(className, true, loader);
+                Method main = cls.getMethod("main", String[].class);
+                main.invoke(null, (Object) args);
+            } catch (Throwable e) {
+                Throwable cause = e;
+                if (e instanceof InvocationTargetException && e.getCause() != null) {
+                    cause = e.getCause();
+                }
+                jobErr.print("Exception in thread \"main\" ");
+                cause.printStackTrace(jobErr);
+                status[0] = 1;
+            }
+        }, "main");
+        thread.setContextClassLoader(loader);
+
+        System.setOut(jobOut);
+        System.setErr(jobErr);
+        try {
+            thread.start();
+            thread.join(Math.max(1, timeoutMs));
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+        } finally {
+            System.setOut(originalErr);
+            System.setErr(originalErr);
+        }
+
+        if (thread.isAlive()) {
+            return response(null, stdout.toString(), stderr.toString(), true);
+        }
+
+        try {
+            loader.close();
+        } catch (IOException e) {
+            // Nothing to clean up beyond the loader itself
+        }
+        boolean recycle = group.activeCount() > 0
+            || leftProcesses()
+            || violatedLimits(dir.resolve(className + "-results.txt"));
+        return response(status[0], stdout.toString(), stderr.toString(), recycle);
+    }
+
+    /** Whether anything but the container's init and the worker itself is running. */
+    private boolean leftProcesses() {
+        long self = ProcessHandle.current().pid();
+        return ProcessHandle.allProcesses()
+            .mapToLong(ProcessHandle::pid)
+            .anyMatch(pid -> pid != 1 && pid != self && !zombie(pid));
+    }
+
+    /** Killed processes stay zombies, the container's init never reaps them. */
+    private static boolean zombie(long pid) {
+        try {
+            String stat = new String(Files.readAllBytes(Paths.get("/proc/" + pid + "/stat")), StandardCharsets.UTF_8);
+            return stat.substring(stat.lastIndexOf(')') + 2).startsWith("Z");
+        } catch (IOException e) {
+            return true; // already gone
+        }
+    }
+
+    /** Tests catch their own errors, so look for limit violations in the results file. */
+    private boolean violatedLimits(Path results) {
+        try {
+            String content = new String(Files.readAllBytes(results), StandardCharsets.UTF_8);
+            for (String violation : VIOLATIONS) {
+                if (content.contains(violation)) {
+                    return true;
+                }
+            }
+        } catch (IOException e) {
+            // No results file, the run already failed
+        }
+        return false;
+    }
+
+    private JsonObject response(Integer status, String stdout, String stderr, boolean recycle) {
+        JsonObject response = new JsonObject();
+        if (status == null) {
+            response.add("status", JsonNull.INSTANCE);
+        } else {
+            response.addProperty("status", status);
+        }
+        response.addProperty("stdout", stdout);
+        response.addProperty("stderr", stderr);
+        response.addProperty("recycle", recycle);
+        return response;
+    }
+
+    /** Compile and run a small program so the class list for the CDS archive covers a job. */
+    private void warmup() throws IOException {
+        Path dir = Files.createTempDirectory("warmup");
+        Files.write(dir.resolve("Warmup.java"), WARMUP_SOURCE.getBytes(StandardCharsets.UTF_8));
+        JsonObject compiled = compile(dir, "Warmup.java");
+        JsonObject ran = run(dir, "Warmup", new String[0], 10000);
+        originalOut.println(gson.toJson(compiled) + "\n" + gson.toJson(ran));
+    }
+}
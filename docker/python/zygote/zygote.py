@@ -0,0 +1,216 @@
+"""
+Pre-forked runner for Python submissions. Started once per sandbox container, it
+imports what the test runners need, then reads one JSON request per line on stdin
+and answers with one JSON line on stdout:
+
+    {"action": "run", "dir": "/code/<job>", "file": "BeatcodeRunner.py",
+     "code": <source>, "args": [...], "timeout": <ms>}
+
+Every run forks a child which limits itself, moves to the job directory and executes
+the source as __main__ straight from the request, so a run costs a fork instead of
+an interpreter start and the imports. Responses carry "status" (null when the run
+timed out), "stdout", "stderr", "usage" (the child's CPU time in ms and peak memory
+in kb from its rusage, and whether the container killed it for its memory) and
+"recycle". The children can't change the
+zygote, but whatever they start is killed after every run, and recycle is only set
+when something is left running anyway, so the server destroys it with the zygote.
+"""
+
+import atexit
+import gc
+import io  # noqa: F401, imported by the test runners
+import json
+import linecache
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+import typing  # noqa: F401, imported by the test runners
+
+CGROUP_EVENTS = "/sys/fs/cgroup/memory.events"
+MAX_OPEN_FILES = 64
+READ_SIZE = 65536
+SETTLE_CHECKS = 10
+SETTLE_DELAY = 0.01
+
+
+def child(request: dict, stdout: int, stderr: int):
+    """Run the source of a request as `python <file> <args>` would, then exit."""
+    os.setsid()  # its own process group, so whatever it starts is killed with it
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGPIPE):
+        signal.signal(signum, signal.SIG_DFL)
+
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(stdout, 1)
+    os.dup2(stderr, 2)
+    os.closerange(3, MAX_OPEN_FILES)
+
+    # The container's memory limit still applies, the wall clock limit is enforced
+    # by the zygote and this stops busy loops that ignore it
+    cpu = -(-request["timeout"] // 1000) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (MAX_OPEN_FILES, MAX_OPEN_FILES))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    directory = request["dir"]
+    os.chdir(directory)
+    path = os.path.join(directory, request["file"])
+    source = request["code"]
+    sys.argv = [path] + request["args"]
+    sys.path[0] = directory
+    # Tracebacks read the lines from here, the file is never written
+    linecache.cache[path] = (len(source), None, source.splitlines(True), path)
+
+    status = 0
+    try:
+        code = compile(source, path, "exec")
+        exec(code, {"__name__": "__main__", "__file__": path})
+    except SyntaxError as e:
+        sys.stderr.write("".join(traceback.format_exception_only(type(e), e)))
+        status = 1
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            sys.stderr.write(f"{e.code}\n")
+            status = 1
+    except BaseException as e:
+        # Without this frame, the traceback is the one `python <file>` prints
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+    finally:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+def run(request: dict) -> dict:
+    """Fork a child for a request and collect its output."""
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    kills = oom_kills()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(stdout_r)
+            os.close(stderr_r)
+            child(request, stdout_w, stderr_w)
+        finally:
+            os._exit(1)
+    os.close(stdout_w)
+    os.close(stderr_w)
+
+    output = {stdout_r: [], stderr_r: []}
+    deadline = time.monotonic() + request["timeout"] / 1000
+    open_fds = [stdout_r, stderr_r]
+    timed_out = False
+    while open_fds:
+        remaining = deadline - time.monotonic()
+        ready = select.select(open_fds, [], [], max(0, remaining))[0]
+        if not ready:
+            timed_out = True
+            break
+        for fd in ready:
+            data = os.read(fd, READ_SIZE)
+            if data:
+                output[fd].append(data)
+            else:
+                open_fds.remove(fd)
+
+    # Whatever the child left running goes too, even if it left the child's group:
+    # nothing but the container's init and the zygote has a reason to be running
+    try:
+        os.kill(-1, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    _, wait_status, rusage = os.wait4(pid, 0)
+    os.close(stdout_r)
+    os.close(stderr_r)
+
+    if timed_out:
+        status = None
+    elif os.WIFSIGNALED(wait_status):
+        signum = os.WTERMSIG(wait_status)
+        # Over the CPU time limit is a timeout, other signals are reported like the
+        # shell does, e.g. 137 for a child killed for its memory
+        status = None if signum == signal.SIGXCPU else 128 + signum
+    else:
+        status = os.WEXITSTATUS(wait_status)
+    return {
+        "status": status,
+        "stdout": b"".join(output[stdout_r]).decode("utf-8", errors="replace"),
+        "stderr": b"".join(output[stderr_r]).decode("utf-8", errors="replace"),
+        "usage": {
+            "cpu_time": (rusage.ru_utime + rusage.ru_stime) * 1000,
+            "peak_memory": rusage.ru_maxrss,
+            "oom_killed": oom_kills() > kills,
+        },
+        "recycle": left_processes(),
+    }
+
+
+def oom_kills() -> int:
+    """The number of processes the container killed for its memory, 0 if unknown."""
+    try:
+        with open(CGROUP_EVENTS) as f:
+            for line in f:
+                name, value = line.split()
+                if name == "oom_kill":
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def left_processes() -> bool:
+    """Whether anything but the container's init and the zygote is still running."""
+    for _ in range(SETTLE_CHECKS):
+        alive = False
+        for name in os.listdir("/proc"):
+            if not name.isdigit() or int(name) in (1, os.getpid()):
+                continue
+            try:
+                with open(f"/proc/{name}/stat") as f:
+                    state = f.read().rsplit(")", 1)[1].split()[0]
+            except (OSError, IndexError):
+                continue  # already gone
+            # Killed processes stay zombies, the container's init never reaps them
+            if state not in ("Z", "X"):
+                alive = True
+                break
+        if not alive:
+            return False
+        time.sleep(SETTLE_DELAY)  # killed processes take a moment to exit
+    return True
+
+
+def main():
+    # Nothing but responses goes to stdout
+    protocol = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    # Keep the imported modules out of the collector, so children don't copy the
+    # pages it would touch
+    gc.freeze()
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("action") == "run":
+            response = run(request)
+        else:
+            response = {
+                "status": 1,
+                "stdout": "",
+                "stderr": f"Unknown action: {request.get('action')}\n",
+                "recycle": False,
+            }
+        protocol.write(json.dumps(response) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()